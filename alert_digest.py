@@ -0,0 +1,227 @@
+# --- 실험실 재고 관리기: 알림 요약(digest) 작업 ---
+# Streamlit 없이 두 시트를 앱과 같은 파서로 읽어 알림을 한 번 계산하고, 결과를 파일로 남깁니다.
+# (cron 등으로 하루 몇 번 실행 - 대시보드는 앱이 가진 데이터와 시트 revision 이 같으면 계산 대신 스냅샷을 읽습니다)
+#
+#   python alert_digest.py --credentials service_account.json
+#   python alert_digest.py --backend local --local-dir .inventory_cache/local_sheets
+#   GCP_JSON_BASE64=... python alert_digest.py --formats json html
+#
+# 출력 (--output-dir, 기본 .inventory_cache/digest):
+#   digest.json / digest.csv / digest.html   알림 목록 (메일/메신저 전송용)
+#   dashboard_snapshot.parquet               재고 현황 계산 결과 + 입력(날짜 / 알림 기준 / 샤드별 revision / 워터마크) (대시보드가 읽음)
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from consumption import (
+    ConsumptionTracker, DEPLETION_ALERT_DAYS, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN, WEEKLY_RATE_COLUMN
+)
+from inventory_views import build_dashboard, EXPIRY_THRESHOLD_DAYS
+from rate_limit import ThrottledBackend
+from sharding import ShardConfig, ShardedUsageLog, fetch_shards, merge_reagent_db, run_concurrently
+from stock_ledger import StockLedger
+from storage_backend import GspreadBackend, LocalBackend, write_text_atomic
+from usage_compaction import UsageSnapshot, read_usage_snapshot
+
+DIGEST_DIR = os.path.join(".inventory_cache", "digest")
+SNAPSHOT_FILE = "dashboard_snapshot.parquet"
+SNAPSHOT_META_KEY = b"inventory_digest"
+DIGEST_FORMATS = ["json", "csv", "html"]
+
+# (알림 표 이름 / 제목 / 보여줄 컬럼 - 대시보드 '자동 알림' 과 같은 순서)
+ALERT_SECTIONS = [
+    ("expiring_soon", "유통기한 {days}일 이내 임박", ['제품명', 'Lot 번호', '유통기한 (YYYY-MM-DD)', '보관 위치', '현재 재고']),
+    ("expired", "유통기한 만료", ['제품명', 'Lot 번호', '유통기한 (YYYY-MM-DD)', '보관 위치', '현재 재고']),
+    ("low_stock", "재고 부족 (알림 기준 수량 이하)", ['제품명', 'Lot 번호', '현재 재고', '단위', '알림 기준 수량']),
+    ("out_of_stock", "재고 소진 (0 이하)", ['제품명', 'Lot 번호', '현재 재고', '단위']),
+    ("depleting", f"{DEPLETION_ALERT_DAYS}일 이내 소진 예상",
+     ['제품명', 'Lot 번호', '현재 재고', '단위', WEEKLY_RATE_COLUMN, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN]),
+]
+
+
+# (1) 백엔드 (앱과 같은 속도 제한 / 429·5xx 재시도를 거침 - usage_compaction.py 도 사용)
+def add_backend_arguments(parser):
+    parser.add_argument("--backend", choices=["gspread", "local"], default=os.environ.get("INVENTORY_BACKEND", "gspread"))
+    parser.add_argument("--credentials", help="서비스 계정 JSON 파일 경로 (없으면 GCP_JSON_BASE64 환경 변수)")
+    parser.add_argument("--local-dir", default=os.environ.get("INVENTORY_LOCAL_DIR", os.path.join(".inventory_cache", "local_sheets")))
+
+
+def open_backend(args):
+    if args.backend == "local":
+        return LocalBackend(directory=args.local_dir)
+    import gspread
+    if args.credentials:
+        client = gspread.service_account(filename=args.credentials)
+    elif os.environ.get("GCP_JSON_BASE64"):
+        client = gspread.service_account_from_dict(
+            json.loads(base64.b64decode(os.environ["GCP_JSON_BASE64"]).decode("utf-8"))
+        )
+    else:
+        raise SystemExit("Google 인증 정보가 없습니다. --credentials 또는 GCP_JSON_BASE64 를 지정하세요.")
+    return ThrottledBackend(GspreadBackend(client))
+
+
+# (2) 두 시트 읽기 (앱 로더와 같은 파서 / 같은 재고 원장 / 같은 사용 속도 집계)
+# (샤드 설정(INVENTORY_SHARDS)이 있으면 앱과 같이 모든 샤드를 동시에 읽어 합침 / 두 시트도 동시에 읽음)
+# (샤드마다 읽기 전에 revision 을 확인 - 반환의 inputs 는 스냅샷 메타에 기록)
+def load_inputs(backend, shard_config=None):
+    shard_config = shard_config or ShardConfig.load()
+    usage = ShardedUsageLog(shard_config.usage_log)
+    def read_reagent_shard(shard):
+        revision = backend.revision(shard.spreadsheet)
+        return revision, backend.worksheet(shard.spreadsheet, shard.tab).get_all_values()
+    read = run_concurrently({
+        "reagent_db": lambda: fetch_shards(shard_config.reagent_db, read_reagent_shard),
+        "usage_log": lambda: usage.sync(backend, probe=True),
+    })["reagent_db"]
+    values = {name: shard_values for name, (_, shard_values) in read.items()}
+    df_db = merge_reagent_db([
+        (values[shard.name][0], values[shard.name][1:]) if values[shard.name] else (None, [])
+        for shard in shard_config.reagent_db
+    ])
+
+    # (Usage_Log 압축 스냅샷의 누적 사용량 + 워터마크 이후 기록 - 스냅샷은 압축 대상 샤드가 있을 때만)
+    compacted = any(shard.compacted for shard in shard_config.usage_log)
+    snapshot = read_usage_snapshot(backend) if compacted else UsageSnapshot()
+    ledger = StockLedger()
+    ledger.rebuild_received(df_db)
+    ledger.rebuild_usage(usage.merged(snapshot), snapshot.totals)
+    consumption = ConsumptionTracker()
+    consumption.rebuild(usage.merged())
+    revisions = {"reagent_db": {name: revision for name, (revision, _) in read.items()}, "usage_log": usage.revisions}
+    return df_db, ledger, consumption, revisions, snapshot.watermark
+
+
+# (스냅샷 입력: 날짜 / 알림 기준 / 샤드별 revision / 압축 워터마크 - 같으면 같은 시트 내용으로 계산한 결과)
+# (revision 을 하나라도 모르면 None - 스냅샷을 쓰지 않음)
+def snapshot_inputs(today, expiry_threshold_days, revisions, watermark):
+    if any(revision is None for shards in revisions.values() for revision in shards.values()):
+        return None
+    return {
+        "today": str(pd.Timestamp(today).date()),
+        "expiry_threshold_days": int(expiry_threshold_days),
+        "revisions": {dataset: {name: str(revision) for name, revision in shards.items()} for dataset, shards in revisions.items()},
+        "watermark": None if watermark is None else str(watermark),
+    }
+
+
+# (3) 알림 계산 + 파일 쓰기 / 반환: {파일 종류: 경로}
+def run_digest(backend, output_dir=DIGEST_DIR, formats=DIGEST_FORMATS,
+               expiry_threshold_days=EXPIRY_THRESHOLD_DAYS, now=None):
+    now = now or datetime.now()
+    today = pd.Timestamp(now.date())
+    df_db, ledger, consumption, revisions, watermark = load_inputs(backend)
+    meta = {
+        "generated_at": now.isoformat(timespec="seconds"),
+        "today": str(today.date()),
+        "expiry_threshold_days": expiry_threshold_days,
+        "inputs": snapshot_inputs(today, expiry_threshold_days, revisions, watermark),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+    tables = []
+    # (마스터 DB 가 비어 있으면 대시보드도 계산하지 않으므로 스냅샷 없이 빈 요약만 씀)
+    if not df_db.empty:
+        dashboard = build_dashboard(df_db, ledger, today, expiry_threshold_days, consumption)
+        tables = alert_tables(dashboard["alerts"], expiry_threshold_days)
+        written["snapshot"] = write_snapshot(os.path.join(output_dir, SNAPSHOT_FILE), dashboard["inventory"], meta)
+    if "json" in formats:
+        payload = dict(meta, alerts=[
+            {"name": name, "title": title, "count": len(table),
+             "rows": json.loads(table.to_json(orient="records", force_ascii=False))}
+            for name, title, table in tables
+        ])
+        written["json"] = write_text_atomic(
+            os.path.join(output_dir, "digest.json"), json.dumps(payload, ensure_ascii=False, indent=2)
+        )
+    if "csv" in formats:
+        combined = pd.concat(
+            [table.assign(알림=title) for _, title, table in tables], ignore_index=True
+        ) if tables else pd.DataFrame(columns=["알림"])
+        combined = combined[["알림"] + [col for col in combined.columns if col != "알림"]]
+        # (엑셀에서 한글이 깨지지 않도록 BOM 포함)
+        written["csv"] = write_text_atomic(os.path.join(output_dir, "digest.csv"), combined.to_csv(index=False), "utf-8-sig")
+    if "html" in formats:
+        written["html"] = write_text_atomic(os.path.join(output_dir, "digest.html"), render_html(meta, tables))
+    return written
+
+
+def alert_tables(alerts, expiry_threshold_days):
+    tables = []
+    for name, title, columns in ALERT_SECTIONS:
+        table = alerts[name]
+        if table.empty:
+            continue
+        table = table[columns].rename(columns={'유통기한 (YYYY-MM-DD)': '유통기한'}).reset_index(drop=True)
+        tables.append((name, title.format(days=expiry_threshold_days), table))
+    return tables
+
+
+def render_html(meta, tables):
+    sections = [
+        f"<h2>{title} ({len(table)})</h2>\n" + table.to_html(index=False, na_rep="", float_format=lambda v: f"{v:.2f}")
+        for _, title, table in tables
+    ] or ["<p>✅ 모든 재고가 양호합니다!</p>"]
+    return (
+        "<!DOCTYPE html>\n<html lang=\"ko\"><head><meta charset=\"utf-8\"><title>재고 알림 요약</title></head><body>\n"
+        f"<h1>재고 알림 요약 ({meta['today']})</h1>\n<p>생성 시각: {meta['generated_at']}</p>\n"
+        + "\n".join(sections) + "\n</body></html>\n"
+    )
+
+
+# (4) 스냅샷: 재고 현황 표 + 메타(입력 포함)를 Parquet 파일 하나에 (write_text_atomic 과 같이 임시 파일에 쓰고 교체)
+def write_snapshot(path, df_inventory, meta):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(df_inventory, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SNAPSHOT_META_KEY] = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+# (입력이 같을 때만 재고 현황 DataFrame 을 돌려줌 - 메타는 파일 끝의 스키마만 읽어 확인)
+def read_snapshot(path, inputs):
+    if inputs is None or not os.path.exists(path):
+        return None
+    import pyarrow.parquet as pq
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        meta = json.loads(metadata.get(SNAPSHOT_META_KEY, b"{}").decode("utf-8"))
+        if meta.get("inputs") != inputs:
+            return None
+        return pq.read_table(path).to_pandas()
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="재고 알림 요약 + 대시보드 스냅샷 생성")
+    add_backend_arguments(parser)
+    parser.add_argument("--output-dir", default=DIGEST_DIR)
+    parser.add_argument("--formats", nargs="+", choices=DIGEST_FORMATS, default=DIGEST_FORMATS)
+    parser.add_argument("--expiry-threshold-days", type=int, default=EXPIRY_THRESHOLD_DAYS)
+    args = parser.parse_args(argv)
+
+    written = run_digest(open_backend(args), args.output_dir, args.formats, args.expiry_threshold_days)
+    for kind, path in written.items():
+        print(f"{kind}: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# --- 실험실 재고 관리기: 시트 원본 행 변환(ingest) 측정 ---
+# (1) 변환: 셀마다 numericise 하는 rows_to_frame + parse_* (v72 까지의 경로) 와
+#     컬럼별로 바로 변환하는 reagent_db_from_values / usage_log_from_values 를 행 수별로 비교합니다. (결과가 같은지도 확인)
+# (2) 읽기: LocalBackend(지연 흉내)에서 두 시트를 차례로 읽을 때와 run_concurrently 로 동시에 읽을 때를 비교합니다.
+#
+#   python benchmarks/bench_ingest.py                          # 100k, 1M 행
+#   python benchmarks/bench_ingest.py --sizes 10000 200000 --latency 0.5
+#
+# --sizes 는 Usage_Log 행 수이며, Reagent_DB 는 그 1/10 (최소 10개 Lot) 로 만듭니다.
+import argparse
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_inventory import make_reagent_rows, make_usage_rows, REAGENT_DB_NAME, REAGENT_DB_TAB, USAGE_LOG_NAME, USAGE_LOG_TAB
+from inventory_data import (
+    REAGENT_DB_COLUMNS, USAGE_LOG_COLUMNS, UsageLogSync, parse_reagent_db, parse_usage_log, reagent_db_from_values,
+    rows_to_frame, usage_log_from_values
+)
+from sharding import run_concurrently
+from storage_backend import LocalBackend
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_parse(n_rows, repeat, seed):
+    rng = random.Random(seed)
+    reagent_rows = make_reagent_rows(max(n_rows // 10, 10), rng)
+    usage_rows = make_usage_rows(n_rows, reagent_rows, rng)
+    print(f"== 변환: Reagent_DB {len(reagent_rows):,} 행 / Usage_Log {len(usage_rows):,} 행 ==")
+    # (예전 경로의 형식 추론 to_datetime 경고는 측정과 무관하므로 숨김)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        old_db_time, old_db = timed(lambda: parse_reagent_db(rows_to_frame(REAGENT_DB_COLUMNS, reagent_rows)), repeat)
+        old_log_time, old_log = timed(lambda: parse_usage_log(rows_to_frame(USAGE_LOG_COLUMNS, usage_rows)), repeat)
+    new_db_time, new_db = timed(lambda: reagent_db_from_values([(REAGENT_DB_COLUMNS, reagent_rows)]), repeat)
+    new_log_time, new_log = timed(lambda: usage_log_from_values(USAGE_LOG_COLUMNS, usage_rows), repeat)
+    print(f"  {'':<12}{'rows_to_frame + parse':>24}{'컬럼별 변환':>16}{'':>10}결과 동일")
+    for name, old_time, new_time, same in [
+        ("Reagent_DB", old_db_time, new_db_time, old_db.equals(new_db)),
+        ("Usage_Log", old_log_time, new_log_time, old_log.equals(new_log)),
+    ]:
+        print(f"  {name:<12}{old_time * 1000:>21.1f} ms{new_time * 1000:>13.1f} ms{old_time / new_time:>8.1f}배  {same}")
+
+
+def bench_load(args):
+    rng = random.Random(args.seed)
+    reagent_rows = make_reagent_rows(max(args.load_rows // 10, 10), rng)
+    backend = LocalBackend(base_latency=args.latency, per_row_latency=args.per_row_latency)
+    backend.set_values(REAGENT_DB_NAME, REAGENT_DB_TAB, [REAGENT_DB_COLUMNS] + reagent_rows)
+    backend.set_values(USAGE_LOG_NAME, USAGE_LOG_TAB, [USAGE_LOG_COLUMNS] + make_usage_rows(args.load_rows, reagent_rows, rng))
+    db_sheet = backend.worksheet(REAGENT_DB_NAME, REAGENT_DB_TAB)
+    log_sheet = backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB)
+
+    def load_reagent_db():
+        values = db_sheet.get_all_values()
+        return reagent_db_from_values([(values[0], values[1:])])
+    def load_usage_log():
+        return UsageLogSync().sync(log_sheet)
+    sequential, _ = timed(lambda: (load_reagent_db(), load_usage_log()), args.repeat)
+    concurrent, _ = timed(lambda: run_concurrently({"reagent_db": load_reagent_db, "usage_log": load_usage_log}), args.repeat)
+    print(f"== 읽기: 두 시트 (Usage_Log {args.load_rows:,} 행 / 호출당 지연 {args.latency}s) ==")
+    print(f"  차례로 읽기              {sequential * 1000:>10.1f} ms")
+    print(f"  동시에 읽기              {concurrent * 1000:>10.1f} ms  ({sequential / concurrent:.1f}배)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="시트 원본 행 변환 / 두 시트 동시 읽기 측정")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--load-rows", type=int, default=50_000, help="읽기 비교에 쓸 Usage_Log 행 수")
+    parser.add_argument("--latency", type=float, default=0.3, help="시트 호출 1회당 지연(초)")
+    parser.add_argument("--per-row-latency", type=float, default=0.00001, help="행 1개당 추가 지연(초)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for n_rows in args.sizes:
+        bench_parse(n_rows, args.repeat, args.seed)
+    bench_load(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# --- 실험실 재고 관리기: 성능 측정 ---
+# Google 인증 없이 LocalBackend(로컬 대역 시트)에 가상 데이터를 채우고
+# 로더 / 대시보드 계산 / 검색 시간을 행 수별로 측정합니다.
+#
+#   python benchmarks/bench_inventory.py                       # 1k, 100k, 1M 행
+#   python benchmarks/bench_inventory.py --sizes 1000 10000 --latency 0.2
+#   python benchmarks/bench_inventory.py --output benchmarks/history.jsonl   # 결과 누적 기록
+#
+# --sizes 는 Usage_Log 행 수이며, Reagent_DB 는 그 1/10 (최소 10개 Lot) 로 만듭니다.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from inventory_data import REAGENT_DB_COLUMNS, USAGE_LOG_COLUMNS, UsageLogSync, reagent_db_from_values
+from inventory_views import build_dashboard
+from search_index import SearchIndex
+from stock_ledger import StockLedger
+from storage_backend import LocalBackend
+
+REAGENT_DB_NAME, REAGENT_DB_TAB = "Reagent_DB", "Master"
+USAGE_LOG_NAME, USAGE_LOG_TAB = "Usage_Log", "Log"
+
+MANUFACTURERS = ["Gibco", "Thermo Fisher", "Merck", "Sigma", "Corning", "Invitrogen"]
+UNITS = ["개", "box", "kit", "mL", "L", "g", "kg"]
+LOCATIONS = ["4도 냉장고 A-1", "4도 냉장고 A-2", "-20도 B-1", "-80도 C-3", "상온 선반 D"]
+USERS = ["김연구", "이연구", "박연구", "최연구"]
+
+
+# (1) 가상 데이터
+def make_reagent_rows(n_lots, rng):
+    base = datetime(2024, 1, 1)
+    rows = []
+    for i in range(n_lots):
+        rows.append([
+            f"Product-{i % max(n_lots // 5, 1):05d}",
+            rng.choice(MANUFACTURERS),
+            f"CAT-{i % max(n_lots // 5, 1):05d}",
+            f"LOT-{i:07d}",
+            str(rng.randint(10, 500)),
+            rng.choice(UNITS),
+            (base + timedelta(days=rng.randint(0, 900))).strftime("%Y-%m-%d"),
+            rng.choice(LOCATIONS),
+            (base + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"),
+            rng.choice(USERS),
+            str(rng.randint(1, 20)),
+            "예" if rng.random() < 0.05 else "아니요",
+        ])
+    return rows
+
+
+def make_usage_rows(n_rows, reagent_rows, rng):
+    base = datetime(2024, 1, 1)
+    rows = []
+    for i in range(n_rows):
+        lot = reagent_rows[rng.randrange(len(reagent_rows))]
+        rows.append([
+            (base + timedelta(seconds=30 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            lot[0],
+            lot[3],
+            str(rng.randint(1, 5)),
+            rng.choice(USERS),
+            "",
+        ])
+    return rows
+
+
+def _time(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+# (2) 측정 항목
+def run_size(n_rows, repeat, latency, per_row_latency, seed=0):
+    rng = random.Random(seed)
+    n_lots = max(n_rows // 10, 10)
+    reagent_rows = make_reagent_rows(n_lots, rng)
+    usage_rows = make_usage_rows(n_rows, reagent_rows, rng)
+
+    backend = LocalBackend(base_latency=latency, per_row_latency=per_row_latency)
+    backend.set_values(REAGENT_DB_NAME, REAGENT_DB_TAB, [REAGENT_DB_COLUMNS] + reagent_rows)
+    backend.set_values(USAGE_LOG_NAME, USAGE_LOG_TAB, [USAGE_LOG_COLUMNS] + usage_rows)
+    db_sheet = backend.worksheet(REAGENT_DB_NAME, REAGENT_DB_TAB)
+    log_sheet = backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB)
+    ledger = StockLedger()
+    results = {}
+
+    def load_reagent_db():
+        values = db_sheet.get_all_values()
+        df = reagent_db_from_values([(values[0], values[1:])])
+        ledger.rebuild_received(df)
+        return df
+    results["load_reagent_db"], df_db = _time(load_reagent_db, repeat)
+
+    def load_usage_log_full():
+        sync = UsageLogSync()
+        df = sync.sync(log_sheet)
+        ledger.rebuild_usage(df)
+        return sync
+    results["load_usage_log (full)"], sync = _time(load_usage_log_full, repeat)
+
+    def load_usage_log_tail():
+        log_sheet.append_rows(make_usage_rows(10, reagent_rows, rng))
+        return sync.sync(log_sheet)
+    results["load_usage_log (tail +10)"], _ = _time(load_usage_log_tail, repeat)
+
+    # (변경이 없으면 revision 확인 1회로 끝남)
+    sync.sync(log_sheet, backend.revision(USAGE_LOG_NAME))
+    def load_usage_log_unchanged():
+        return sync.sync(log_sheet, backend.revision(USAGE_LOG_NAME))
+    results["load_usage_log (unchanged, probe)"], _ = _time(load_usage_log_unchanged, repeat)
+
+    today = pd.Timestamp(datetime(2025, 6, 1).date())
+    def dashboard():
+        return build_dashboard(df_db, ledger, today)
+    results["dashboard inventory+alerts"], _ = _time(dashboard, repeat)
+
+    results["search index build"], index = _time(lambda: SearchIndex(df_db), repeat)
+
+    queries = ["product-0004", "gibco", "lot-00001", "cat-0", "lot-0000l23"]
+    def search():
+        return [index.search(q) for q in queries]
+    search_time, _ = _time(search, repeat)
+    results["search (per query)"] = search_time / len(queries)
+
+    return {"rows": n_rows, "lots": n_lots, "timings": results, "calls": dict(backend.calls)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="실험실 재고 관리기 성능 측정")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="시트 호출 1회당 지연(초)")
+    parser.add_argument("--per-row-latency", type=float, default=0.0, help="행 1개당 추가 지연(초)")
+    parser.add_argument("--output", help="결과를 JSON Lines 로 누적 기록할 파일")
+    args = parser.parse_args(argv)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "latency": args.latency,
+        "per_row_latency": args.per_row_latency,
+        "results": [],
+    }
+    for n_rows in args.sizes:
+        result = run_size(n_rows, args.repeat, args.latency, args.per_row_latency)
+        run["results"].append(result)
+        print(f"\n== Usage_Log {result['rows']:,} 행 / Reagent_DB {result['lots']:,} Lot ==")
+        for name, seconds in result["timings"].items():
+            print(f"  {name:<30} {seconds * 1000:>10.2f} ms")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
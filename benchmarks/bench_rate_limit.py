@@ -0,0 +1,106 @@
+# --- 실험실 재고 관리기: 요청 속도 제한 / 재시도 / 읽기 합치기 측정 ---
+# 여러 세션이 동시에 Reagent_DB 를 읽고(변경 확인 포함) 가끔 사용 기록을 쓰는 부하를
+# 할당량(분당 요청 수)과 무작위 429 / 5xx 를 흉내 내는 LocalBackend 에 걸고,
+# 백엔드를 그대로 쓸 때와 ThrottledBackend 를 거칠 때를 비교합니다.
+#
+#   python benchmarks/bench_rate_limit.py
+#   python benchmarks/bench_rate_limit.py --sessions 30 --seconds 20 --quota 120 --error-rate 0.05
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_inventory import make_reagent_rows, make_usage_rows, REAGENT_DB_NAME, REAGENT_DB_TAB, USAGE_LOG_NAME, USAGE_LOG_TAB
+from inventory_data import REAGENT_DB_COLUMNS, USAGE_LOG_COLUMNS
+from metrics import Metrics
+from rate_limit import ThrottledBackend
+from storage_backend import LocalBackend
+
+
+def make_backend(args):
+    rng = random.Random(args.seed)
+    reagent_rows = make_reagent_rows(200, rng)
+    backend = LocalBackend(
+        base_latency=args.latency, error_rate=args.error_rate, error_codes=(429, 500, 503), seed=args.seed,
+        quota_per_minute={"read": args.quota, "write": args.quota},
+    )
+    # (set_values 는 호출로 세지 않고 할당량 / 오류 흉내도 거치지 않음)
+    backend.set_values(REAGENT_DB_NAME, REAGENT_DB_TAB, [REAGENT_DB_COLUMNS] + reagent_rows)
+    backend.set_values(USAGE_LOG_NAME, USAGE_LOG_TAB, [USAGE_LOG_COLUMNS] + make_usage_rows(100, reagent_rows, rng))
+    return backend, reagent_rows
+
+
+# (세션 1개: 변경 확인 -> Reagent_DB 읽기, write_every 번에 1번 사용 기록 append)
+def session(backend, reagent_rows, deadline, write_every, seed, results):
+    rng = random.Random(seed)
+    done = 0
+    while time.monotonic() < deadline:
+        try:
+            backend.revision(REAGENT_DB_NAME)
+            backend.worksheet(REAGENT_DB_NAME, REAGENT_DB_TAB).get_all_values()
+            if rng.randrange(write_every) == 0:
+                backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB).append_rows(make_usage_rows(1, reagent_rows, rng))
+            done += 1
+            results["ok"] += 1
+        except Exception as e:
+            results[f"error {getattr(e, 'code', type(e).__name__)}"] += 1
+            time.sleep(0.1)
+    return done
+
+
+def run(name, backend, local, reagent_rows, args):
+    results = Counter()
+    deadline = time.monotonic() + args.seconds
+    threads = [
+        threading.Thread(target=session, args=(backend, reagent_rows, deadline, args.write_every, args.seed + i, results))
+        for i in range(args.sessions)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    print(f"== {name} ({elapsed:.1f}s) ==")
+    print(f"  완료된 작업          {results.pop('ok', 0)}")
+    for key, count in sorted(results.items()):
+        print(f"  호출자가 받은 {key:<8} {count}")
+    print(f"  백엔드 호출          {dict(local.calls)}")
+    print(f"  백엔드가 낸 오류     {sum(local.errors.values())} ({dict(Counter(code for _, code in local.errors.elements()))})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="요청 속도 제한 / 재시도 / 읽기 합치기 측정")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--quota", type=int, default=120, help="분당 읽기/쓰기 요청 한도 (흉내 낼 할당량 = 제한기 크기)")
+    parser.add_argument("--latency", type=float, default=0.05, help="호출 1회당 지연(초)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="무작위 429 / 5xx 비율")
+    parser.add_argument("--write-every", type=int, default=5)
+    parser.add_argument("--base-backoff", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    local, reagent_rows = make_backend(args)
+    run("백엔드 직접 호출", local, local, reagent_rows, args)
+
+    local, reagent_rows = make_backend(args)
+    metrics = Metrics()
+    throttled = ThrottledBackend(
+        local, quota_per_minute={"read": args.quota, "write": args.quota}, metrics=metrics, base_backoff=args.base_backoff
+    )
+    run("ThrottledBackend", throttled, local, reagent_rows, args)
+    snapshot = metrics.snapshot()
+    retries = {tuple(c["labels"].values()): int(c["value"]) for c in snapshot["counters"] if c["name"] == "sheets_retries_total"}
+    print(f"  재시도               {sum(retries.values())} {retries}")
+    print(f"  합쳐진 읽기          {throttled.in_flight.coalesced}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
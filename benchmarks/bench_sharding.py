@@ -0,0 +1,98 @@
+# --- 실험실 재고 관리기: 샤드 병렬 읽기 측정 ---
+# Reagent_DB / Usage_Log 를 여러 샤드(스프레드시트)로 나눈 LocalBackend 에서
+# 샤드를 하나씩 차례로 읽을 때와 fetch_shards(스레드 풀)로 동시에 읽을 때의 전체 로드 시간을 비교합니다.
+# (샤드 크기를 일부러 다르게 만들어, 동시에 읽으면 '가장 느린 샤드' 시간에 가까워지는지 확인)
+#
+#   python benchmarks/bench_sharding.py
+#   python benchmarks/bench_sharding.py --shards 6 --rows 20000 --latency 0.3 --per-row-latency 0.00002
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_inventory import make_reagent_rows, make_usage_rows
+from inventory_data import REAGENT_DB_COLUMNS, USAGE_LOG_COLUMNS
+from local_mirror import REAGENT_DB_KEY, USAGE_LOG_KEY
+from rate_limit import ThrottledBackend
+from sharding import Shard, ShardConfig, ShardedUsageLog, fetch_shards, merge_reagent_db
+from storage_backend import LocalBackend
+
+
+# (샤드 i 의 Usage_Log 행 수 = rows * (i + 1) / shards - 마지막 샤드가 가장 큼)
+def make_backend(args):
+    rng = random.Random(args.seed)
+    backend = LocalBackend(base_latency=args.latency, per_row_latency=args.per_row_latency)
+    reagent_shards, usage_shards = [], []
+    for i in range(args.shards):
+        name = f"lab{i + 1}"
+        reagent_rows = make_reagent_rows(max(args.rows // 10 * (i + 1) // args.shards, 10), rng)
+        usage_rows = make_usage_rows(args.rows * (i + 1) // args.shards, reagent_rows, rng)
+        backend.set_values(f"Reagent_DB_{name}", "Master", [REAGENT_DB_COLUMNS] + reagent_rows)
+        backend.set_values(f"Usage_Log_{name}", "Log", [USAGE_LOG_COLUMNS] + usage_rows)
+        reagent_shards.append(Shard(REAGENT_DB_KEY, name, f"Reagent_DB_{name}", "Master"))
+        usage_shards.append(Shard(USAGE_LOG_KEY, name, f"Usage_Log_{name}", "Log"))
+    # (앱과 같이 속도 제한기를 거침 - 할당량은 측정에 걸리지 않을 만큼 크게)
+    throttled = ThrottledBackend(backend, quota_per_minute={"read": 100_000, "write": 100_000})
+    return throttled, ShardConfig(reagent_shards, usage_shards)
+
+
+# (Reagent_DB 전체 읽기 + 파싱, Usage_Log 전체 동기화 - 앱의 콜드 스타트와 같은 일)
+def load_all(backend, config, parallel):
+    def read_values(shard):
+        return backend.worksheet(shard.spreadsheet, shard.tab).get_all_values()
+    if parallel:
+        values = fetch_shards(config.reagent_db, read_values)
+    else:
+        values = {shard.name: read_values(shard) for shard in config.reagent_db}
+    df_db = merge_reagent_db([(values[s.name][0], values[s.name][1:]) for s in config.reagent_db])
+    usage = ShardedUsageLog(config.usage_log)
+    if parallel:
+        usage.sync(backend, probe=False)
+    else:
+        for shard in config.usage_log:
+            usage.syncs[shard.name].sync(backend.worksheet(shard.spreadsheet, shard.tab))
+    return df_db, usage.merged()
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="샤드 병렬 읽기 측정")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=10_000, help="가장 큰 샤드의 Usage_Log 행 수")
+    parser.add_argument("--latency", type=float, default=0.2, help="시트 호출 1회당 지연(초)")
+    parser.add_argument("--per-row-latency", type=float, default=0.00002, help="행 1개당 추가 지연(초)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    backend, config = make_backend(args)
+    # (worksheet 핸들은 처음 한 번만 열리므로 미리 열어 두고 측정)
+    for shard in config.reagent_db + config.usage_log:
+        backend.worksheet(shard.spreadsheet, shard.tab)
+
+    slowest, _ = timed(lambda: load_all(backend, ShardConfig(config.reagent_db[-1:], config.usage_log[-1:]), False), args.repeat)
+    sequential, (df_db, df_log) = timed(lambda: load_all(backend, config, False), args.repeat)
+    parallel, (df_db_p, df_log_p) = timed(lambda: load_all(backend, config, True), args.repeat)
+    assert df_db.equals(df_db_p) and len(df_log) == len(df_log_p)
+
+    print(f"== 샤드 {args.shards}개 / Reagent_DB {len(df_db):,} Lot / Usage_Log {len(df_log):,} 행 ==")
+    print(f"  가장 큰 샤드 하나만      {slowest * 1000:>10.1f} ms")
+    print(f"  차례로 읽기              {sequential * 1000:>10.1f} ms")
+    print(f"  동시에 읽기 (스레드 풀)  {parallel * 1000:>10.1f} ms  ({sequential / parallel:.1f}배)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
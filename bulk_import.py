@@ -0,0 +1,103 @@
+# --- 실험실 재고 관리기: 신규 Lot 일괄 등록 (CSV / Excel) ---
+# Reagent_DB A~L열과 같은 컬럼의 파일을 읽어, 탭 1 등록 폼과 같은 규칙으로 한 번에 검증하고
+# append_rows 로 나눠서(chunk) 저장합니다.
+import io
+from datetime import datetime
+
+import pandas as pd
+
+from inventory_data import REAGENT_DB_COLUMNS, UNIT_OPTIONS
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_REQUIRED_COLUMNS = ["제품명", "제조사", "Cat. No.", "Lot 번호", "최초 수량", "단위", "등록자", "알림 기준 수량"]
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+# (1) 파일 읽기 (모든 값은 문자열로 읽고 검증 단계에서 변환)
+def read_import_file(data, filename):
+    if filename.lower().endswith(".xlsx"):
+        try:
+            df = pd.read_excel(io.BytesIO(data), dtype=str, keep_default_na=False)
+        except ImportError:
+            raise ImportFileError("엑셀 파일을 읽으려면 openpyxl 패키지가 필요합니다. (CSV 로 저장해서 올려주세요)")
+    else:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+    df.columns = [str(col).strip() for col in df.columns]
+    missing = [col for col in IMPORT_REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ImportFileError(f"파일에 {missing} 컬럼이 없습니다. (Reagent_DB A~L열과 같은 헤더 필요)")
+    for col in REAGENT_DB_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    return df[REAGENT_DB_COLUMNS].apply(lambda col: col.astype(str).str.strip())
+
+
+# (2) 검증 (탭 1 폼과 같은 규칙을 컬럼 단위로 한 번에 적용)
+# 반환: (시트에 쓸 행 목록, 오류 DataFrame[파일 행 번호, 사유])
+def validate_import(df, now=None):
+    now = now or datetime.now()
+    qty = pd.to_numeric(df['최초 수량'], errors='coerce')
+    alert_qty = pd.to_numeric(df['알림 기준 수량'], errors='coerce')
+    expiry = pd.to_datetime(df['유통기한'].where(df['유통기한'] != ""), errors='coerce')
+    default_expiry = (now + pd.DateOffset(years=1)).strftime("%Y-%m-%d")
+
+    rules = [
+        (df['제품명'] == "", "제품명 없음"),
+        (df['제조사'] == "", "제조사 없음"),
+        (df['Cat. No.'] == "", "Cat. No. 없음"),
+        (df['Lot 번호'] == "", "Lot 번호 없음"),
+        (df['등록자'] == "", "등록자 없음"),
+        (~(qty > 0), "최초 수량은 0보다 커야 함"),
+        (~(alert_qty >= 0), "알림 기준 수량은 0 이상이어야 함"),
+        (~df['단위'].isin(UNIT_OPTIONS), f"단위는 {UNIT_OPTIONS} 중 하나"),
+        ((df['유통기한'] != "") & expiry.isna(), "유통기한 날짜 형식 오류"),
+    ]
+    reasons = pd.Series("", index=df.index)
+    for mask, reason in rules:
+        reasons = reasons.where(~mask, reasons + reason + "; ")
+    invalid = reasons != ""
+    errors = pd.DataFrame({
+        "행 번호": df.index[invalid.to_numpy()] + 2,   # (파일 1행 = 헤더)
+        "사유": reasons[invalid].str.rstrip("; "),
+    })
+
+    valid = ~invalid
+    rows = pd.DataFrame({
+        "제품명": df['제품명'],
+        "제조사": df['제조사'],
+        "Cat. No.": df['Cat. No.'],
+        "Lot 번호": df['Lot 번호'],
+        "최초 수량": qty.astype(float),
+        "단위": df['단위'],
+        "유통기한": expiry.dt.strftime("%Y-%m-%d").fillna(default_expiry),
+        "보관 위치": df['보관 위치'],
+        "등록 날짜": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "등록자": df['등록자'],
+        "알림 기준 수량": alert_qty.astype(float),
+        "알림 무시": "아니요",
+    })[valid]
+    return rows.values.tolist(), errors
+
+
+# (3) 나눠서 저장: 성공한 행 수를 돌려주고, 실패하면 그때까지 저장된 행 수를 예외에 담습니다.
+class PartialImportError(RuntimeError):
+    def __init__(self, written, error):
+        super().__init__(f"{written}행 저장 후 실패: {error}")
+        self.written = written
+        self.error = error
+
+
+def append_in_chunks(sheet, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            sheet.append_rows(chunk)
+        except Exception as e:
+            raise PartialImportError(written, e)
+        written += len(chunk)
+    return written
@@ -0,0 +1,91 @@
+# --- 실험실 재고 관리기: 사용 속도 / 소진 예상 ---
+# Usage_Log 의 Timestamp / 사용량 을 (제품명, Lot 번호) 별 하루 단위 합계로 모아 둡니다.
+# - 전체 재구성은 Usage_Log 를 통째로 읽을 때만 하고, 새 사용 기록은 그 행들만 하루 단위로 묶어 더합니다.
+# - 사용 속도는 최근 기간(7일 / 4주)에 해당하는 날짜 묶음만 모아서 계산하므로 전체 이력 길이와 무관합니다.
+# - 대기열(write_queue)에 있는 저장 전 사용량은 속도 계산에 넣지 않습니다. (시트에 쓰인 기록만 반영)
+# - source: Usage_Log 샤드 이름 (샤드별로 따로 보관 - 한 샤드를 다시 만들어도 다른 샤드 몫은 그대로)
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+DAILY_RATE_WINDOW_DAYS = 7
+WEEKLY_RATE_WINDOW_DAYS = 28
+DEPLETION_ALERT_DAYS = 14
+
+DAILY_RATE_COLUMN = "일 사용량 (최근 7일 평균)"
+WEEKLY_RATE_COLUMN = "주 사용량 (최근 4주 평균)"
+PRODUCT_WEEKLY_RATE_COLUMN = "제품 주 사용량 (최근 4주 평균)"
+DAYS_TO_STOCKOUT_COLUMN = "소진 예상 (일)"
+DAYS_TO_EXPIRY_COLUMN = "유통기한까지 (일)"
+
+
+class ConsumptionTracker:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.daily = {}      # source -> 날짜(Timestamp, 자정) -> {(제품명, Lot 번호): 그날 사용량 합계}
+        self.version = 0     # 값이 바뀔 때마다 1씩 증가 (대시보드 캐시 키)
+
+    # (1) 전체 재구성 (Usage_Log 전체 교체 시)
+    def rebuild(self, df_log, source=None):
+        daily = self._bucket(df_log)
+        with self._lock:
+            self.daily[source] = daily
+            self.version += 1
+
+    # (2) 증분 반영 (새 행들만 하루 단위로 묶어 더함)
+    def apply_frame(self, df_new, source=None):
+        buckets = self._bucket(df_new)
+        if not buckets:
+            return
+        with self._lock:
+            daily = self.daily.setdefault(source, {})
+            for day, lots in buckets.items():
+                target = daily.setdefault(day, {})
+                for key, qty in lots.items():
+                    target[key] = target.get(key, 0.0) + qty
+            self.version += 1
+
+    # (3) 최근 days 일(오늘 포함)의 하루 단위 합계 -> DataFrame[제품명, Lot 번호, 날짜, 사용량]
+    def window(self, today, days):
+        since = today - pd.Timedelta(days=days - 1)
+        with self._lock:
+            rows = [
+                (product, lot, day, qty)
+                for daily in self.daily.values()
+                for day, lots in daily.items() if since <= day <= today
+                for (product, lot), qty in lots.items()
+            ]
+        frame = pd.DataFrame(rows, columns=['제품명', 'Lot 번호', '날짜', '사용량'])
+        return frame.astype({'날짜': 'datetime64[ns]', '사용량': 'float64'})
+
+    @staticmethod
+    def _bucket(df):
+        buckets = defaultdict(dict)
+        if df is None or df.empty:
+            return buckets
+        days = pd.to_datetime(df['Timestamp'], errors='coerce').dt.normalize()
+        grouped = pd.DataFrame({
+            '제품명': df['제품명'].astype(str),
+            'Lot 번호': df['Lot 번호'].astype(str),
+            '날짜': days,
+            '사용량': df['사용량'].astype('float64'),
+        }).groupby(['날짜', '제품명', 'Lot 번호'])['사용량'].sum()
+        for (day, product, lot), qty in grouped.items():
+            buckets[day][(product, lot)] = float(qty)
+        return buckets
+
+
+# (4) Lot 별 / 제품별 사용 속도
+# 반환: (Lot 별 DataFrame[index=(제품명, Lot 번호)], 제품별 Series[index=제품명])
+def consumption_rates(tracker, today):
+    recent = tracker.window(today, WEEKLY_RATE_WINDOW_DAYS)
+    short_since = today - pd.Timedelta(days=DAILY_RATE_WINDOW_DAYS - 1)
+    recent['최근 7일'] = recent['사용량'].where(recent['날짜'] >= short_since, 0.0)
+    by_lot = recent.groupby(['제품명', 'Lot 번호'])[['사용량', '최근 7일']].sum()
+    lot_rates = pd.DataFrame({
+        DAILY_RATE_COLUMN: by_lot['최근 7일'] / DAILY_RATE_WINDOW_DAYS,
+        WEEKLY_RATE_COLUMN: by_lot['사용량'] / (WEEKLY_RATE_WINDOW_DAYS / 7),
+    })
+    product_rates = recent.groupby('제품명')['사용량'].sum() / (WEEKLY_RATE_WINDOW_DAYS / 7)
+    return lot_rates, product_rates.rename(PRODUCT_WEEKLY_RATE_COLUMN)
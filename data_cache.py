@@ -0,0 +1,35 @@
+# --- 실험실 재고 관리기: 데이터셋별 버전 캐시 ---
+# st.cache_data.clear() 로 모든 데이터를 한꺼번에 버리는 대신, 데이터셋마다 버전 번호로 캐시합니다.
+# - 버전이 같으면 모든 세션이 같은 결과 객체를 공유합니다. (세션별 복사 없음 - 읽기 전용으로 사용)
+# - 버전이 바뀌면 그 데이터셋만 다시 만들고, 동시에 들어온 세션들은 한 번의 재계산을 기다려 공유합니다.
+import threading
+from collections import defaultdict
+
+
+class DatasetCache:
+    def __init__(self):
+        self._entries = {}                       # key -> (version, value)
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    # key: 데이터셋 이름 (또는 (이름, 파생 뷰) 튜플) / version: 원본 데이터 버전 / build: 다시 만들 함수
+    def get(self, key, version, build):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits[key] += 1
+            return entry[1]
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits[key] += 1
+                return entry[1]
+            self.misses[key] += 1
+            value = build()
+            self._entries[key] = (version, value)
+            return value
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks[key]
@@ -1,25 +1,70 @@
 import streamlit as st
 import gspread 
+from gspread.utils import rowcol_to_a1
 import json 
 import base64 
+import os
+import time
 from oauth2client.service_account import ServiceAccountCredentials 
 import pandas as pd 
+import numpy as np
 from datetime import datetime
+from inventory_data import (
+    UsageLogSchemaError, ReagentDbSchemaError, column_letter, key_value, memory_report,
+    UNIT_OPTIONS, REAGENT_DB_COLUMNS, REAGENT_DB_EMPTY_COLUMNS, USAGE_LOG_COLUMNS, USAGE_LOG_EMPTY_COLUMNS
+)
+from local_mirror import LocalMirror, MirrorReconciler, MIRROR_PATH, REAGENT_DB_KEY, USAGE_LOG_KEY, USAGE_SNAPSHOT_KEY
+from stock_ledger import StockLedger
+from consumption import (
+    ConsumptionTracker, DEPLETION_ALERT_DAYS, DAILY_RATE_COLUMN, WEEKLY_RATE_COLUMN,
+    PRODUCT_WEEKLY_RATE_COLUMN, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN
+)
+from storage_backend import GspreadBackend, LocalBackend, SHEETS_QUOTA_PER_MINUTE
+from alert_digest import read_snapshot, snapshot_inputs, DIGEST_DIR, SNAPSHOT_FILE
+from bulk_import import (
+    read_import_file, validate_import, append_in_chunks, ImportFileError, PartialImportError, IMPORT_REQUIRED_COLUMNS
+)
+from write_queue import UsageWriteQueue, QUEUED, WRITTEN, FAILED
+from data_cache import DatasetCache
+from inventory_views import (
+    build_dashboard, dashboard_from_inventory, sort_order, select_rows, paginate, EXPIRY_THRESHOLD_DAYS, PAGE_SIZE_OPTIONS
+)
+from search_index import SearchIndex
+from usage_index import UsageHistoryIndex
+from usage_compaction import (
+    UsageSnapshot, ParquetArchive, SheetArchive, read_usage_snapshot_values, read_archive
+)
+from metrics import Metrics, InstrumentedBackend, METRICS_DIR
+from rate_limit import ThrottledBackend
+from sharding import ShardConfig, ShardConfigError, ShardedUsageLog, fetch_shards, merge_reagent_db, run_concurrently
+from inventory_export import SnapshotExporter, read_manifest, recent_usage, DEFAULT_HOST, EXPORT_DIR, RECENT_USAGE_DAYS
 
 # --- 1. 앱의 기본 설정 ---
-st.set_page_config(page_title="실험실 재고 관리기 v50", layout="wide")
-st.title("🔬 실험실 재고 관리기 v50")
+st.set_page_config(page_title="실험실 재고 관리기 v74", layout="wide")
+st.title("🔬 실험실 재고 관리기 v74")
 st.write("새 품목을 등록하고, 사용량을 기록하며, 재고 현황을 확인합니다.")
+rerun_started = time.perf_counter()
 
 # --- 2. Google Sheets 인증 및 설정 ---
-# (v49와 동일)
+# (v49와 동일 / v72: 샤드 설정이 없을 때의 기본 위치 - sharding.py 의 기본 샤드와 같음)
 REAGENT_DB_NAME = "Reagent_DB"  
 REAGENT_DB_TAB = "Master"       
 USAGE_LOG_NAME = "Usage_Log"    
 USAGE_LOG_TAB = "Log"           
+LOCAL_BACKEND_DIR = os.path.join(".inventory_cache", "local_sheets")
 
-# (1) 인증된 '클라이언트' 생성 (v49와 동일)
-@st.cache_resource(ttl=600)
+# (0) 성능 지표 (v69 신규: 시트 호출 지연 / 분당 요청 수 / 캐시 적중 / 탭별 렌더 시간 - 프로세스 전체에서 공유)
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+# (0-1) 스프레드시트 분할(샤드) 설정 (v72 신규: INVENTORY_SHARDS 가 없으면 위의 시트 하나씩 - sharding.py 참고)
+@st.cache_resource
+def get_shard_config():
+    return ShardConfig.load()
+
+# (1) 인증된 '클라이언트' 생성 (v59 수정됨: 10분마다 새로 만들지 않고 토큰만 미리 갱신)
+@st.cache_resource
 def get_gspread_client():
     try:
         scope = [
@@ -40,562 +85,1179 @@ def get_gspread_client():
     except Exception as e:
         return None, f"Google 인증 실패: {e}"
 
-# (2) 마스터 DB 로드 함수 (v49와 동일)
-@st.cache_data(ttl=60) 
-def load_reagent_db(_client):
+# (2) Google Sheets 백엔드 (v59 신규: 스프레드시트/탭 핸들과 HTTP 세션을 프로세스 전체에서 재사용)
+# (v70: 모든 세션의 시트 호출이 하나의 속도 제한 / 재시도 / 같은 읽기 합치기를 거침 - 계측은 실제 호출(재시도 포함) 단위)
+@st.cache_resource
+def get_gspread_backend(_client):
+    metrics = get_metrics()
+    return ThrottledBackend(InstrumentedBackend(GspreadBackend(_client), metrics), metrics=metrics)
+
+# (2-1) 로컬 대역 백엔드 (v54 신규: 인증 없이 개발/성능 측정용, CSV 파일에 저장)
+# (v70: INVENTORY_LOCAL_ERROR_RATE 를 주면 그 비율로 429 오류를 흉내 냄 - 재시도 동작 확인용)
+@st.cache_resource
+def get_local_backend():
+    metrics = get_metrics()
+    local = LocalBackend(
+        directory=os.environ.get("INVENTORY_LOCAL_DIR", LOCAL_BACKEND_DIR),
+        error_rate=float(os.environ.get("INVENTORY_LOCAL_ERROR_RATE", "0")),
+    )
+    return ThrottledBackend(InstrumentedBackend(local, metrics), metrics=metrics)
+
+# (3) 로컬 미러 (v52 신규: 시트 원본 행을 로컬 SQLite 에 보관, 읽기는 미러에서)
+@st.cache_resource
+def get_local_mirror():
+    return LocalMirror(MIRROR_PATH)
+
+# (v72: 주어진 Reagent_DB 샤드들을 동시에 읽어 샤드별 미러 키에 저장 / 반환: 바뀐 샤드가 있으면 True)
+def sync_reagent_db_mirror(backend, mirror, shards):
+    def pull(shard):
+        values = backend.worksheet(shard.spreadsheet, shard.tab).get_all_values()
+        header = values[0] if values else REAGENT_DB_COLUMNS
+        return mirror.replace(shard.key, header, values[1:])
+    return any(fetch_shards(shards, pull).values())
+
+# (v74: Reagent_DB 샤드 이름 -> (마지막으로 읽은 revision, 그때의 미러 version) - 백그라운드 동기화가 기록)
+# (미러 version 이 그 뒤 바뀌었으면(앱에서 등록 / 알림 해제) 그 revision 은 지금 데이터와 맞지 않음)
+@st.cache_resource
+def get_reagent_revisions():
+    return {}
+
+def reagent_db_revisions(mirror, shard_config):
+    recorded = get_reagent_revisions()
+    revisions = {}
+    for shard in shard_config.reagent_db:
+        revision, mirror_version = recorded.get(shard.name, (None, None))
+        revisions[shard.name] = revision if mirror_version == mirror.version(shard.key) else None
+    return revisions
+
+# (4) 재고 원장 (v53 신규: Lot 별 입고/사용/현재 재고를 O(1)로 갱신)
+@st.cache_resource
+def get_stock_ledger():
+    return StockLedger()
+
+# (4-1) 사용 속도 집계 (v65 신규: (제품명, Lot 번호) 별 하루 단위 사용량 - 새 기록만 더해서 갱신)
+@st.cache_resource
+def get_consumption_tracker():
+    return ConsumptionTracker()
+
+# (5) 데이터셋별 버전 캐시 (v58 신규: st.cache_data.clear() 대신 바뀐 데이터셋만 다시 계산)
+@st.cache_resource
+def get_dataset_cache():
+    return DatasetCache()
+
+# (6) 마스터 DB 로드 함수 (v52: 미러에서 읽기 / v58: 미러 버전으로 캐시)
+# (v72: 샤드별 미러 행을 이어 붙여 한 번에 파싱 - 어느 샤드든 바뀌면 다시 만듦)
+# (v73: 원본 행을 컬럼별로 바로 변환 - 날짜는 정해진 형식으로 파싱, 집계는 그룹을 한 번만 나눠 계산)
+def _build_reagent_db(mirror, shard_config):
+    df_agg = merge_reagent_db([mirror.read(shard.key) for shard in shard_config.reagent_db])
+    if df_agg.empty:
+        return df_agg
+    get_stock_ledger().rebuild_received(df_agg)
+    return df_agg
+
+def load_reagent_db(backend):
     try:
-        sh = _client.open(REAGENT_DB_NAME)
-        sheet = sh.worksheet(REAGENT_DB_TAB)
-        data = sheet.get_all_records()
-        if not data:
-            st.warning("마스터 시트(Reagent_DB)가 비어있습니다...")
-            return pd.DataFrame(columns=["제품명", "제조사", "Cat. No.", "Lot 번호", "최초 수량", "단위", "유통기한", "알림 기준 수량", "알림 무시"])
-        
-        df = pd.DataFrame(data)
-        
-        required_cols = ["제품명", "제조사", "Cat. No.", "Lot 번호", "최초 수량", "단위", "유통기한", "보관 위치", "등록 날짜", "등록자", "알림 기준 수량", "알림 무시"]
-        if not all(col in df.columns for col in required_cols):
-             st.error(f"Reagent_DB 'Master' 탭에 {required_cols} 컬럼이 모두 필요합니다. (A~L열 순서 확인)")
-             return pd.DataFrame(columns=required_cols)
-        
-        df['제품명'] = df['제품명'].astype(str)
-        df['제조사'] = df['제조사'].astype(str) 
-        df['Cat. No.'] = df['Cat. No.'].astype(str)
-        df['Lot 번호'] = df['Lot 번호'].astype(str)
-        df['최초 수량'] = pd.to_numeric(df['최초 수량'], errors='coerce').fillna(0)
-        df['알림 기준 수량'] = pd.to_numeric(df['알림 기준 수량'], errors='coerce').fillna(0) 
-        df['유통기한'] = pd.to_datetime(df['유통기한'], errors='coerce') 
-        df['단위'] = df['단위'].astype(str)
-        df['보관 위치'] = df['보관 위치'].astype(str)
-        df['등록 날짜'] = pd.to_datetime(df['등록 날짜'], errors='coerce') 
-        df['등록자'] = df['등록자'].astype(str)
-        df['알림 무시'] = df['알림 무시'].astype(str).fillna("아니요") 
-        
-        df = df.sort_values(by='등록 날짜')
-        
-        df_agg = df.groupby(['제품명', 'Cat. No.', 'Lot 번호'], as_index=False).agg(
-            agg_qty=('최초 수량', 'sum'),       
-            agg_alert_qty=('알림 기준 수량', 'last'), 
-            agg_unit=('단위', 'last'),          
-            agg_location=('보관 위치', 'last'),     
-            agg_expiry=('유통기한', 'last'),   
-            agg_reg_date=('등록 날짜', 'last'),   
-            agg_registrant=('등록자', 'last'),
-            agg_mute=('알림 무시', 'last'),
-            agg_manufacturer=('제조사', 'last') 
+        mirror = get_local_mirror()
+        shard_config = get_shard_config()
+        missing = [shard for shard in shard_config.reagent_db if not mirror.has(shard.key)]
+        if missing:
+            sync_reagent_db_mirror(backend, mirror, missing)
+        df_agg = get_dataset_cache().get(
+            REAGENT_DB_KEY, shard_config.reagent_db_version(mirror), lambda: _build_reagent_db(mirror, shard_config)
         )
-        
-        df_agg = df_agg.rename(columns={
-            'agg_qty': '최초 수량',
-            'agg_alert_qty': '알림 기준 수량', 
-            'agg_unit': '단위',
-            'agg_location': '보관 위치',
-            'agg_expiry': '유통기한',
-            'agg_reg_date': '등록 날짜',
-            'agg_registrant': '등록자',
-            'agg_mute': '알림 무시',
-            'agg_manufacturer': '제조사' 
-        })
-        
-        df_agg['등록 날짜'] = df_agg['등록 날짜'].dt.strftime('%Y-%m-%d %H:%M:%S')
-             
-        return df_agg 
-    
+        if df_agg.empty:
+            st.warning("마스터 시트(Reagent_DB)가 비어있습니다...")
+        return df_agg
+    except ReagentDbSchemaError as e:
+        st.error(str(e))
+        return pd.DataFrame(columns=REAGENT_DB_COLUMNS)
     except Exception as e:
         st.error(f"Reagent_DB 로드 실패: {e}")
-        return pd.DataFrame(columns=["제품명", "제조사", "Cat. No.", "Lot 번호", "최초 수량", "단위", "유통기한", "알림 기준 수량", "알림 무시"])
+        return pd.DataFrame(columns=REAGENT_DB_EMPTY_COLUMNS)
+
+# (6-1) 입력 폼용 제품 / Lot 목록 (v71 신규: Reagent_DB 버전마다 한 번만 만들어 폼 입력 중에는 표를 훑지 않음)
+# (색인을 만든 DataFrame 을 함께 보관 - 행 위치는 그 DataFrame 기준)
+def _build_product_lots(df_db):
+    first_row, last_row = {}, {}
+    for pos, key in enumerate(zip(df_db['제품명'].astype(str), df_db['Lot 번호'].astype(str))):
+        first_row.setdefault(key, pos)
+        last_row[key[0]] = pos
+    lots = {}
+    for product, lot in first_row:
+        lots.setdefault(product, []).append(lot)
+    return {
+        "frame": df_db,
+        "products": sorted(lots),
+        "lots": {product: sorted(product_lots) for product, product_lots in lots.items()},
+        "first_row": first_row,     # (제품명, Lot 번호) -> 첫 행 위치
+        "last_row": last_row,       # 제품명 -> 마지막 행 위치 (품목 정보 복사용)
+    }
+
+def get_product_lots(df_db):
+    return get_dataset_cache().get("product_lots", id(df_db), lambda: _build_product_lots(df_db))
+
+# (7-0) Usage_Log 압축 스냅샷 (v67 신규: 재고 = 스냅샷 누적 사용량 + 워터마크 이후 기록)
+# (시작 시에는 미러에서 복원하고, Log 탭을 통째로 다시 읽을 때마다 Snapshot 탭도 다시 읽음)
+@st.cache_resource
+def get_usage_snapshot_state():
+    header, rows = get_local_mirror().read(USAGE_SNAPSHOT_KEY)
+    return {"snapshot": UsageSnapshot.from_values([header] + rows if header else [])}
 
-# (3) 사용 기록(Log) 로드 함수 (v49와 동일)
-@st.cache_data(ttl=60)
-def load_usage_log(_client):
+def get_usage_snapshot():
+    return get_usage_snapshot_state()["snapshot"]
+
+def refresh_usage_snapshot(backend):
+    values = read_usage_snapshot_values(backend)
+    if values:
+        get_local_mirror().replace(USAGE_SNAPSHOT_KEY, values[0], values[1:])
+    snapshot = UsageSnapshot.from_values(values)
+    get_usage_snapshot_state()["snapshot"] = snapshot
+    return snapshot
+
+# (7) 사용 기록(Log) 로드 함수 (v51: 증분 tail 동기화 / v52: 미러에서 상태 복원 / v53: 재고 원장 갱신)
+# (v58: 새 사용 기록은 캐시된 DataFrame 에 행을 붙여 반영하고, 동기화 버전으로 캐시)
+# (프로세스 전체에서 공유되는 동기화 상태 - 이미 읽은 행 수와 누적 DataFrame 보관)
+# (v67: 압축으로 Log 앞부분이 지워지면 tail 비교가 어긋나 전체 재동기화가 되므로, 그때 스냅샷도 함께 갱신)
+# (v72: 샤드마다 동기화 상태 / 미러 키가 따로 있고, 재고 원장 / 사용 속도도 샤드 몫만 교체 - 스냅샷은 압축 대상 샤드 몫)
+@st.cache_resource
+def get_usage_log_sync(_backend):
+    mirror = get_local_mirror()
+    ledger = get_stock_ledger()
+    consumption = get_consumption_tracker()
+    def rebuild(shard, frame, snapshot):
+        if shard.compacted:
+            ledger.rebuild_usage(snapshot.tail(frame), snapshot.totals, source=shard.name)
+        else:
+            ledger.rebuild_usage(frame, source=shard.name)
+        consumption.rebuild(frame, source=shard.name)
+    def persist(shard, event, header, rows, frame):
+        if event == "full":
+            mirror.replace(shard.key, header, rows)
+            rebuild(shard, frame, refresh_usage_snapshot(_backend) if shard.compacted else None)
+        else:
+            mirror.append(shard.key, rows)
+            applied = get_usage_snapshot().tail(frame) if shard.compacted else frame
+            if ledger.settling_here:
+                # (저장 대기열이 쓴 행: 대기 사용량 -> 실제 사용량을 한 번에 옮김)
+                ledger.settle_pending(rows, applied, source=shard.name)
+            else:
+                ledger.apply_usage_frame(applied, source=shard.name)
+            consumption.apply_frame(frame, source=shard.name)
+    sync = ShardedUsageLog(get_shard_config().usage_log, full_resync_seconds=600, listener=persist)
+    snapshot = get_usage_snapshot()
+    for shard in sync.shards:
+        header, rows = mirror.read(shard.key)
+        if header is not None:
+            shard_sync = sync.syncs[shard.name]
+            shard_sync.seed(header, rows)
+            rebuild(shard, shard_sync.df, snapshot)
+    return sync
+
+# (v72: 샤드를 이어 붙인 사용 기록 - 압축 대상 샤드는 스냅샷에 접힌 기록(보관소에 있음)을 뺌)
+def _build_usage_log(sync, snapshot):
+    df = sync.merged(snapshot)
+    if df.empty:
+        return pd.DataFrame(columns=USAGE_LOG_EMPTY_COLUMNS)
+    return df
+
+def load_usage_log(backend):
     try:
-        sh = _client.open(USAGE_LOG_NAME)
-        sheet = sh.worksheet(USAGE_LOG_TAB)
-        data = sheet.get_all_records()
-        if not data:
-            return pd.DataFrame(columns=["제품명", "Lot 번호", "사용량", "Timestamp"]) 
-        
-        df = pd.DataFrame(data)
-        
-        required_cols = ["제품명", "Lot 번호", "사용량", "Timestamp", "사용자", "비고"]
-        if not all(col in df.columns for col in required_cols):
-             st.error("Usage_Log 'Log' 탭에 '제품명', 'Lot 번호', '사용량' 컬럼이 없습니다. (1행 헤더 확인)")
-             return pd.DataFrame(columns=required_cols)
-        
-        df['제품명'] = df['제품명'].astype(str)
-        df['Lot 번호'] = df['Lot 번호'].astype(str)
-        df['사용량'] = pd.to_numeric(df['사용량'], errors='coerce').fillna(0)
-        df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce') 
-             
-        return df
+        sync = get_usage_log_sync(backend)
+        if not sync.loaded:
+            sync.sync(backend, probe=False, missing_only=True)
+        snapshot = get_usage_snapshot()
+        return get_dataset_cache().get(
+            USAGE_LOG_KEY, (sync.version, snapshot.watermark), lambda: _build_usage_log(sync, snapshot)
+        )
+    except UsageLogSchemaError as e:
+        st.error(str(e))
+        return pd.DataFrame(columns=USAGE_LOG_COLUMNS)
     except Exception as e:
         st.error(f"Usage_Log 로드 실패: {e}")
-        return pd.DataFrame(columns=["제품명", "Lot 번호", "사용량", "Timestamp"])
+        return pd.DataFrame(columns=USAGE_LOG_EMPTY_COLUMNS)
 
-# --- 3. 앱 실행 ---
-client, auth_error_msg = get_gspread_client()
+# (7-1) 변경 확인 후 동기화 (v68 신규: 스프레드시트 revision 이 지난번과 같으면 시트를 읽지 않음)
+# (v72: 샤드마다 따로 확인 / 동기화 - 동시에)
+def pull_usage_log(backend, usage_sync):
+    usage_sync.sync(backend, probe=True)
 
-if auth_error_msg:
-    st.error(auth_error_msg)
-    st.warning("Secrets 설정, API 권한, 봇 초대를 확인하세요.")
-    st.stop() 
+# (7-2) 콜드 스타트 미리 읽기 (v73 신규: 미러에 없는 Reagent_DB 샤드와 아직 읽지 않은 Usage_Log 를 동시에 읽음)
+# (둘 중 하나만 필요하면 로더가 직접 읽음 / 오류는 여기서 보여주지 않고, 이어서 실행되는 로더가 다시 시도하고 표시)
+def prefetch_datasets(backend, shard_config):
+    mirror = get_local_mirror()
+    usage_sync = get_usage_log_sync(backend)
+    missing = [shard for shard in shard_config.reagent_db if not mirror.has(shard.key)]
+    if not missing or usage_sync.loaded:
+        return
+    try:
+        run_concurrently({
+            REAGENT_DB_KEY: lambda: sync_reagent_db_mirror(backend, mirror, missing),
+            USAGE_LOG_KEY: lambda: usage_sync.sync(backend, probe=False, missing_only=True),
+        })
+    except Exception:
+        pass
 
-tab1, tab2, tab3 = st.tabs(["📝 새 품목 등록", "📉 시약 사용", "📊 대시보드 (재고 현황)"])
+# (7-3) 읽기 전용 스냅샷 내보내기 (v74 신규: 발주 스크립트 / 장비 PC 가 시트 대신 읽음 - inventory_export.py 참고)
+# (INVENTORY_EXPORT_DIR: 내보낼 디렉터리 / INVENTORY_EXPORT_PORT 를 지정하면 로컬 HTTP 로도 제공)
+@st.cache_resource
+def get_snapshot_exporter():
+    exporter = SnapshotExporter(os.environ.get("INVENTORY_EXPORT_DIR", EXPORT_DIR))
+    port = os.environ.get("INVENTORY_EXPORT_PORT")
+    if port:
+        exporter.serve(int(port), os.environ.get("INVENTORY_EXPORT_HOST", DEFAULT_HOST))
+    return exporter
 
+# (두 데이터셋을 모두 읽은 뒤에만 / Reagent_DB·재고 원장·사용 기록·날짜 중 하나라도 바뀌었을 때만 표를 만듦)
+# (재고 현황은 대시보드 탭과 같은 캐시 항목 - 한쪽에서 계산했으면 다른 쪽은 다시 계산하지 않음)
+def export_inventory_snapshot(backend, exporter):
+    mirror = get_local_mirror()
+    shard_config = get_shard_config()
+    usage_sync = get_usage_log_sync(backend)
+    if not usage_sync.loaded or not all(mirror.has(shard.key) for shard in shard_config.reagent_db):
+        return None
+    today = pd.to_datetime(datetime.now().date())
+    snapshot = get_usage_snapshot()
+    ledger = get_stock_ledger()
+    consumption = get_consumption_tracker()
+    input_version = (
+        shard_config.reagent_db_version(mirror), ledger.version, consumption.version, usage_sync.version, snapshot.watermark, today
+    )
+    def build():
+        df_db = get_dataset_cache().get(
+            REAGENT_DB_KEY, shard_config.reagent_db_version(mirror), lambda: _build_reagent_db(mirror, shard_config)
+        )
+        df_log = get_dataset_cache().get(
+            USAGE_LOG_KEY, (usage_sync.version, snapshot.watermark), lambda: _build_usage_log(usage_sync, snapshot)
+        )
+        df_inventory = df_db if df_db.empty else get_dashboard(backend, df_db, today)[1]["inventory"]
+        meta = {
+            "today": str(today.date()), "expiry_threshold_days": EXPIRY_THRESHOLD_DAYS, "recent_usage_days": RECENT_USAGE_DAYS,
+        }
+        return df_inventory, recent_usage(df_log, today), meta
+    return exporter.publish_if_changed(input_version, build)
 
-# --- 4. 탭 1: 새 품목 등록 (v49와 동일) ---
-with tab1:
-    st.header("📝 새 시약/소모품 등록")
-    # ... (v49 탭1 코드 전체 생략 - 동일) ...
-    st.write(f"이 폼을 제출하면 **'{REAGENT_DB_NAME}'** 시트의 **'{REAGENT_DB_TAB}'** 탭에 저장됩니다.")
-    df_db_copy = load_reagent_db(client) 
-    copied_data = {}
-    unit_options = ["개", "box", "kit", "mL", "L", "g", "kg"]
-    if not df_db_copy.empty:
-        if st.checkbox("🖨️ 기존 품목 정보 복사하기 (Cat.No., 제조사, 단위, 위치, 알림 기준)"): 
-            all_products = sorted(df_db_copy['제품명'].dropna().unique())
-            if 'product_to_copy' not in st.session_state:
-                st.session_state.product_to_copy = all_products[0]
-            selected_product_to_copy = st.selectbox(
-                "복사할 제품명 선택:", 
-                options=all_products, 
-                key="product_to_copy"
-            )
-            if selected_product_to_copy:
-                item_info = df_db_copy[
-                    df_db_copy['제품명'] == selected_product_to_copy
-                ].iloc[-1] 
-                copied_data['product_name'] = item_info.get('제품명', '')
-                copied_data['cat_no'] = item_info.get('Cat. No.', '')
-                copied_data['manufacturer'] = item_info.get('제조사', '') 
-                copied_data['unit'] = item_info.get('단위', '개')
-                copied_data['location'] = item_info.get('보관 위치', '')
-                copied_data['alert_qty'] = item_info.get('알림 기준 수량', 10) 
-    st.divider()
-    with st.form(key="new_item_form", clear_on_submit=True): 
-        col1, col2 = st.columns(2)
-        with col1:
-            st.write("**필수 정보**")
-            product_name = st.text_input("제품명*", value=copied_data.get('product_name', ''), help="예: DMEM, 10% FBS")
-            manufacturer = st.text_input("제조사*", 
-                                         value=copied_data.get('manufacturer', ''), 
-                                         help="예: Thermo Fisher, Gibco, Merck")
-            cat_no = st.text_input("Cat. No.*", value=copied_data.get('cat_no', ''), help="카탈로그 번호 (예: 11995-065)")
-            lot_no = st.text_input("Lot 번호*", help="새로 등록할 Lot 번호를 입력하세요.")
-        with col2:
-            st.write("**수량 및 알림**")
-            initial_qty = st.number_input("최초 수량*", min_value=0.0, step=1.0, format="%.2f")
-            unit_index = unit_options.index(copied_data.get('unit')) if copied_data.get('unit') in unit_options else 0
-            unit = st.selectbox("단위*", options=unit_options, index=unit_index) 
-            alert_qty = st.number_input(
-                "알림 기준 수량*", 
-                min_value=0.0, 
-                value=copied_data.get('alert_qty', 10.0), 
-                step=1.0, 
-                format="%.2f",
-                help="이 수량 '이하'로 재고가 남으면 알림이 뜹니다."
-            )
-        st.divider()
-        st.write("**기타 정보**")
-        location = st.text_input("보관 위치", value=copied_data.get('location', ''), help="예: 4도 냉장고 A-1 선반...")
-        expiry_date = st.date_input("유통기한", datetime.now() + pd.DateOffset(years=1))
-        registrant = st.text_input("등록자 이름*")
-        submit_button = st.form_submit_button(label="✅ 신규 등록하기")
-    if "form1_status" in st.session_state:
-        if st.session_state.form1_status == "success": st.success(st.session_state.form1_message)
-        else: st.error(st.session_state.form1_message)
-        del st.session_state.form1_status
-        del st.session_state.form1_message
-    if submit_button:
-        if not all([product_name, cat_no, lot_no, manufacturer, initial_qty > 0, registrant, alert_qty >= 0]):
-            st.session_state.form1_status = "error"
-            st.session_state.form1_message = "필수 항목(*)을 모두 입력해야 합니다. (최초 수량 > 0, 알림 기준 >= 0)"
+# (8) 백그라운드 동기화 (v52 신규: 원격 변경을 30초마다 미러로 당겨옴)
+# (v68: 두 시트 모두 revision 을 먼저 확인 - 바뀌지 않았으면 변경 확인 호출 1회로 끝남)
+# (v69: 같은 주기에 성능 지표를 파일로 내보냄 - METRICS_DIR 의 metrics.json / metrics.prom)
+# (v72: Reagent_DB 샤드들도 동시에 확인 - 바뀐 샤드만 다시 읽음)
+# (v73: Reagent_DB 와 Usage_Log 도 차례로가 아니라 동시에 확인 / 동기화)
+# (v74: 동기화 뒤 데이터가 바뀌었으면 읽기 전용 스냅샷을 다시 내보냄)
+@st.cache_resource
+def start_mirror_reconciler(_backend):
+    mirror = get_local_mirror()
+    shard_config = get_shard_config()
+    usage_sync = get_usage_log_sync(_backend)
+    metrics = get_metrics()
+    metrics.add_collector(app_metrics_collector(get_dataset_cache(), usage_sync, get_usage_write_queue(_backend)))
+    reagent_revisions = get_reagent_revisions()
+    def pull_reagent_shard(shard):
+        revision = _backend.revision(shard.spreadsheet)
+        if revision is None or revision != reagent_revisions.get(shard.name, (None, None))[0]:
+            sync_reagent_db_mirror(_backend, mirror, [shard])
+            reagent_revisions[shard.name] = (revision, mirror.version(shard.key))
+            metrics.inc("reagent_db_pulls_total", result="read")
         else:
-            try:
-                sh = client.open(REAGENT_DB_NAME)
-                sheet = sh.worksheet(REAGENT_DB_TAB)
-                log_data_list = [
-                    product_name,   # A
-                    manufacturer,   # B
-                    cat_no,         # C
-                    lot_no,         # D
-                    float(initial_qty), # E
-                    unit,           # F
-                    expiry_date.strftime("%Y-%m-%d"), # G
-                    location,       # H
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"), # I
-                    registrant,     # J
-                    float(alert_qty), # K
-                    "아니요"         # L
-                ]
-                sheet.append_row(log_data_list)
-                st.session_state.form1_status = "success"
-                st.session_state.form1_message = f"✅ **{product_name} (Lot: {lot_no})**가 마스터 시트에 성공적으로 등록되었습니다!"
-                st.cache_data.clear() 
-            except Exception as e:
-                st.session_state.form1_status = "error"
-                st.session_state.form1_message = f"Google Sheet 저장 실패: {e}"
-        st.rerun()
+            metrics.inc("reagent_db_pulls_total", result="skipped")
+    def pull_reagent_db():
+        fetch_shards(shard_config.reagent_db, pull_reagent_shard)
+    def pull_datasets():
+        run_concurrently({REAGENT_DB_KEY: pull_reagent_db, USAGE_LOG_KEY: lambda: pull_usage_log(_backend, usage_sync)})
+    exporter = get_snapshot_exporter()
+    def export_snapshot():
+        if export_inventory_snapshot(_backend, exporter) is not None:
+            metrics.inc("snapshot_exports_total")
+    def export_metrics():
+        metrics.export(METRICS_DIR)
+    # (v59: 인증 토큰도 이 주기에 만료 전 미리 갱신 - 사용자 요청이 갱신 대기를 하지 않도록)
+    reconciler = MirrorReconciler(
+        [_backend.refresh_credentials, pull_datasets, export_snapshot, export_metrics], interval_seconds=30
+    )
+    reconciler.start()
+    return reconciler
 
+# (9) 사용 기록 저장 대기열 (v57 신규: 제출은 바로 반환, 저장은 백그라운드에서 묶어서)
+USAGE_STATUS_LABELS = {QUEUED: "⏳ 저장 대기", WRITTEN: "✅ 저장됨", FAILED: "❌ 실패"}
 
-# --- 5. 탭 2: 시약 사용 (v49와 동일) ---
-with tab2:
-    st.header("📉 시약 사용 기록")
-    # ... (v49 탭2 코드 전체 생략 - 동일) ...
-    st.write(f"이 폼을 제출하면 **'{USAGE_LOG_NAME}'** 시트의 **'{USAGE_LOG_TAB}'** 탭에 저장됩니다.")
-    st.divider()
-    df_db = load_reagent_db(client) 
-    df_log = load_usage_log(client) 
-    if df_db.empty:
-        st.error("마스터 DB(Reagent_DB)에 등록된 품목이 없습니다. '새 품목 등록' 탭에서 먼저 품목을 등록하세요.")
+# (v72: 기록마다 그 Lot 의 Usage_Log 샤드로 보냄 - 대기열은 같은 샤드 기록끼리만 묶음)
+@st.cache_resource
+def get_usage_write_queue(_backend):
+    usage_sync = get_usage_log_sync(_backend)
+    ledger = get_stock_ledger()
+    shard_config = get_shard_config()
+    mirror = get_local_mirror()
+    def route(row):
+        return shard_config.usage_route(mirror, row[1], row[2])
+    def write_rows(rows):
+        shard = route(rows[0])
+        sheet = _backend.worksheet(shard.spreadsheet, shard.tab)
+        with ledger.settling(rows):
+            usage_sync.append_through(shard.name, sheet.append_rows, rows)
+    def track_pending(event, record):
+        product, lot, qty = record.row[1], record.row[2], record.row[3]
+        if event == "queued":
+            ledger.add_pending(product, lot, qty)
+        elif event == "failed":
+            ledger.remove_pending(product, lot, qty)
+        # (저장되면 append_through 안에서 settle_pending 으로 이미 실제 사용량으로 옮겨짐)
+    queue = UsageWriteQueue(write_rows, listener=track_pending, batch_key=lambda row: route(row).name)
+    queue.start()
+    return queue
+
+# (9-1) 재고 확인 후 사용 기록 접수 (v68 신규: 같은 Lot 은 '최신 재고 확인 -> 접수' 를 Lot 별 잠금 안에서 한 번에 하나씩)
+# (확인 직전에 Usage_Log 변경을 확인해 다른 사용자가 저장한 기록까지 반영 - 바뀌었어도 tail 만 읽음)
+# 반환: (기록 id - 재고 부족이면 None, 확인한 현재 재고)
+def submit_usage_checked(backend, product, cat_no, lot, qty, row):
+    ledger = get_stock_ledger()
+    with ledger.lot_lock(product, lot):
+        try:
+            pull_usage_log(backend, get_usage_log_sync(backend))
+        except Exception:
+            # (시트에 닿지 못하면 이 서버의 원장(저장 대기 사용량 포함)으로 확인 - 저장은 대기열이 재시도)
+            pass
+        stock = ledger.stock(product, cat_no, lot)
+        if float(qty) > stock:
+            return None, stock
+        # (대기열 listener 가 접수 즉시 대기 사용량에 더하므로, 잠금이 풀린 뒤의 제출은 줄어든 재고로 확인됨)
+        return get_usage_write_queue(backend).submit(row), stock
+
+# (10) 알림 해제 (v55 신규: 캐시된 행 번호 맵 + batch_update 1회)
+# (v49: L열(12)로 '알림 무시' 컬럼 위치 변경)
+MUTE_COLUMN = REAGENT_DB_COLUMNS.index("알림 무시") + 1  # 12 = L열
+
+def _find_mute_rows(sheet, mirror, dataset, keys, verify):
+    index = mirror.row_index(dataset, ["제품명", "Lot 번호"])
+    target_rows = [row_no for key in keys for row_no in index.get(key, [])]
+    missing = [key for key in keys if key not in index]
+    if verify and target_rows:
+        # (미러의 행 번호가 시트와 같은지 대상 행만 읽어 확인 - 요청 1회)
+        product_col = REAGENT_DB_COLUMNS.index("제품명")
+        lot_col = REAGENT_DB_COLUMNS.index("Lot 번호")
+        last_col = column_letter(lot_col + 1)
+        found = sheet.batch_get([f"A{row_no}:{last_col}{row_no}" for row_no in target_rows])
+        expected = {row_no: key for key in keys for row_no in index.get(key, [])}
+        for row_no, values in zip(target_rows, found):
+            row = list(values[0]) if values else []
+            row.extend([""] * (lot_col + 1 - len(row)))
+            if (key_value(row[product_col]), key_value(row[lot_col])) != expected[row_no]:
+                return None, missing
+    return target_rows, missing
+
+def _mute_shard(backend, mirror, shard, keys):
+    sheet = backend.worksheet(shard.spreadsheet, shard.tab)
+    target_rows, missing = _find_mute_rows(sheet, mirror, shard.key, keys, verify=True)
+    if target_rows is None:
+        # (다른 곳에서 행이 추가/삭제되어 행 번호가 어긋남 -> 미러를 다시 맞춘 뒤 재계산)
+        sync_reagent_db_mirror(backend, mirror, [shard])
+        target_rows, missing = _find_mute_rows(sheet, mirror, shard.key, keys, verify=False)
+    if target_rows:
+        sheet.batch_update([
+            {"range": rowcol_to_a1(row_no, MUTE_COLUMN), "values": [["예"]]} for row_no in target_rows
+        ])
+        mirror.update_cells(shard.key, [(row_no, MUTE_COLUMN, "예") for row_no in target_rows])
+    return missing
+
+# (v72: 키마다 그 행이 있는 Reagent_DB 샤드에 씀 - 어느 샤드의 미러에도 없는 키는 missing)
+def mute_alerts(backend, mirror, keys):
+    missing = list(keys)
+    for shard in get_shard_config().reagent_db:
+        index = mirror.row_index(shard.key, ["제품명", "Lot 번호"])
+        shard_keys = [key for key in missing if key in index]
+        if shard_keys:
+            shard_missing = set(_mute_shard(backend, mirror, shard, shard_keys))
+            missing = [key for key in missing if key not in shard_keys or key in shard_missing]
+    return missing
+
+# (11) 대시보드 계산 (v66 신규: 알림 작업(alert_digest.py) 스냅샷이 같은 입력으로 계산됐으면 계산 대신 스냅샷 사용)
+# (v74 수정됨: 입력 지문(전체 해시) 대신 샤드별 revision 비교 - 앱이 마지막 동기화 뒤 직접 쓴 것이나 저장 대기 사용량이 있으면 계산)
+def compute_dashboard(backend, df_db, ledger, today, expiry_threshold_days, consumption):
+    inputs = None
+    if not ledger.pending:
+        revisions = {
+            "reagent_db": reagent_db_revisions(get_local_mirror(), get_shard_config()),
+            "usage_log": get_usage_log_sync(backend).revisions,
+        }
+        inputs = snapshot_inputs(today, expiry_threshold_days, revisions, get_usage_snapshot().watermark)
+    df_snapshot = read_snapshot(os.path.join(DIGEST_DIR, SNAPSHOT_FILE), inputs)
+    if df_snapshot is not None and len(df_snapshot) != len(df_db):
+        df_snapshot = None
+    get_metrics().inc("dashboard_snapshot_total", result="hit" if df_snapshot is not None else "miss")
+    if df_snapshot is not None:
+        return dashboard_from_inventory(df_snapshot)
+    return build_dashboard(df_db, ledger, today, expiry_threshold_days, consumption)
+
+# (v74: 데이터 버전별 대시보드 - 탭 3 과 스냅샷 내보내기가 같은 캐시 항목을 씀)
+# (반환: (캐시 버전, 대시보드) - 정렬 순서 등 파생 뷰는 이 버전으로 캐시해야 같은 재고 현황 표와 짝이 맞음)
+def get_dashboard(backend, df_db, today, expiry_threshold_days=EXPIRY_THRESHOLD_DAYS):
+    ledger = get_stock_ledger()
+    consumption = get_consumption_tracker()
+    dashboard_version = (
+        get_shard_config().reagent_db_version(get_local_mirror()), ledger.version, consumption.version, today, expiry_threshold_days
+    )
+    dashboard = get_dataset_cache().get(
+        "dashboard",
+        dashboard_version,
+        lambda: compute_dashboard(backend, df_db, ledger, today, expiry_threshold_days, consumption)
+    )
+    return dashboard_version, dashboard
+
+# (12) 표 페이지 나누기 (v63 신규: 정렬/필터는 서버에서, 브라우저에는 보이는 페이지만 전송)
+def paging_controls(key):
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("페이지당 행 수", PAGE_SIZE_OPTIONS, key=f"{key}_page_size")
+    page = col_page.number_input("페이지", min_value=1, step=1, key=f"{key}_page")
+    return page, page_size
+
+def paging_caption(total_rows, page, page_count, page_size):
+    if total_rows:
+        start = (page - 1) * page_size + 1
+        st.caption(f"전체 {total_rows}개 중 {start}–{min(start + page_size - 1, total_rows)} 표시 (페이지 {page} / {page_count})")
+
+# (13) 성능 지표 수집 / 관리자 페이지 (v69 신규)
+# (데이터셋 캐시 적중 / Usage_Log 동기화 방식 / 저장 대기 수는 각 객체가 세고 있는 값을 내보내기 직전에 옮겨 담음)
+def app_metrics_collector(cache, usage_sync, usage_queue):
+    def collect(metrics):
+        totals = {}
+        for result, counts in (("hit", cache.hits), ("miss", cache.misses)):
+            for key, count in list(counts.items()):
+                # (파생 뷰 키 (이름, 정렬 컬럼, ...) 는 이름 하나로 묶음)
+                name = key[0] if isinstance(key, tuple) else key
+                totals[(name, result)] = totals.get((name, result), 0) + count
+        for (name, result), count in totals.items():
+            metrics.set_counter("cache_requests_total", count, cache=name, result=result)
+        for mode, count in (("full", usage_sync.full_reloads), ("tail", usage_sync.tail_syncs), ("skipped", usage_sync.skipped_syncs)):
+            metrics.set_counter("usage_log_syncs_total", count, mode=mode)
+        metrics.set_gauge("usage_write_queue_pending", usage_queue.pending_count())
+    return collect
+
+def _latency_table(snapshot, name, label_columns):
+    rows = []
+    for h in snapshot["histograms"]:
+        if h["name"] != name:
+            continue
+        row = {column: h["labels"].get(label, "") for label, column in label_columns.items()}
+        row.update({
+            "횟수": h["count"],
+            "평균 (ms)": h["sum"] / h["count"] * 1000,
+            "p50 (ms)": h["p50"] * 1000,
+            "p95 (ms)": h["p95"] * 1000,
+            "최대 (ms)": h["max"] * 1000,
+        })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def render_admin_page(metrics):
+    st.header("🛠️ 성능 지표 (관리자)")
+    snapshot = metrics.snapshot()
+    per_minute = metrics.requests_last_minute()
+    quota_cols = st.columns(len(SHEETS_QUOTA_PER_MINUTE) + 1)
+    for col, (kind, limit) in zip(quota_cols, SHEETS_QUOTA_PER_MINUTE.items()):
+        col.metric(f"최근 1분 Sheets {kind} 요청", f"{per_minute.get(kind, 0)} / {limit}")
+    quota_cols[-1].metric("최근 1분 Drive 변경 확인", per_minute.get("drive", 0))
+    ms_format = {col: st.column_config.NumberColumn(format="%.1f") for col in ["평균 (ms)", "p50 (ms)", "p95 (ms)", "최대 (ms)"]}
+
+    st.subheader("시트 API 호출")
+    st.dataframe(
+        _latency_table(snapshot, "sheets_request_seconds", {"method": "호출", "spreadsheet": "스프레드시트"}),
+        column_config=ms_format, hide_index=True, use_container_width=True
+    )
+    errors = [c for c in snapshot["counters"] if c["name"] in ("sheets_errors_total", "sheets_retries_total")]
+    if errors:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "구분": "재시도" if c["name"] == "sheets_retries_total" else "오류",
+                    "호출": c["labels"]["method"], "코드": c["labels"]["code"], "횟수": int(c["value"]),
+                }
+                for c in errors
+            ]),
+            hide_index=True, use_container_width=True
+        )
+    coalesced = sum(int(c["value"]) for c in snapshot["counters"] if c["name"] == "coalesced_reads_total")
+    st.caption(f"진행 중인 같은 읽기와 합쳐져 요청하지 않은 읽기: {coalesced}회 / 요청 한도 대기:")
+    st.dataframe(
+        _latency_table(snapshot, "rate_limit_wait_seconds", {"kind": "종류"}),
+        column_config=ms_format, hide_index=True, use_container_width=True
+    )
+
+    st.subheader("캐시 적중률")
+    cache_counts = {}
+    for c in snapshot["counters"]:
+        if c["name"] in ("cache_requests_total", "dashboard_snapshot_total", "reagent_db_pulls_total", "usage_log_syncs_total"):
+            cache = c["labels"].get("cache", c["name"])
+            hit = c["labels"].get("result", c["labels"].get("mode")) in ("hit", "skipped")
+            counts = cache_counts.setdefault(cache, [0, 0])
+            counts[0 if hit else 1] += int(c["value"])
+    st.dataframe(
+        pd.DataFrame([
+            {"캐시": cache, "적중": hits, "재계산/읽기": misses, "적중률": hits / (hits + misses) if hits + misses else 0.0}
+            for cache, (hits, misses) in sorted(cache_counts.items())
+        ]),
+        column_config={"적중률": st.column_config.ProgressColumn(format="%.0f%%", min_value=0.0, max_value=1.0)},
+        hide_index=True, use_container_width=True
+    )
+    st.caption("dashboard_snapshot_total: 알림 작업 스냅샷 사용 / reagent_db_pulls_total, usage_log_syncs_total: 변경 확인으로 시트 읽기를 건너뛴 비율")
+
+    st.subheader("렌더 시간")
+    st.dataframe(_latency_table(snapshot, "tab_render_seconds", {"tab": "탭"}), column_config=ms_format, hide_index=True, use_container_width=True)
+    st.dataframe(_latency_table(snapshot, "rerun_seconds", {}), column_config=ms_format, hide_index=True, use_container_width=True)
+
+    st.subheader("내보내기")
+    st.caption(f"백그라운드 동기화 주기(30초)마다 '{METRICS_DIR}' 에 metrics.json / metrics.prom 으로 저장됩니다.")
+    col_json, col_prom = st.columns(2)
+    col_json.download_button("JSON 다운로드", metrics.to_json(snapshot), file_name="metrics.json", mime="application/json")
+    col_prom.download_button("Prometheus 텍스트 다운로드", metrics.to_prometheus(snapshot), file_name="metrics.prom", mime="text/plain")
+
+    # (v74: 읽기 전용 재고 스냅샷 - 현재 버전 / HTTP 주소)
+    exporter = get_snapshot_exporter()
+    manifest = read_manifest(exporter.directory)
+    if manifest is None:
+        st.caption(f"재고 스냅샷: 아직 내보내지 않았습니다. (두 시트를 읽은 뒤 백그라운드 동기화 주기에 '{exporter.directory}' 에 씀)")
     else:
-        st.subheader("1. 사용할 품목 선택")
-        all_products = sorted(df_db['제품명'].dropna().unique())
-        selected_product = st.selectbox("사용한 제품명*", options=all_products)
-        if selected_product:
-            available_lots = sorted(
-                df_db[df_db['제품명'] == selected_product]['Lot 번호'].dropna().unique()
-            )
-            selected_lot = st.selectbox("Lot 번호*", options=available_lots)
+        served = f" / {exporter.server.url}/manifest.json" if exporter.server else ""
+        st.caption(
+            f"재고 스냅샷: 버전 {manifest['version']} (#{manifest['sequence']}, {manifest['generated_at']}) "
+            f"/ Lot {manifest['inventory_rows']}개, 최근 사용 기록 {manifest['usage_rows']}건 / '{exporter.directory}'{served}"
+        )
+
+# --- 3. 앱 실행 ---
+# (v54: INVENTORY_BACKEND=local 이면 Google 인증 없이 로컬 대역 시트로 실행)
+if os.environ.get("INVENTORY_BACKEND") == "local":
+    backend = get_local_backend()
+else:
+    client, auth_error_msg = get_gspread_client()
+
+    if auth_error_msg:
+        st.error(auth_error_msg)
+        st.warning("Secrets 설정, API 권한, 봇 초대를 확인하세요.")
+        st.stop() 
+
+    backend = get_gspread_backend(client)
+
+# (v72: 샤드 설정이 잘못되었으면 시트를 건드리기 전에 멈춤)
+try:
+    shard_config = get_shard_config()
+except ShardConfigError as e:
+    st.error(str(e))
+    st.stop()
+
+mirror_reconciler = start_mirror_reconciler(backend)
+metrics = get_metrics()
+
+# (v69: 주소에 ?admin=1 (INVENTORY_ADMIN_KEY 를 지정했으면 그 값) 을 붙이면 탭 대신 성능 지표 페이지)
+if st.query_params.get("admin") == os.environ.get("INVENTORY_ADMIN_KEY", "1"):
+    render_admin_page(metrics)
+    st.stop()
+
+# (v73: 처음 실행 시 두 시트를 동시에 읽어 둠 - 탭의 로더는 미러 / 동기화 상태에서 바로 읽음)
+prefetch_datasets(backend, shard_config)
+
+# (v71: 선택한 탭만 실행 - 탭을 바꾸면 다시 실행되고, 입력 폼을 쓰는 동안 대시보드는 계산하지 않음)
+# (공유 데이터(Reagent_DB / Usage_Log)도 열린 탭 안에서 실행마다 한 번만 읽음)
+tab1, tab2, tab3 = st.tabs(
+    ["📝 새 품목 등록", "📉 시약 사용", "📊 대시보드 (재고 현황)"], key="active_tab", on_change="rerun"
+)
+
+
+# --- 4. 탭 1: 새 품목 등록 (v49와 동일) ---
+if tab1.open:
+    with tab1, metrics.timer("tab_render_seconds", tab="register"):
+        st.header("📝 새 시약/소모품 등록")
+        # ... (v49 탭1 코드 전체 생략 - 동일) ...
+        # (v72: 쓰기 가능한 Reagent_DB 샤드가 여러 개면 저장할 샤드를 고름 - 폼 / 일괄 등록 모두)
+        writable_reagent_shards = shard_config.writable(shard_config.reagent_db)
+        if len(writable_reagent_shards) > 1:
+            target_shard = shard_config.reagent_shard(st.selectbox(
+                "저장할 Reagent_DB 샤드", options=[shard.name for shard in writable_reagent_shards], key="target_reagent_shard"
+            ))
         else:
-            selected_lot = st.selectbox("Lot 번호*", options=["제품명을 먼저 선택하세요"])
-        current_stock = 0.0 
-        unit = ""
-        alert_level = 0.0 
-        if selected_product and selected_lot:
-            try:
-                item_info = df_db[
-                    (df_db['제품명'] == selected_product) & 
-                    (df_db['Lot 번호'] == selected_lot)
-                ].iloc[0] 
-                initial_stock = item_info['최초 수량'] 
-                unit = item_info['단위']
-                alert_level = item_info['알림 기준 수량'] 
-                usage_df = df_log[
-                    (df_log['제품명'] == selected_product) & 
-                    (df_log['Lot 번호'] == selected_lot)
-                ]
-                total_usage = usage_df['사용량'].sum()
-                current_stock = initial_stock - total_usage
-                st.info(f"**현재 남은 재고:** {current_stock:.2f} {unit} (총 입고: {initial_stock:.2f} {unit} / 알림 기준: {alert_level:.2f} {unit})")
-            except (IndexError, TypeError, KeyError):
-                st.warning("재고를 계산할 수 없습니다. (마스터DB/로그 확인)")
+            target_shard = writable_reagent_shards[0]
+        st.write(f"이 폼을 제출하면 **'{target_shard.spreadsheet}'** 시트의 **'{target_shard.tab}'** 탭에 저장됩니다.")
+        df_db_copy = load_reagent_db(backend) 
+        copied_data = {}
+        unit_options = UNIT_OPTIONS
+        if not df_db_copy.empty:
+            if st.checkbox("🖨️ 기존 품목 정보 복사하기 (Cat.No., 제조사, 단위, 위치, 알림 기준)"): 
+                product_lots = get_product_lots(df_db_copy)
+                all_products = product_lots["products"]
+                if 'product_to_copy' not in st.session_state:
+                    st.session_state.product_to_copy = all_products[0]
+                selected_product_to_copy = st.selectbox(
+                    "복사할 제품명 선택:", 
+                    options=all_products, 
+                    key="product_to_copy"
+                )
+                if selected_product_to_copy:
+                    item_info = df_db_copy.iloc[product_lots["last_row"][selected_product_to_copy]]
+                    copied_data['product_name'] = item_info.get('제품명', '')
+                    copied_data['cat_no'] = item_info.get('Cat. No.', '')
+                    copied_data['manufacturer'] = item_info.get('제조사', '') 
+                    copied_data['unit'] = item_info.get('단위', '개')
+                    copied_data['location'] = item_info.get('보관 위치', '')
+                    copied_data['alert_qty'] = item_info.get('알림 기준 수량', 10) 
         st.divider()
-        st.subheader("2. 사용 정보 입력")
-        if "usage_qty_input" not in st.session_state:
-            st.session_state.usage_qty_input = 0.0
-        if "usage_user" not in st.session_state:
-            st.session_state.usage_user = ""
-        if "usage_notes" not in st.session_state:
-            st.session_state.usage_notes = ""
-        def submit_usage_callback(product, lot, qty, user, notes, date, stock, unit_str):
-            if not all([product, lot, qty > 0, user]):
-                st.session_state.form2_status = "error"
-                st.session_state.form2_message = "필수 항목(*)을 모두 입력해야 합니다. (사용량은 0보다 커야 함)"
-            elif float(qty) > stock:
-                shortage = float(qty) - stock
-                st.session_state.form2_status = "error"
-                st.session_state.form2_message = f"⚠️ 재고 부족! 현재 재고({stock:.2f} {unit_str})보다 {shortage:.2f} {unit_str} 만큼 더 많이 입력했습니다."
+        with st.form(key="new_item_form", clear_on_submit=True): 
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**필수 정보**")
+                product_name = st.text_input("제품명*", value=copied_data.get('product_name', ''), help="예: DMEM, 10% FBS")
+                manufacturer = st.text_input("제조사*", 
+                                             value=copied_data.get('manufacturer', ''), 
+                                             help="예: Thermo Fisher, Gibco, Merck")
+                cat_no = st.text_input("Cat. No.*", value=copied_data.get('cat_no', ''), help="카탈로그 번호 (예: 11995-065)")
+                lot_no = st.text_input("Lot 번호*", help="새로 등록할 Lot 번호를 입력하세요.")
+            with col2:
+                st.write("**수량 및 알림**")
+                initial_qty = st.number_input("최초 수량*", min_value=0.0, step=1.0, format="%.2f")
+                unit_index = unit_options.index(copied_data.get('unit')) if copied_data.get('unit') in unit_options else 0
+                unit = st.selectbox("단위*", options=unit_options, index=unit_index) 
+                alert_qty = st.number_input(
+                    "알림 기준 수량*", 
+                    min_value=0.0, 
+                    value=copied_data.get('alert_qty', 10.0), 
+                    step=1.0, 
+                    format="%.2f",
+                    help="이 수량 '이하'로 재고가 남으면 알림이 뜹니다."
+                )
+            st.divider()
+            st.write("**기타 정보**")
+            location = st.text_input("보관 위치", value=copied_data.get('location', ''), help="예: 4도 냉장고 A-1 선반...")
+            expiry_date = st.date_input("유통기한", datetime.now() + pd.DateOffset(years=1))
+            registrant = st.text_input("등록자 이름*")
+            submit_button = st.form_submit_button(label="✅ 신규 등록하기")
+        if "form1_status" in st.session_state:
+            if st.session_state.form1_status == "success": st.success(st.session_state.form1_message)
+            else: st.error(st.session_state.form1_message)
+            del st.session_state.form1_status
+            del st.session_state.form1_message
+        if submit_button:
+            if not all([product_name, cat_no, lot_no, manufacturer, initial_qty > 0, registrant, alert_qty >= 0]):
+                st.session_state.form1_status = "error"
+                st.session_state.form1_message = "필수 항목(*)을 모두 입력해야 합니다. (최초 수량 > 0, 알림 기준 >= 0)"
             else:
                 try:
-                    sh_log = client.open(USAGE_LOG_NAME)
-                    sheet_log = sh_log.worksheet(USAGE_LOG_TAB)
-                    log_timestamp = datetime.combine(date, datetime.now().time())
+                    sheet = backend.worksheet(target_shard.spreadsheet, target_shard.tab)
                     log_data_list = [
-                        log_timestamp.strftime("%Y-%m-%d %H:%M:%S"), 
-                        str(product), 
-                        str(lot),     
-                        float(qty),      
-                        user,
-                        notes
+                        product_name,   # A
+                        manufacturer,   # B
+                        cat_no,         # C
+                        lot_no,         # D
+                        float(initial_qty), # E
+                        unit,           # F
+                        expiry_date.strftime("%Y-%m-%d"), # G
+                        location,       # H
+                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"), # I
+                        registrant,     # J
+                        float(alert_qty), # K
+                        "아니요"         # L
                     ]
-                    sheet_log.append_row(log_data_list)
-                    st.session_state.form2_status = "success"
-                    st.session_state.form2_message = f"✅ **{product} (Lot: {lot})** 사용 기록이 저장되었습니다!"
-                    st.cache_data.clear() 
-                    st.session_state.usage_qty_input = 0.0
+                    sheet.append_row(log_data_list)
+                    get_local_mirror().append(target_shard.key, [log_data_list])
+                    get_stock_ledger().apply_new_lot(product_name, cat_no, lot_no, initial_qty)
+                    st.session_state.form1_status = "success"
+                    st.session_state.form1_message = f"✅ **{product_name} (Lot: {lot_no})**가 마스터 시트에 성공적으로 등록되었습니다!"
                 except Exception as e:
+                    st.session_state.form1_status = "error"
+                    st.session_state.form1_message = f"Google Sheet 저장 실패: {e}"
+            st.rerun()
+
+        # ▼▼▼ [신규] v56: 엑셀/CSV 일괄 등록 ▼▼▼
+        st.divider()
+        with st.expander("📂 엑셀/CSV 파일로 여러 Lot 한 번에 등록하기"):
+            st.write(f"Reagent_DB A~L열과 같은 헤더의 파일을 올려주세요. 필수 컬럼: {', '.join(IMPORT_REQUIRED_COLUMNS)}")
+            st.caption("유통기한이 비어 있으면 1년 뒤로, 등록 날짜는 지금 시각으로, 알림 무시는 '아니요'로 저장됩니다.")
+            # (v74 수정됨: 한 행이라도 저장되면 업로더 key 를 바꿔 파일을 비움 - 같은 파일을 두 번 등록하지 않도록)
+            upload_round = st.session_state.setdefault("bulk_import_round", 0)
+            uploaded_file = st.file_uploader("등록할 파일 (CSV / XLSX)", type=["csv", "xlsx"], key=f"bulk_import_file_{upload_round}")
+            if uploaded_file is not None:
+                try:
+                    df_import = read_import_file(uploaded_file.getvalue(), uploaded_file.name)
+                    import_rows, import_errors = validate_import(df_import)
+                except ImportFileError as e:
+                    st.error(str(e))
+                    import_rows, import_errors = [], None
+                except Exception as e:
+                    st.error(f"파일을 읽을 수 없습니다: {e}")
+                    import_rows, import_errors = [], None
+                if import_errors is not None and not import_errors.empty:
+                    st.error(f"**{len(import_errors)}개 행에 오류가 있습니다.** 파일을 고친 뒤 다시 올려주세요.")
+                    st.dataframe(import_errors, use_container_width=True, hide_index=True)
+                elif import_rows:
+                    st.info(f"**{len(import_rows)}개 Lot** 을 등록할 수 있습니다.")
+                    st.dataframe(pd.DataFrame(import_rows, columns=REAGENT_DB_COLUMNS).head(20), use_container_width=True, hide_index=True)
+                    if st.button(f"✅ {len(import_rows)}개 Lot 일괄 등록하기"):
+                        written = 0
+                        try:
+                            sheet = backend.worksheet(target_shard.spreadsheet, target_shard.tab)
+                            written = append_in_chunks(sheet, import_rows)
+                            st.session_state.form1_status = "success"
+                            st.session_state.form1_message = f"✅ **{written}개 Lot** 이 마스터 시트에 일괄 등록되었습니다!"
+                        except PartialImportError as e:
+                            written = e.written
+                            st.session_state.form1_status = "error"
+                            st.session_state.form1_message = f"Google Sheet 저장 실패 ({e.written}/{len(import_rows)}행 저장됨): {e.error}"
+                        except Exception as e:
+                            st.session_state.form1_status = "error"
+                            st.session_state.form1_message = f"Google Sheet 저장 실패: {e}"
+                        # (저장된 행만 미러/재고 원장에 반영 - 미러 버전이 한 번 올라가 Reagent_DB 만 다시 계산됨)
+                        if written:
+                            get_local_mirror().append(target_shard.key, import_rows[:written])
+                            ledger = get_stock_ledger()
+                            for row in import_rows[:written]:
+                                ledger.apply_new_lot(row[0], row[2], row[3], row[4])
+                            st.session_state.bulk_import_round = upload_round + 1
+                        st.rerun()
+        # ▲▲▲ [신규] v56 ▲▲▲
+
+
+# --- 5. 탭 2: 시약 사용 (v49와 동일) ---
+if tab2.open:
+    with tab2, metrics.timer("tab_render_seconds", tab="usage"):
+        st.header("📉 시약 사용 기록")
+        # ... (v49 탭2 코드 전체 생략 - 동일) ...
+        if len(shard_config.writable(shard_config.usage_log)) > 1:
+            st.write("이 폼을 제출하면 선택한 Lot 이 등록된 샤드의 Usage_Log 탭에 저장됩니다.")
+        else:
+            usage_shard = shard_config.writable(shard_config.usage_log)[0]
+            st.write(f"이 폼을 제출하면 **'{usage_shard.spreadsheet}'** 시트의 **'{usage_shard.tab}'** 탭에 저장됩니다.")
+        st.divider()
+        df_db = load_reagent_db(backend) 
+        df_log = load_usage_log(backend) 
+        if df_db.empty:
+            st.error("마스터 DB(Reagent_DB)에 등록된 품목이 없습니다. '새 품목 등록' 탭에서 먼저 품목을 등록하세요.")
+        else:
+            st.subheader("1. 사용할 품목 선택")
+            product_lots = get_product_lots(df_db)
+            all_products = product_lots["products"]
+            selected_product = st.selectbox("사용한 제품명*", options=all_products)
+            if selected_product:
+                available_lots = product_lots["lots"].get(selected_product, [])
+                selected_lot = st.selectbox("Lot 번호*", options=available_lots)
+            else:
+                selected_lot = st.selectbox("Lot 번호*", options=["제품명을 먼저 선택하세요"])
+            current_stock = 0.0 
+            cat_no = ""
+            unit = ""
+            alert_level = 0.0 
+            if selected_product and selected_lot:
+                try:
+                    item_info = df_db.iloc[product_lots["first_row"][(selected_product, selected_lot)]]
+                    initial_stock = item_info['최초 수량'] 
+                    cat_no = item_info['Cat. No.']
+                    unit = item_info['단위']
+                    alert_level = item_info['알림 기준 수량'] 
+                    # (v53: 로그 전체를 훑지 않고 재고 원장에서 바로 조회)
+                    current_stock = initial_stock - get_stock_ledger().total_usage(selected_product, selected_lot)
+                    st.info(f"**현재 남은 재고:** {current_stock:.2f} {unit} (총 입고: {initial_stock:.2f} {unit} / 알림 기준: {alert_level:.2f} {unit})")
+                except (IndexError, TypeError, KeyError):
+                    st.warning("재고를 계산할 수 없습니다. (마스터DB/로그 확인)")
+            st.divider()
+            st.subheader("2. 사용 정보 입력")
+            if "usage_qty_input" not in st.session_state:
+                st.session_state.usage_qty_input = 0.0
+            if "usage_user" not in st.session_state:
+                st.session_state.usage_user = ""
+            if "usage_notes" not in st.session_state:
+                st.session_state.usage_notes = ""
+            # (v68: 재고 확인은 화면에 표시된 값이 아니라 제출 시점의 최신 원장으로 - submit_usage_checked)
+            def submit_usage_callback(product, cat_no, lot, qty, user, notes, date, unit_str):
+                if not all([product, lot, qty > 0, user]):
                     st.session_state.form2_status = "error"
-                    st.session_state.form2_message = f"Google Sheet 저장 실패: {e}"
-        with st.form(key="usage_form"):
-            usage_qty = st.number_input("사용한 양*", min_value=0.0, step=1.0, format="%.2f", key="usage_qty_input")
-            user = st.text_input("사용자 이름*", key="usage_user") 
-            usage_date = st.date_input("사용 일자", value=datetime.now().date())
-            notes = st.text_area("비고 (실험명 등)", key="usage_notes")
-            submit_usage_button = st.form_submit_button(
-                label="📉 사용 기록하기",
-                on_click=submit_usage_callback,
-                args=(
-                    selected_product,
-                    selected_lot,
-                    st.session_state.usage_qty_input,
-                    st.session_state.usage_user,
-                    st.session_state.usage_notes,
-                    usage_date, 
-                    current_stock,
-                    unit
+                    st.session_state.form2_message = "필수 항목(*)을 모두 입력해야 합니다. (사용량은 0보다 커야 함)"
+                else:
+                    try:
+                        log_timestamp = datetime.combine(date, datetime.now().time())
+                        log_data_list = [
+                            log_timestamp.strftime("%Y-%m-%d %H:%M:%S"), 
+                            str(product), 
+                            str(lot),     
+                            float(qty),      
+                            user,
+                            notes
+                        ]
+                        # (v57: 시트 저장은 대기열이 백그라운드에서 처리 - 재고는 바로 반영됨)
+                        record_id, stock = submit_usage_checked(backend, product, cat_no, lot, qty, log_data_list)
+                        if record_id is None:
+                            shortage = float(qty) - stock
+                            st.session_state.form2_status = "error"
+                            st.session_state.form2_message = f"⚠️ 재고 부족! 현재 재고({stock:.2f} {unit_str})보다 {shortage:.2f} {unit_str} 만큼 더 많이 입력했습니다."
+                            return
+                        st.session_state.setdefault("usage_record_ids", []).append(record_id)
+                        st.session_state.form2_status = "success"
+                        st.session_state.form2_message = f"✅ **{product} (Lot: {lot})** 사용 기록이 접수되었습니다! (저장 상태는 아래 목록에서 확인)"
+                        st.session_state.usage_qty_input = 0.0
+                    except Exception as e:
+                        st.session_state.form2_status = "error"
+                        st.session_state.form2_message = f"사용 기록 접수 실패: {e}"
+            with st.form(key="usage_form"):
+                usage_qty = st.number_input("사용한 양*", min_value=0.0, step=1.0, format="%.2f", key="usage_qty_input")
+                user = st.text_input("사용자 이름*", key="usage_user") 
+                # (Usage_Log 압축 워터마크 이전 날짜는 받지 않음 - 그 기록은 이미 스냅샷으로 접혀 재고에 반영되지 않음)
+                watermark = get_usage_snapshot().watermark
+                usage_date = st.date_input(
+                    "사용 일자", value=datetime.now().date(), min_value=watermark.date() if watermark is not None else None
                 )
-            )
-        if "form2_status" in st.session_state:
-            if st.session_state.form2_status == "success": st.success(st.session_state.form2_message)
-            else: st.error(st.session_state.form2_message)
-            del st.session_state.form2_status
-            del st.session_state.form2_message
+                notes = st.text_area("비고 (실험명 등)", key="usage_notes")
+                submit_usage_button = st.form_submit_button(
+                    label="📉 사용 기록하기",
+                    on_click=submit_usage_callback,
+                    args=(
+                        selected_product,
+                        cat_no,
+                        selected_lot,
+                        st.session_state.usage_qty_input,
+                        st.session_state.usage_user,
+                        st.session_state.usage_notes,
+                        usage_date, 
+                        unit
+                    )
+                )
+            if "form2_status" in st.session_state:
+                if st.session_state.form2_status == "success": st.success(st.session_state.form2_message)
+                else: st.error(st.session_state.form2_message)
+                del st.session_state.form2_status
+                del st.session_state.form2_message
+
+            # ▼▼▼ [신규] v57: 이 세션에서 제출한 사용 기록의 저장 상태 ▼▼▼
+            if st.session_state.get("usage_record_ids"):
+                usage_queue = get_usage_write_queue(backend)
+                has_pending = bool(usage_queue.pending_count())
+
+                @st.fragment(run_every=2 if has_pending else None)
+                def render_usage_status():
+                    records = usage_queue.get(st.session_state.usage_record_ids[-20:])
+                    if not records:
+                        return
+                    st.write("**최근 제출한 사용 기록**")
+                    st.dataframe(
+                        pd.DataFrame([
+                            {
+                                "제출 시각": datetime.fromtimestamp(r.created_at).strftime("%H:%M:%S"),
+                                "제품명": r.row[1],
+                                "Lot 번호": r.row[2],
+                                "사용량": r.row[3],
+                                "상태": USAGE_STATUS_LABELS[r.status],
+                                "오류": r.error or "",
+                            }
+                            for r in reversed(records)
+                        ]),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                    failed_ids = [r.id for r in records if r.status == FAILED]
+                    if failed_ids and st.button(f"🔁 실패한 기록 {len(failed_ids)}건 다시 저장하기"):
+                        for record_id in failed_ids:
+                            usage_queue.retry(record_id)
+                        st.rerun()
+
+                render_usage_status()
+            # ▲▲▲ [신규] v57 ▲▲▲
 
 
 # --- 6. 탭 3: 대시보드 (재고 현황) (v50 수정됨) ---
-with tab3:
-    st.header("📊 대시보드 (재고 현황)")
+if tab3.open:
+    with tab3, metrics.timer("tab_render_seconds", tab="dashboard"):
+        st.header("📊 대시보드 (재고 현황)")
 
-    if st.button("새로고침 (Refresh Data)"):
-        st.cache_data.clear() 
-        st.rerun()
+        if st.button("새로고침 (Refresh Data)"):
+            # (v58: 원격 변경을 바로 당겨옴 - 내용이 바뀐 데이터셋만 버전이 올라가 다시 계산됨)
+            mirror_reconciler.run_once()
+            st.rerun()
 
-    # 1. 데이터 로드 (v49와 동일)
-    df_db = load_reagent_db(client)
-    df_log = load_usage_log(client)
+        # 1. 데이터 로드 (v49와 동일)
+        df_db = load_reagent_db(backend)
+        df_log = load_usage_log(backend)
 
-    if df_db.empty:
-        st.warning("마스터 DB(Reagent_DB)에 등록된 품목이 없습니다.")
-    else:
-        # 2. 총 사용량 계산 (v49와 동일)
-        if not df_log.empty:
-            usage_summary = df_log.groupby(['제품명', 'Lot 번호'])['사용량'].sum().reset_index()
-            usage_summary = usage_summary.rename(columns={'사용량': '총 사용량'})
-            df_inventory = pd.merge(df_db, usage_summary, on=['제품명', 'Lot 번호'], how='left')
-            df_inventory['총 사용량'] = df_inventory['총 사용량'].fillna(0) 
+        if df_db.empty:
+            st.warning("마스터 DB(Reagent_DB)에 등록된 품목이 없습니다.")
         else:
-            df_inventory = df_db.copy()
-            df_inventory['총 사용량'] = 0.0
-
-        # (v49 방식: 컬럼 통합)
-        df_inventory['현재 재고'] = df_inventory['최초 수량'] - df_inventory['총 사용량']
-        df_inventory['재고 비율 (%)'] = df_inventory.apply(
-            lambda row: (row['현재 재고'] / row['최초 수량']) * 100 if row['최초 수량'] > 0 else 0,
-            axis=1
-        )
-        df_inventory['재고 비율 (%)'] = df_inventory['재고 비율 (%)'].clip(0, 100)
+            # 2. 현재 재고 / 재고 비율 / 알림 상태 계산 (v60 수정됨: 한 번의 컬럼 연산으로 계산, 데이터 버전별 캐시)
+            expiry_threshold_days = EXPIRY_THRESHOLD_DAYS
+            today = pd.to_datetime(datetime.now().date()) 
+            dashboard_version, dashboard = get_dashboard(backend, df_db, today, expiry_threshold_days)
+            df_inventory = dashboard["inventory"]
         
-        # 5. 자동 알림 (v49와 동일)
-        st.subheader("🚨 자동 알림")
-        expiry_threshold_days = 30
-        today = pd.to_datetime(datetime.now().date()) 
-        df_inventory['유통기한'] = df_inventory['유통기한'].fillna(pd.NaT) 
+            # 5. 자동 알림 (v60: 알림 표는 계산 결과에서 고르기만 함)
+            st.subheader("🚨 자동 알림")
+            alerts = dashboard["alerts"]
+            expiring_soon = alerts["expiring_soon"]
+            expired = alerts["expired"]
+            low_stock = alerts["low_stock"]
+            out_of_stock = alerts["out_of_stock"]
+            depleting = alerts["depleting"]
+            if not expiring_soon.empty:
+                st.warning(f"**유통기한 {expiry_threshold_days}일 이내 임박** (재고 있음)")
+                st.dataframe(expiring_soon[['제품명', 'Lot 번호', '유통기한 (YYYY-MM-DD)', '보관 위치', '현재 재고']].rename(columns={'유통기한 (YYYY-MM-DD)': '유통기한'}), use_container_width=True)
+            if not expired.empty:
+                st.error(f"**유통기한 만료** (재고 있음)")
+                st.dataframe(expired[['제품명', 'Lot 번호', '유통기한 (YYYY-MM-DD)', '보관 위치', '현재 재고']].rename(columns={'유통기한 (YYYY-MM-DD)': '유통기한'}), use_container_width=True)
         
-        expiring_soon = df_inventory[
-            (df_inventory['유통기한'] >= today) &
-            (df_inventory['유통기한'] <= (today + pd.DateOffset(days=expiry_threshold_days))) &
-            (df_inventory['현재 재고'] > 0) &
-            (df_inventory['알림 무시'] != "예") 
-        ]
-        expired = df_inventory[
-            (df_inventory['유통기한'] < today) &
-            (df_inventory['현재 재고'] > 0) &
-            (df_inventory['알림 무시'] != "예") 
-        ]
-        if not expiring_soon.empty:
-            st.warning(f"**유통기한 {expiry_threshold_days}일 이내 임박** (재고 있음)")
-            expiring_display = expiring_soon.copy()
-            expiring_display['유통기한'] = expiring_display['유통기한'].dt.strftime('%Y-%m-%d')
-            st.dataframe(expiring_display[['제품명', 'Lot 번호', '유통기한', '보관 위치', '현재 재고']], use_container_width=True)
-        if not expired.empty:
-            st.error(f"**유통기한 만료** (재고 있음)")
-            expired_display = expired.copy()
-            expired_display['유통기한'] = expired_display['유통기한'].dt.strftime('%Y-%m-%d')
-            st.dataframe(expired_display[['제품명', 'Lot 번호', '유통기한', '보관 위치', '현재 재고']], use_container_width=True)
-        
-        low_stock = df_inventory[
-            (df_inventory['현재 재고'] <= df_inventory['알림 기준 수량']) &
-            (df_inventory['현재 재고'] > 0) &
-            (df_inventory['알림 무시'] != "예") 
-        ]
-        out_of_stock = df_inventory[
-            (df_inventory['현재 재고'] <= 0) &
-            (df_inventory['알림 무시'] != "예") 
-        ]
-        if not low_stock.empty:
-            st.warning(f"**재고 부족 (알림 기준 수량 이하)**")
-            st.dataframe(low_stock[['제품명', 'Lot 번호', '현재 재고', '단위', '알림 기준 수량']], use_container_width=True)
-        if not out_of_stock.empty:
-            st.error(f"**재고 소진 (0 이하)**")
-            st.dataframe(out_of_stock[['제품명', 'Lot 번호', '현재 재고', '단위']], use_container_width=True)
+            if not low_stock.empty:
+                st.warning(f"**재고 부족 (알림 기준 수량 이하)**")
+                st.dataframe(low_stock[['제품명', 'Lot 번호', '현재 재고', '단위', '알림 기준 수량']], use_container_width=True)
+            if not out_of_stock.empty:
+                st.error(f"**재고 소진 (0 이하)**")
+                st.dataframe(out_of_stock[['제품명', 'Lot 번호', '현재 재고', '단위']], use_container_width=True)
+            # (v65 신규: 최근 4주 사용 속도로 예측한 소진 임박 - 발주 참고용)
+            if not depleting.empty:
+                st.warning(f"**{DEPLETION_ALERT_DAYS}일 이내 소진 예상** (최근 4주 사용 속도 기준)")
+                st.dataframe(
+                    depleting[['제품명', 'Lot 번호', '현재 재고', '단위', WEEKLY_RATE_COLUMN, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN]],
+                    column_config={
+                        WEEKLY_RATE_COLUMN: st.column_config.NumberColumn(format="%.2f"),
+                        DAYS_TO_STOCKOUT_COLUMN: st.column_config.NumberColumn(format="%.0f"),
+                        DAYS_TO_EXPIRY_COLUMN: st.column_config.NumberColumn(format="%.0f"),
+                    },
+                    use_container_width=True
+                )
             
-        if expiring_soon.empty and expired.empty and low_stock.empty and out_of_stock.empty:
-            st.success("✅ 모든 재고가 양호합니다!")
+            if expiring_soon.empty and expired.empty and low_stock.empty and out_of_stock.empty and depleting.empty:
+                st.success("✅ 모든 재고가 양호합니다!")
         
-        # (v49의 알림 해제 섹션)
-        st.divider()
-        st.subheader("🗃️ 품목 보관 (알림 해제)")
+            # (v49의 알림 해제 섹션 / v55 수정됨: 여러 품목 선택 + 일괄 해제)
+            st.divider()
+            st.subheader("🗃️ 품목 보관 (알림 해제)")
         
-        if not out_of_stock.empty:
-            mute_options = [
-                f"{row['제품명']} / Lot: {row['Lot 번호']}" for index, row in out_of_stock.iterrows()
-            ]
-            mute_options.insert(0, "알림을 해제할 품목을 선택하세요...") 
+            if "mute_status" in st.session_state:
+                if st.session_state.mute_status == "success": st.success(st.session_state.mute_message)
+                else: st.error(st.session_state.mute_message)
+                del st.session_state.mute_status
+                del st.session_state.mute_message
+
+            if not out_of_stock.empty:
+                mute_options = dashboard["mute_options"]
             
-            selected_item_to_mute = st.selectbox("재고 소진 품목 알림 해제:", options=mute_options)
+                selected_items_to_mute = st.multiselect(
+                    "재고 소진 품목 알림 해제 (여러 개 선택 가능):",
+                    options=mute_options,
+                    placeholder="알림을 해제할 품목을 선택하세요..."
+                )
             
-            if st.button("➡️ 이 품목 알림 해제하기"):
-                if selected_item_to_mute == mute_options[0]:
-                    st.warning("알림을 해제할 품목을 선택하세요.")
-                else:
-                    try:
-                        product_to_mute, lot_to_mute = selected_item_to_mute.split(" / Lot: ")
-                        
-                        sh_db = client.open(REAGENT_DB_NAME)
-                        sheet_db = sh_db.worksheet(REAGENT_DB_TAB)
-                        
-                        all_data = sheet_db.get_all_records()
-                        target_rows = []
-                        for i, record in enumerate(all_data):
-                            if (str(record['제품명']) == product_to_mute and 
-                                str(record['Lot 번호']) == lot_to_mute):
-                                target_rows.append(i + 2) 
-                        
-                        if not target_rows:
-                            st.error(f"시트에서 '{selected_item_to_mute}'을(를) 찾지 못했습니다. (데이터 확인 필요)")
-                        else:
-                            # (v49: L열(12)로 '알림 무시' 컬럼 위치 변경)
-                            for row_index in target_rows:
-                                sheet_db.update_cell(row_index, 12, "예") # 12 = L열
-                            
-                            st.success(f"✅ '{product_to_mute}' (Lot: {lot_to_mute}) 품목이 알림에서 해제되었습니다.")
-                            st.cache_data.clear()
+                if st.button("➡️ 선택 품목 알림 해제하기"):
+                    if not selected_items_to_mute:
+                        st.warning("알림을 해제할 품목을 선택하세요.")
+                    else:
+                        try:
+                            keys_to_mute = [tuple(item.split(" / Lot: ")) for item in selected_items_to_mute]
+                            missing = mute_alerts(backend, get_local_mirror(), keys_to_mute)
+                            muted_count = len(keys_to_mute) - len(missing)
+                            if missing:
+                                missing_text = ", ".join(f"{p} / Lot: {l}" for p, l in missing)
+                                st.session_state.mute_status = "error"
+                                st.session_state.mute_message = f"{muted_count}개 품목을 해제했지만, 시트에서 '{missing_text}'을(를) 찾지 못했습니다. (데이터 확인 필요)"
+                            else:
+                                st.session_state.mute_status = "success"
+                                st.session_state.mute_message = f"✅ {muted_count}개 품목이 알림에서 해제되었습니다."
                             st.rerun()
 
-                    except Exception as e:
-                        st.error(f"알림 해제 중 오류 발생: {e}")
-        else:
-            st.info("현재 알림을 해제할 '재고 소진' 품목이 없습니다.")
+                        except Exception as e:
+                            st.error(f"알림 해제 중 오류 발생: {e}")
+            else:
+                st.info("현재 알림을 해제할 '재고 소진' 품목이 없습니다.")
             
-        st.divider()
+            st.divider()
 
-        # --- 6. 전체 재고 현황 (v50 수정됨) ---
-        st.subheader("전체 재고 현황")
+            # --- 6. 전체 재고 현황 (v50 수정됨) ---
+            st.subheader("전체 재고 현황")
         
-        # ▼▼▼ [신규] v50: 고급 필터 (v48) ▼▼▼
-        st.write("**고급 필터**")
-        col1, col2 = st.columns(2)
+            # ▼▼▼ [신규] v50: 고급 필터 (v48) ▼▼▼
+            st.write("**고급 필터**")
+            col1, col2 = st.columns(2)
         
-        # (제조사 필터)
-        all_manufacturers = sorted(df_inventory['제조사'].dropna().unique())
-        selected_manufacturers = col1.multiselect(
-            "제조사 필터:",
-            options=all_manufacturers,
-            default=all_manufacturers
-        )
+            # (제조사 필터)
+            all_manufacturers = sorted(df_inventory['제조사'].dropna().unique())
+            selected_manufacturers = col1.multiselect(
+                "제조사 필터:",
+                options=all_manufacturers,
+                default=all_manufacturers
+            )
         
-        # (보관 위치 필터)
-        all_locations = sorted(df_inventory['보관 위치'].dropna().unique())
-        selected_locations = col2.multiselect(
-            "보관 위치 필터:",
-            options=all_locations,
-            default=all_locations
-        )
+            # (보관 위치 필터)
+            all_locations = sorted(df_inventory['보관 위치'].dropna().unique())
+            selected_locations = col2.multiselect(
+                "보관 위치 필터:",
+                options=all_locations,
+                default=all_locations
+            )
         
-        # (검색창)
-        search_query = st.text_input(
-            "🔎 빠른 검색 (제품명, Cat. No., Lot 번호)", 
-            placeholder="DMEM, 1111, 2222dd 등으로 검색..."
-        )
-        # ▲▲▲ [신규] v50 ▲▲▲
+            # (검색창)
+            search_query = st.text_input(
+                "🔎 빠른 검색 (제품명, 제조사, Cat. No., Lot 번호 - 오타 허용)", 
+                placeholder="DMEM, 1111, 2222dd 등으로 검색..."
+            )
+            # ▲▲▲ [신규] v50 ▲▲▲
 
         
-        # (v49 방식: 컬럼 통합)
-        display_columns = [
-            "제품명", "제조사", "Cat. No.", "Lot 번호", 
-            "현재 재고", "단위", "최초 수량", "총 사용량",
-            "재고 비율 (%)", 
-            "알림 기준 수량", "알림 무시", 
-            "유통기한", "보관 위치", "등록자", "등록 날짜"
-        ]
+            # (v49 방식: 컬럼 통합)
+            display_columns = [
+                "제품명", "제조사", "Cat. No.", "Lot 번호", 
+                "현재 재고", "단위", "최초 수량", "총 사용량",
+                "재고 비율 (%)", "알림 상태",
+                DAILY_RATE_COLUMN, WEEKLY_RATE_COLUMN, PRODUCT_WEEKLY_RATE_COLUMN,
+                DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN,
+                "알림 기준 수량", "알림 무시", 
+                "유통기한", "보관 위치", "등록자", "등록 날짜"
+            ]
         
-        available_columns = [col for col in display_columns if col in df_inventory.columns]
+            available_columns = [col for col in display_columns if col in df_inventory.columns]
         
-        if '유통기한' in available_columns:
-            df_inventory['유통기한 (YYYY-MM-DD)'] = df_inventory['유통기한'].dt.strftime('%Y-%m-%d')
-            available_columns[available_columns.index('유통기한')] = '유통기한 (YYYY-MM-DD)'
+            if '유통기한' in available_columns:
+                available_columns[available_columns.index('유통기한')] = '유통기한 (YYYY-MM-DD)'
             
-        # ▼▼▼ [수정됨] v50: 필터 로직 적용 ▼▼▼
-        df_display = df_inventory[available_columns] 
-        
-        # (1. 고급 필터 적용)
-        df_display = df_display[
-            df_display['제조사'].isin(selected_manufacturers) &
-            df_display['보관 위치'].isin(selected_locations)
-        ]
+            # ▼▼▼ [수정됨] v50: 필터 로직 적용 (v61: 검색은 미리 만든 색인으로 행 위치를 찾아 필터와 교집합) ▼▼▼
+            # (1. 고급 필터 적용)
+            filter_mask = (
+                df_inventory['제조사'].isin(selected_manufacturers) &
+                df_inventory['보관 위치'].isin(selected_locations)
+            ).to_numpy()
         
-        # (2. 빠른 검색 적용)
-        if search_query:
-            query = search_query.lower() 
-            mask = (
-                df_display['제품명'].astype(str).str.lower().str.contains(query) |
-                df_display['제조사'].astype(str).str.lower().str.contains(query) | 
-                df_display['Cat. No.'].astype(str).str.lower().str.contains(query) |
-                df_display['Lot 번호'].astype(str).str.lower().str.contains(query)
-            )
-            df_display = df_display[mask]
-        # ▲▲▲ [수정됨] v50 ▲▲▲
+            # (2. 빠른 검색 적용)
+            if search_query:
+                # (색인은 만든 DataFrame 객체별로 캐시 - 그 사이 동기화로 미러 버전이 바뀌어도 행 위치가 어긋나지 않음)
+                search_index = get_dataset_cache().get("search_index", id(df_db), lambda: SearchIndex(df_db))
+                hit_rows, is_fuzzy = search_index.search(search_query)
+                display_rows = hit_rows[filter_mask[hit_rows]]
+                if is_fuzzy and len(display_rows):
+                    st.caption(f"'{search_query}'와(과) 정확히 일치하는 품목이 없어 비슷한 품목을 보여줍니다. (유사도 순)")
+            else:
+                display_rows = np.flatnonzero(filter_mask)
+            # ▲▲▲ [수정됨] v50 ▲▲▲
+
+            # (v63 신규: 정렬은 캐시된 재고 현황 전체의 정렬 순서(데이터 버전별 캐시)에 필터 결과를 겹쳐서 계산)
+            col_sort, col_order = st.columns(2)
+            sort_column = col_sort.selectbox("정렬 기준", ["기본 순서"] + available_columns, key="inventory_sort")
+            sort_ascending = col_order.radio("정렬 방향", ["오름차순", "내림차순"], horizontal=True, key="inventory_sort_dir") == "오름차순"
+            if sort_column != "기본 순서":
+                order = get_dataset_cache().get(
+                    ("inventory_order", sort_column, sort_ascending),
+                    dashboard_version,
+                    lambda: sort_order(df_inventory, sort_column, sort_ascending)
+                )
+                display_rows = select_rows(order, display_rows, len(df_inventory))
+
+            page, page_size = paging_controls("inventory")
+            page_rows, page, page_count = paginate(display_rows, page, page_size)
+            df_display = df_inventory.iloc[page_rows][available_columns]
+            paging_caption(len(display_rows), page, page_count, page_size)
             
-        # (v49 방식: data_editor + column_config)
-        st.data_editor( 
-            df_display,
-            use_container_width=True,
-            disabled=True, 
+            # (v49 방식: data_editor + column_config)
+            st.data_editor( 
+                df_display,
+                use_container_width=True,
+                disabled=True, 
             
-            column_config={
-                "재고 비율 (%)": st.column_config.ProgressColumn(
-                    "재고 비율 (%)",  
-                    format="%.1f%%", # (소수점 첫째 자리 %)
-                    min_value=0,
-                    max_value=100,
-                ),
-                "현재 재고": st.column_config.NumberColumn(
-                    "현재 재고",
-                    format="%.2f", 
-                ),
-                "총 사용량": st.column_config.NumberColumn(
-                    "총 사용량",
-                    format="%.0f", 
-                ),
-                "알림 기준 수량": st.column_config.NumberColumn(
-                    "알림 기준",
-                    format="%.2f",
-                ),
-                "알림 무시": st.column_config.TextColumn(
-                    "알림 무시"
-                ),
-                "제조사": st.column_config.TextColumn( 
-                    "제조사"
-                ),
-            }
-        )
+                column_config={
+                    "재고 비율 (%)": st.column_config.ProgressColumn(
+                        "재고 비율 (%)",  
+                        format="%.1f%%", # (소수점 첫째 자리 %)
+                        min_value=0,
+                        max_value=100,
+                    ),
+                    "현재 재고": st.column_config.NumberColumn(
+                        "현재 재고",
+                        format="%.2f", 
+                    ),
+                    "총 사용량": st.column_config.NumberColumn(
+                        "총 사용량",
+                        format="%.0f", 
+                    ),
+                    "알림 기준 수량": st.column_config.NumberColumn(
+                        "알림 기준",
+                        format="%.2f",
+                    ),
+                    "알림 무시": st.column_config.TextColumn(
+                        "알림 무시"
+                    ),
+                    "제조사": st.column_config.TextColumn( 
+                        "제조사"
+                    ),
+                    # (v65 신규: 사용 속도 / 소진 예상)
+                    DAILY_RATE_COLUMN: st.column_config.NumberColumn(format="%.2f"),
+                    WEEKLY_RATE_COLUMN: st.column_config.NumberColumn(format="%.2f"),
+                    PRODUCT_WEEKLY_RATE_COLUMN: st.column_config.NumberColumn(format="%.2f"),
+                    DAYS_TO_STOCKOUT_COLUMN: st.column_config.NumberColumn(format="%.0f"),
+                    DAYS_TO_EXPIRY_COLUMN: st.column_config.NumberColumn(format="%.0f"),
+                }
+            )
         
-        # (v49의 상세 사용 이력 섹션)
-        st.divider()
-        st.subheader("📈 상세 사용 이력 (필터링된 품목)")
+            # (v49의 상세 사용 이력 섹션)
+            st.divider()
+            st.subheader("📈 상세 사용 이력 (필터링된 품목)")
         
-        if df_display.empty:
-            if search_query or (len(selected_manufacturers) < len(all_manufacturers)) or (len(selected_locations) < len(all_locations)):
-                st.warning("선택된 필터/검색어에 해당하는 품목이 없습니다.")
+            if not len(display_rows):
+                if search_query or (len(selected_manufacturers) < len(all_manufacturers)) or (len(selected_locations) < len(all_locations)):
+                    st.warning("선택된 필터/검색어에 해당하는 품목이 없습니다.")
+                else:
+                    st.info("상세 이력을 보려면 위 검색창에서 품목을 검색하세요.")
             else:
-                st.info("상세 이력을 보려면 위 검색창에서 품목을 검색하세요.")
-        else:
-            products_to_show = df_display['제품명'].unique()
-            lots_to_show = df_display['Lot 번호'].unique()
-            
-            log_mask = (
-                df_log['제품명'].isin(products_to_show) &
-                df_log['Lot 번호'].isin(lots_to_show)
-            )
-            df_log_filtered = df_log[log_mask]
+                # (v64 수정됨: 선택된 품목의 (제품명, Lot 번호) 쌍 그대로 색인에서 조회 - 로그 전체 스캔/전체 정렬 없음)
+                df_selected = df_inventory.iloc[display_rows]
+                keys_to_show = list(dict.fromkeys(zip(df_selected['제품명'], df_selected['Lot 번호'])))
+                # (색인은 만든 DataFrame 객체별로 캐시 - 그 사이 동기화로 버전이 바뀌어도 행 위치가 어긋나지 않음)
+                history_index = get_dataset_cache().get(
+                    "usage_history_index", id(df_log), lambda: UsageHistoryIndex(df_log)
+                )
+
+                col_range, col_dates = st.columns([1, 3])
+                # (v67 신규: 압축으로 보관소에 옮겨진 오래된 기록은 요청할 때만 읽음)
+                include_archive = col_range.checkbox("보관된 이력 포함", key="usage_history_archive")
+                limit_range = col_range.checkbox("기간으로 제한", key="usage_history_limit")
+                history_start = history_end = None
+                if limit_range:
+                    today_date = datetime.now().date()
+                    date_range = col_dates.date_input(
+                        "기간 (시작일 ~ 종료일)",
+                        value=(today_date - pd.Timedelta(days=30), today_date),
+                        key="usage_history_range"
+                    )
+                    if len(date_range) == 2:
+                        history_start = pd.Timestamp(date_range[0])
+                        history_end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)   # (종료일 포함)
+                log_positions = history_index.lookup(keys_to_show, history_start, history_end)
+                df_history = history_index.frame
+                if include_archive:
+                    snapshot = get_usage_snapshot()
+                    df_archive = get_dataset_cache().get(
+                        "usage_archive", snapshot.watermark,
+                        lambda: read_archive([ParquetArchive(), SheetArchive(backend)])
+                    )
+                    archive_index = get_dataset_cache().get(
+                        "usage_archive_index", id(df_archive), lambda: UsageHistoryIndex(df_archive)
+                    )
+                    archive_positions = archive_index.lookup(keys_to_show, history_start, history_end)
+                    # (워터마크 이전 행은 보관소 쪽 것만 사용 - df_log 가 이미 압축 대상 샤드의 그 행들을 뺀 상태)
+                    parts = [df_history.iloc[log_positions], df_archive.iloc[archive_positions]]
+                    parts = [part for part in parts if len(part)]
+                    df_history = pd.concat(parts, ignore_index=True).sort_values(
+                        "Timestamp", ascending=False, kind="stable", ignore_index=True
+                    ) if parts else df_history
+                    log_positions = np.arange(len(df_history)) if parts else np.empty(0, dtype=np.int64)
         
-            if df_log_filtered.empty:
-                st.info("선택된 품목에 대한 사용 기록(Usage Log)이 없습니다.")
-            else:
-                df_log_filtered = df_log_filtered.sort_values(by="Timestamp", ascending=False)
-                df_log_filtered['Timestamp (YYYY-MM-DD)'] = df_log_filtered['Timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+                if not len(log_positions):
+                    st.info("선택된 품목에 대한 사용 기록(Usage Log)이 없습니다.")
+                else:
+                    # (v63: 이력도 보이는 페이지만 잘라서 전송)
+                    log_page, log_page_size = paging_controls("usage_history")
+                    log_rows, log_page, log_page_count = paginate(log_positions, log_page, log_page_size)
+                    df_log_page = df_history.iloc[log_rows].copy()
+                    df_log_page['Timestamp (YYYY-MM-DD)'] = df_log_page['Timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+                    paging_caption(len(log_positions), log_page, log_page_count, log_page_size)
+                    st.dataframe(
+                        df_log_page[['Timestamp (YYYY-MM-DD)', '제품명', 'Lot 번호', '사용자', '사용량', '비고']], 
+                        use_container_width=True
+                    )
+
+            # (v62 신규: 캐시된 데이터의 메모리 사용량 - 반복 문자열은 category, 나머지는 Arrow 문자열로 보관)
+            with st.expander("🧮 메모리 사용량"):
                 st.dataframe(
-                    df_log_filtered[['Timestamp (YYYY-MM-DD)', '제품명', 'Lot 번호', '사용자', '사용량', '비고']], 
+                    memory_report({
+                        "Reagent_DB": df_db,
+                        "Usage_Log": df_log,
+                        "재고 현황 (대시보드)": df_inventory,
+                    }),
+                    column_config={"메모리 (MB)": st.column_config.NumberColumn(format="%.2f")},
+                    hide_index=True,
                     use_container_width=True
                 )
+
+# (v69: 스크립트 한 번 실행(rerun) 전체 시간)
+metrics.observe("rerun_seconds", time.perf_counter() - rerun_started)
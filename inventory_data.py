@@ -0,0 +1,350 @@
+# --- 실험실 재고 관리기: 시트 데이터 파싱 / 동기화 ---
+# (inventory_app.py 의 로더들이 사용하는 Streamlit 비의존 로직)
+import threading
+import time
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from gspread.utils import numericise, numericise_all, rowcol_to_a1
+
+REAGENT_DB_COLUMNS = ["제품명", "제조사", "Cat. No.", "Lot 번호", "최초 수량", "단위", "유통기한", "보관 위치", "등록 날짜", "등록자", "알림 기준 수량", "알림 무시"]
+REAGENT_DB_EMPTY_COLUMNS = ["제품명", "제조사", "Cat. No.", "Lot 번호", "최초 수량", "단위", "유통기한", "알림 기준 수량", "알림 무시"]
+UNIT_OPTIONS = ["개", "box", "kit", "mL", "L", "g", "kg"]
+USAGE_LOG_COLUMNS = ["Timestamp", "제품명", "Lot 번호", "사용량", "사용자", "비고"]
+USAGE_LOG_EMPTY_COLUMNS = ["제품명", "Lot 번호", "사용량", "Timestamp"]
+
+# (메모리 절약형 컬럼 타입: 반복이 많은 문자열은 category(사전 인코딩), 나머지 문자열은 Arrow 문자열)
+try:
+    import pyarrow  # noqa: F401 (streamlit 의존 패키지)
+    COMPACT_STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    COMPACT_STRING_DTYPE = "string"
+REAGENT_DB_CATEGORY_COLUMNS = ["제품명", "제조사", "Cat. No.", "단위", "보관 위치", "등록자", "알림 무시"]
+REAGENT_DB_STRING_COLUMNS = ["Lot 번호", "등록 날짜"]
+USAGE_LOG_CATEGORY_COLUMNS = ["제품명", "Lot 번호", "사용자"]
+USAGE_LOG_STRING_COLUMNS = ["비고"]
+
+# (시트에 쓰는 날짜 형식 - 앱이 쓰는 형식과 같음 / 형식이 다른 셀만 따로 추론)
+DATE_FORMATS = {"유통기한": "%Y-%m-%d", "등록 날짜": "%Y-%m-%d %H:%M:%S", "Timestamp": "%Y-%m-%d %H:%M:%S"}
+REAGENT_DB_KEY_COLUMNS = ["제품명", "Cat. No.", "Lot 번호"]
+# (같은 Lot 의 여러 행 중 가장 늦게 등록된 값을 쓰는 컬럼 - 집계 결과의 컬럼 순서)
+REAGENT_DB_LAST_COLUMNS = ["알림 기준 수량", "단위", "보관 위치", "유통기한", "등록 날짜", "등록자", "알림 무시", "제조사"]
+
+
+class ReagentDbSchemaError(ValueError):
+    pass
+
+
+class UsageLogSchemaError(ValueError):
+    pass
+
+
+# (1) 시트 원본 행(list) -> DataFrame (get_all_records 와 같은 숫자 변환 규칙)
+def rows_to_frame(header, rows):
+    width = len(header)
+    records = [numericise_all(list(row[:width]) + [""] * (width - len(row))) for row in rows]
+    return pd.DataFrame(records, columns=header)
+
+
+# (문자열 컬럼을 category / Arrow 문자열로 변환 - 원본 DataFrame 을 바꿔서 돌려줌)
+def compact_frame(df, category_columns, string_columns):
+    for col in category_columns:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in string_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(COMPACT_STRING_DTYPE)
+    return df
+
+
+# (category 컬럼끼리는 카테고리를 합쳐서 이어 붙임 - pd.concat 은 카테고리가 다르면 object 로 풀어버림)
+# (빈 DataFrame 은 카테고리 dtype 이 달라(object) union_categoricals 가 실패하므로 빼고 이어 붙임)
+def concat_frames(frames):
+    frames = [frame for frame in frames if len(frame)] or frames[-1:]
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for col in frames[0].columns:
+        parts = [frame[col] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[col] = union_categoricals(parts, ignore_order=True)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+# (데이터셋별 메모리 사용량 표: {이름: DataFrame})
+def memory_report(frames):
+    rows = []
+    for name, df in frames.items():
+        usage = df.memory_usage(deep=True)
+        rows.append({
+            "데이터": name,
+            "행 수": len(df),
+            "메모리 (MB)": usage.sum() / 1024 ** 2,
+            "가장 큰 컬럼": usage.drop("Index", errors="ignore").idxmax() if len(usage) > 1 else "",
+        })
+    return pd.DataFrame(rows)
+
+
+# (시트 셀 값 -> 로더가 만드는 문자열 키와 같은 형태. 예: "00123" -> "123")
+def key_value(value):
+    return str(numericise(str(value)))
+
+
+# (1-1) 시트 원본 행 -> 컬럼별 변환 (rows_to_frame + parse_* 와 같은 결과를 셀 단위 파이썬 변환 없이)
+# - 행을 컬럼으로 전치한 뒤, 문자열 / 숫자 컬럼은 '서로 다른 값'마다 한 번만 변환 (numericise 규칙 그대로)
+# - 날짜 컬럼은 정해진 형식으로 한 번에 파싱하고, 형식이 다른 셀만 셀별로 추론
+def _transpose(rows, width):
+    columns = list(zip_longest(*rows, fillvalue="")) if rows else []
+    return columns[:width] + [("",) * len(rows)] * (width - len(columns))
+
+
+def _number(value):
+    value = numericise(str(value))
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(pd.to_numeric(value, errors='coerce'))
+
+
+def _text_column(values):
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    return np.array([key_value(v) for v in uniques], dtype=object)[codes]
+
+
+def _category_column(values):
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    categories, inverse = np.unique(np.array([key_value(v) for v in uniques], dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(inverse[codes], pd.Index(categories, dtype=str))
+
+
+def _number_column(values):
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    numbers = np.array([_number(v) for v in uniques], dtype='float64')[codes]
+    return np.nan_to_num(numbers, nan=0.0)
+
+
+def _date_column(values, fmt):
+    raw = pd.Series(np.asarray(values, dtype=object))
+    parsed = pd.to_datetime(raw, format=fmt, errors='coerce')
+    if not parsed.isna().any():
+        return parsed
+    retry = parsed.isna() & (raw.astype(str) != "")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(raw[retry].astype(str), format="mixed", errors='coerce')
+    return parsed
+
+
+def _convert_column(col, values, category_columns, numeric_columns):
+    if col in DATE_FORMATS:
+        return _date_column(values, DATE_FORMATS[col])
+    if col in numeric_columns:
+        return _number_column(values)
+    if col in category_columns:
+        return _category_column(values)
+    return _text_column(values)
+
+
+# (2) Reagent_DB: 샤드별 원본 행을 합쳐 변환 + 집계 / parts = [(header, rows), ...]
+def reagent_db_from_values(parts):
+    columns = {col: [] for col in REAGENT_DB_COLUMNS}
+    for header, rows in parts:
+        if not header or not rows:
+            continue
+        header = [str(h) for h in header]
+        if not all(col in header for col in REAGENT_DB_COLUMNS):
+            raise ReagentDbSchemaError(f"Reagent_DB 'Master' 탭에 {REAGENT_DB_COLUMNS} 컬럼이 모두 필요합니다. (A~L열 순서 확인)")
+        transposed = _transpose(rows, len(header))
+        for col in REAGENT_DB_COLUMNS:
+            columns[col].extend(transposed[header.index(col)])
+    if not columns['제품명']:
+        return pd.DataFrame(columns=REAGENT_DB_EMPTY_COLUMNS)
+    df = pd.DataFrame({
+        col: _convert_column(col, values, REAGENT_DB_CATEGORY_COLUMNS, ["최초 수량", "알림 기준 수량"])
+        for col, values in columns.items()
+    })
+    return _aggregate_reagent_db(df)
+
+
+# ((제품명, Cat. No., Lot 번호) 단위 집계: 등록 날짜 순으로 한 번 정렬하고 그룹을 한 번만 나눠 합계 / 마지막 값을 함께 계산)
+# (마지막 값은 빈 값(NaN / NaT)을 건너뜀 - v49 의 agg(..., 'last') 와 같음)
+def _aggregate_reagent_db(df):
+    df = df.sort_values(by='등록 날짜', kind='stable')
+    grouped = df.groupby(REAGENT_DB_KEY_COLUMNS, sort=True, observed=True)
+    df_agg = grouped[REAGENT_DB_LAST_COLUMNS].last()
+    df_agg.insert(0, '최초 수량', grouped['최초 수량'].sum())
+    df_agg = df_agg.reset_index()
+    df_agg['등록 날짜'] = df_agg['등록 날짜'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return compact_frame(df_agg, REAGENT_DB_CATEGORY_COLUMNS, REAGENT_DB_STRING_COLUMNS)
+
+
+# (2-1) DataFrame 입력용 Reagent_DB 타입 변환 (rows_to_frame 결과 등 / v49 load_reagent_db 와 동일)
+def parse_reagent_db(df):
+    if not all(col in df.columns for col in REAGENT_DB_COLUMNS):
+        raise ReagentDbSchemaError(f"Reagent_DB 'Master' 탭에 {REAGENT_DB_COLUMNS} 컬럼이 모두 필요합니다. (A~L열 순서 확인)")
+
+    df['제품명'] = df['제품명'].astype(str)
+    df['제조사'] = df['제조사'].astype(str)
+    df['Cat. No.'] = df['Cat. No.'].astype(str)
+    df['Lot 번호'] = df['Lot 번호'].astype(str)
+    df['최초 수량'] = pd.to_numeric(df['최초 수량'], errors='coerce').fillna(0).astype('float64')
+    df['알림 기준 수량'] = pd.to_numeric(df['알림 기준 수량'], errors='coerce').fillna(0).astype('float64')
+    df['유통기한'] = pd.to_datetime(df['유통기한'], errors='coerce')
+    df['단위'] = df['단위'].astype(str)
+    df['보관 위치'] = df['보관 위치'].astype(str)
+    df['등록 날짜'] = pd.to_datetime(df['등록 날짜'], errors='coerce')
+    df['등록자'] = df['등록자'].astype(str)
+    df['알림 무시'] = df['알림 무시'].astype(str).fillna("아니요")
+
+    return _aggregate_reagent_db(df)
+
+
+# (3) Usage_Log: 원본 행 -> 타입 변환된 DataFrame
+def usage_log_from_values(header, rows):
+    header = [str(h) for h in header]
+    if not all(col in header for col in USAGE_LOG_COLUMNS):
+        raise UsageLogSchemaError("Usage_Log 'Log' 탭에 '제품명', 'Lot 번호', '사용량' 컬럼이 없습니다. (1행 헤더 확인)")
+    df = pd.DataFrame({
+        col: _convert_column(col, values, USAGE_LOG_CATEGORY_COLUMNS, ["사용량"])
+        for col, values in zip(header, _transpose(rows, len(header)))
+    })
+    return compact_frame(df, [], USAGE_LOG_STRING_COLUMNS)
+
+
+# (3-1) DataFrame 입력용 Usage_Log 타입 변환 (v49 load_usage_log 와 동일)
+def parse_usage_log(df):
+    if not all(col in df.columns for col in USAGE_LOG_COLUMNS):
+        raise UsageLogSchemaError("Usage_Log 'Log' 탭에 '제품명', 'Lot 번호', '사용량' 컬럼이 없습니다. (1행 헤더 확인)")
+    df['제품명'] = df['제품명'].astype(str)
+    df['Lot 번호'] = df['Lot 번호'].astype(str)
+    df['사용량'] = pd.to_numeric(df['사용량'], errors='coerce').fillna(0).astype('float64')
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
+    return compact_frame(df, USAGE_LOG_CATEGORY_COLUMNS, USAGE_LOG_STRING_COLUMNS)
+
+
+# (행을 문자열 width 칸으로 맞춤 - 모자라면 빈 값, 넘치면 자름)
+def pad_row(row, width):
+    return [str(v) for v in row[:width]] + [""] * (width - len(row))
+
+
+# (열 번호(1부터) -> A1 표기의 열 문자: 12 -> "L")
+def column_letter(col):
+    return rowcol_to_a1(1, col).rstrip("0123456789")
+
+
+# (시트 표시 형식 차이 무시: 2.0 과 "2" 를 같은 값으로 비교)
+def _normalize(row, width):
+    return numericise_all(pad_row(row, width))
+
+
+# (4) Usage_Log 증분(tail) 동기화
+# - 이미 읽은 행 수를 기억하고, 그 뒤(tail) 범위만 가져와 파싱 후 누적 DataFrame 에 붙입니다.
+# - 헤더 또는 마지막으로 읽은 행이 바뀌었으면(편집/삭제) 전체를 다시 읽습니다.
+# - 중간 행 편집은 tail 비교로 잡히지 않으므로 full_resync_seconds 마다 한 번 전체 재동기화합니다.
+# - revision 을 함께 주면 지난 동기화 이후 바뀌지 않은 시트는 읽지 않습니다. (변경 확인 1회로 끝남)
+# - listener(event, header, rows, frame): "full"(전체 교체) / "append"(행 추가) 시 호출
+#   (rows = 원본 행, frame = 파싱된 DataFrame(전체 또는 추가분) - 로컬 미러/재고 원장 반영용)
+class UsageLogSync:
+    def __init__(self, full_resync_seconds=600, listener=None):
+        self.full_resync_seconds = full_resync_seconds
+        self.listener = listener
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.header = None
+        self.rows_ingested = 0     # 헤더를 제외하고 반영된 데이터 행 수
+        self.last_row = None       # 마지막으로 반영된 행 (정규화된 값)
+        self.df = None
+        self.version = 0           # df 가 바뀔 때마다 1씩 증가 (캐시 키)
+        self.last_full_sync = 0.0
+        self.revision = None       # 마지막 동기화 직전에 확인한 스프레드시트 revision (그 뒤 앱이 직접 붙인 행이 있으면 None)
+        self.full_reloads = 0
+        self.tail_syncs = 0
+        self.skipped_syncs = 0
+
+    @property
+    def loaded(self):
+        return self.df is not None
+
+    # (로컬 미러 등에 저장된 원본 행으로 네트워크 없이 상태 복원)
+    def seed(self, header, rows):
+        with self._lock:
+            self._replace(list(header), rows)
+            self.last_full_sync = time.monotonic()
+
+    # (revision: 읽기 전에 확인한 backend.revision() 값 - 지난 동기화 때와 같으면 시트를 읽지 않음)
+    def sync(self, sheet, revision=None):
+        with self._lock:
+            expired = time.monotonic() - self.last_full_sync > self.full_resync_seconds
+            if self.df is None or expired:
+                df = self._full_reload(sheet)
+            elif revision is not None and revision == self.revision:
+                self.skipped_syncs += 1
+                return self.df
+            else:
+                df = self._tail_sync(sheet)
+            self.revision = revision
+            return df
+
+    # (시트 쓰기와 반영을 같은 잠금 안에서 수행 - 그 사이에 tail 동기화가 끼어들어 같은 행을 두 번 읽지 않도록)
+    def append_through(self, write, rows):
+        with self._lock:
+            write(rows)
+            if self.df is not None and rows:
+                self._append(rows)
+                self.revision = None
+
+    def _replace(self, header, rows):
+        self.df = usage_log_from_values(header, rows)
+        self.version += 1
+        self.header = header
+        self.rows_ingested = len(rows)
+        self.last_row = _normalize(rows[-1], len(header)) if rows else None
+
+    def _append(self, rows):
+        rows = [pad_row(row, len(self.header)) for row in rows]
+        new_df = usage_log_from_values(self.header, rows)
+        self.df = concat_frames([self.df, new_df])
+        self.version += 1
+        self.rows_ingested += len(rows)
+        self.last_row = _normalize(rows[-1], len(self.header))
+        if self.listener:
+            self.listener("append", self.header, rows, new_df)
+
+    def _full_reload(self, sheet):
+        values = sheet.get_all_values()
+        header = [str(h) for h in values[0]] if values else list(USAGE_LOG_COLUMNS)
+        rows = [pad_row(row, len(header)) for row in values[1:]]
+        self._replace(header, rows)
+        self.last_full_sync = time.monotonic()
+        self.full_reloads += 1
+        if self.listener:
+            self.listener("full", header, rows, self.df)
+        return self.df
+
+    def _tail_sync(self, sheet):
+        width = len(self.header)
+        last_col = column_letter(width)
+        last_row_no = self.rows_ingested + 1   # (1행 = 헤더)
+        ranges = [
+            f"A1:{last_col}1",
+            f"A{last_row_no}:{last_col}{last_row_no}",
+            f"A{last_row_no + 1}:{last_col}",
+        ]
+        header_range, last_range, tail_range = sheet.batch_get(ranges)
+
+        header_now = pad_row(header_range[0], width) if header_range else []
+        if header_now != self.header:
+            return self._full_reload(sheet)
+        if self.rows_ingested > 0:
+            last_now = _normalize(last_range[0], width) if last_range else None
+            if last_now != self.last_row:
+                return self._full_reload(sheet)
+
+        self.tail_syncs += 1
+        if tail_range:
+            self._append(list(tail_range))
+        return self.df
@@ -0,0 +1,292 @@
+# --- 실험실 재고 관리기: 읽기 전용 재고 스냅샷 내보내기 / 로컬 HTTP 제공 ---
+# 발주 스크립트 / 장비 PC 가 시트를 직접 읽지 않도록, 앱이 계산한 재고 현황(현재 재고 / 재고 비율 / 알림 상태)과
+# 최근 사용 기록을 파일로 내보내고 로컬 HTTP 로 제공합니다. (앱과 같은 계산 결과 / 시트 할당량을 쓰지 않음)
+#
+# 파일 (--dir, 기본 .inventory_cache/export):
+#   manifest.json                  현재 버전 (version / sequence / 생성 시각 / 파일 이름) - 항상 마지막에 교체
+#   <sequence>-<version>/
+#     inventory.arrow              재고 현황 (Arrow IPC 파일, 비압축 - pyarrow.memory_map 으로 복사 없이 읽기)
+#     usage.arrow                  최근 사용 기록 (RECENT_USAGE_DAYS 일)
+#     snapshot.json                manifest 메타 + 두 표의 레코드 (JSON)
+# - 버전 디렉터리를 임시 이름으로 다 쓴 뒤 이름을 바꾸고, 그다음 manifest.json 을 교체합니다.
+#   (읽는 쪽은 manifest 가 가리키는 완성된 디렉터리만 봄 / 이전 버전도 KEEP_VERSIONS 개까지 남겨 읽는 중인 파일이 사라지지 않음)
+# - version 은 내용의 해시입니다. 내용이 같으면 새로 쓰지 않고, 앱을 다시 시작해도 같은 값 (= HTTP ETag)
+#
+# HTTP (앱: INVENTORY_EXPORT_PORT 를 지정하면 같은 프로세스에서 / 따로: python inventory_export.py --port 8765)
+#   GET /manifest.json  /inventory.arrow  /usage.arrow  /snapshot.json
+#   응답의 ETag 를 If-None-Match 로 보내면 바뀌지 않았을 때 304 (본문 없음)
+#
+#   import pyarrow as pa
+#   table = pa.ipc.open_file(pa.memory_map(".inventory_cache/export/<dir>/inventory.arrow")).read_all()
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from consumption import WEEKLY_RATE_COLUMN, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN
+from storage_backend import write_text_atomic
+
+EXPORT_DIR = os.path.join(".inventory_cache", "export")
+MANIFEST_FILE = "manifest.json"
+KEEP_VERSIONS = 3
+RECENT_USAGE_DAYS = 30
+DEFAULT_HOST = "127.0.0.1"
+
+# (내보낼 재고 현황 컬럼 - 계산 결과에 있는 것만, 이 순서로)
+INVENTORY_EXPORT_COLUMNS = [
+    "제품명", "제조사", "Cat. No.", "Lot 번호", "보관 위치", "단위", "유통기한", "최초 수량", "총 사용량", "현재 재고",
+    "재고 비율 (%)", "알림 기준 수량", "알림 상태", "알림 플래그", "알림 무시",
+    WEEKLY_RATE_COLUMN, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN,
+]
+USAGE_EXPORT_COLUMNS = ["Timestamp", "제품명", "Lot 번호", "사용량", "사용자", "비고"]
+
+# (HTTP 경로 -> (파일 이름, Content-Type))
+EXPORT_FILES = {
+    "/inventory.arrow": ("inventory.arrow", "application/vnd.apache.arrow.file"),
+    "/usage.arrow": ("usage.arrow", "application/vnd.apache.arrow.file"),
+    "/snapshot.json": ("snapshot.json", "application/json; charset=utf-8"),
+}
+
+
+# (1) 내보낼 표 만들기
+def inventory_table(df_inventory):
+    return df_inventory[[col for col in INVENTORY_EXPORT_COLUMNS if col in df_inventory.columns]].reset_index(drop=True)
+
+
+# (오늘 기준 최근 days 일 사용 기록 - 시각 순)
+def recent_usage(df_log, today, days=RECENT_USAGE_DAYS):
+    df = df_log[[col for col in USAGE_EXPORT_COLUMNS if col in df_log.columns]]
+    if df.empty:
+        return df.reset_index(drop=True)
+    since = pd.Timestamp(today) - pd.Timedelta(days=days)
+    df = df[(df['Timestamp'] >= since).to_numpy()]
+    return df.sort_values('Timestamp', kind='stable').reset_index(drop=True)
+
+
+# (내용 해시 - 같은 내용이면 같은 버전)
+def content_version(frames, meta):
+    digest = hashlib.sha1()
+    for df in frames:
+        digest.update(repr(list(df.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(meta, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# (2) 쓰기
+def read_manifest(directory=EXPORT_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_arrow(path, df):
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+# meta: 함께 기록할 값 (오늘 날짜 / 알림 기준 일수 등 - JSON 으로 바꿀 수 있는 값)
+# 반환: 새로 쓴 manifest / 현재 버전과 내용이 같으면 None
+def publish_snapshot(df_inventory, df_usage, meta=None, directory=EXPORT_DIR, now=None, keep_versions=KEEP_VERSIONS):
+    meta = dict(meta or {})
+    inventory, usage = inventory_table(df_inventory), df_usage.reset_index(drop=True)
+    version = content_version([inventory, usage], meta)
+    current = read_manifest(directory)
+    if current is not None and current.get("version") == version:
+        return None
+
+    sequence = (current or {}).get("sequence", 0) + 1
+    manifest = dict(
+        meta, version=version, sequence=sequence,
+        generated_at=(now or datetime.now()).isoformat(timespec="seconds"),
+        inventory_rows=len(inventory), usage_rows=len(usage), directory=f"{sequence:08d}-{version}",
+        files={path.lstrip("/"): name for path, (name, _) in EXPORT_FILES.items()},
+    )
+    os.makedirs(directory, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=directory, prefix=".tmp-")
+    try:
+        _write_arrow(os.path.join(tmp_dir, "inventory.arrow"), inventory)
+        _write_arrow(os.path.join(tmp_dir, "usage.arrow"), usage)
+        payload = dict(
+            manifest,
+            inventory=json.loads(inventory.to_json(orient="records", force_ascii=False, date_format="iso")),
+            usage=json.loads(usage.to_json(orient="records", force_ascii=False, date_format="iso")),
+        )
+        with open(os.path.join(tmp_dir, "snapshot.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_dir, os.path.join(directory, manifest["directory"]))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    write_text_atomic(os.path.join(directory, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=2))
+    _prune(directory, keep_versions)
+    return manifest
+
+
+# (오래된 버전 디렉터리 정리 - 이름이 sequence 로 시작하므로 이름순 = 생성순)
+def _prune(directory, keep_versions):
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isdir(os.path.join(directory, name))
+    )
+    for name in versions[:-keep_versions]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+# (3) 앱 쪽 내보내기 상태: 입력 버전(재고 원장 / 사용 기록 버전 등)이 그대로면 표를 만들지도 않음
+class SnapshotExporter:
+    def __init__(self, directory=EXPORT_DIR):
+        self.directory = directory
+        self.last_input_version = None
+        self.published = 0
+        self.server = None
+        self._lock = threading.Lock()
+
+    # build(): (df_inventory, df_usage, meta) / 반환: 새로 쓴 manifest 또는 None
+    def publish_if_changed(self, input_version, build):
+        with self._lock:
+            if input_version == self.last_input_version:
+                return None
+            df_inventory, df_usage, meta = build()
+            manifest = publish_snapshot(df_inventory, df_usage, meta, self.directory)
+            self.last_input_version = input_version
+            if manifest is not None:
+                self.published += 1
+            return manifest
+
+    def serve(self, port, host=DEFAULT_HOST):
+        if self.server is None:
+            self.server = SnapshotServer(self.directory, host, port)
+            self.server.start()
+        return self.server
+
+
+# (4) 로컬 HTTP (요청마다 manifest 를 읽어 현재 버전의 파일을 보냄 - 파일 본문은 sendfile 로 복사 없이 전송)
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+    server_version = "InventorySnapshot/1.0"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        path = self.path.split("?", 1)[0]
+        manifest = read_manifest(self.server.directory)
+        if path in ("/", "/" + MANIFEST_FILE):
+            if manifest is None:
+                return self._error(503, "아직 내보낸 스냅샷이 없습니다.")
+            body = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+            return self._send(manifest["version"], "application/json; charset=utf-8", len(body), send_body,
+                              lambda: self.wfile.write(body))
+        if path not in EXPORT_FILES:
+            return self._error(404, "없는 경로입니다.")
+        if manifest is None:
+            return self._error(503, "아직 내보낸 스냅샷이 없습니다.")
+        name, content_type = EXPORT_FILES[path]
+        try:
+            f = open(os.path.join(self.server.directory, manifest["directory"], name), "rb")
+        except OSError:
+            return self._error(503, "스냅샷을 교체하는 중입니다. 잠시 후 다시 요청하세요.")
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            self._send(manifest["version"], content_type, size, send_body, lambda: self._send_file(f))
+
+    def _send(self, version, content_type, length, send_body, write_body):
+        etag = f'"{version}"'
+        if etag in self._if_none_match() or "*" in self._if_none_match():
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if send_body:
+            write_body()
+
+    def _send_file(self, f):
+        self.wfile.flush()
+        try:
+            self.connection.sendfile(f)
+        except (AttributeError, OSError):
+            f.seek(0)
+            shutil.copyfileobj(f, self.wfile)
+
+    # (약한 비교: W/"..." 도 같은 태그로 봄)
+    def _if_none_match(self):
+        header = self.headers.get("If-None-Match", "")
+        return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+    def _error(self, code, message):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SnapshotServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, host=DEFAULT_HOST, port=0):
+        super().__init__((host, port), SnapshotRequestHandler)
+        self.directory = directory
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="inventory-snapshot-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="내보낸 재고 스냅샷을 로컬 HTTP 로 제공")
+    parser.add_argument("--dir", default=os.environ.get("INVENTORY_EXPORT_DIR", EXPORT_DIR))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("INVENTORY_EXPORT_PORT", "8765")))
+    args = parser.parse_args(argv)
+
+    server = SnapshotServer(args.dir, args.host, args.port)
+    print(f"serving {os.path.abspath(args.dir)} at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# --- 실험실 재고 관리기: 대시보드 계산 로직 ---
+# (탭 3 의 재고 현황 / 자동 알림 / 빠른 검색 계산 - Streamlit 비의존)
+import numpy as np
+import pandas as pd
+
+from consumption import (
+    consumption_rates, DEPLETION_ALERT_DAYS, DAILY_RATE_COLUMN, WEEKLY_RATE_COLUMN,
+    PRODUCT_WEEKLY_RATE_COLUMN, DAYS_TO_STOCKOUT_COLUMN, DAYS_TO_EXPIRY_COLUMN
+)
+
+EXPIRY_THRESHOLD_DAYS = 30
+
+# (알림 플래그 비트 - 한 Lot 이 여러 알림 표에 동시에 나올 수 있으므로 비트로 보관)
+ALERT_EXPIRING_SOON = 1
+ALERT_EXPIRED = 2
+ALERT_LOW_STOCK = 4
+ALERT_OUT_OF_STOCK = 8
+ALERT_DEPLETING = 16
+
+# (Lot 별 대표 상태 - 앞쪽일수록 우선)
+STATUS_MUTED = "알림 무시"
+STATUS_CATEGORIES = ["재고 소진", "유통기한 만료", "유통기한 임박", "재고 부족", "소진 예상 임박", "정상", STATUS_MUTED]
+
+
+# (1) 재고 현황 + 알림 상태를 한 번에 계산 (행 단위 apply 없이 컬럼 연산만 사용)
+# (consumption: ConsumptionTracker - 주면 사용 속도 / 소진 예상 컬럼과 '소진 예상 임박' 알림을 추가)
+def build_inventory(df_db, ledger, today, expiry_threshold_days=EXPIRY_THRESHOLD_DAYS, consumption=None):
+    df_inventory = df_db.copy()
+    df_inventory['총 사용량'] = ledger.usage_for(df_inventory['제품명'], df_inventory['Lot 번호'])
+
+    initial = df_inventory['최초 수량'].to_numpy(dtype='float64')
+    stock = initial - df_inventory['총 사용량'].to_numpy(dtype='float64')
+    ratio = np.divide(stock * 100, initial, out=np.zeros_like(stock), where=initial > 0)
+    df_inventory['현재 재고'] = stock
+    df_inventory['재고 비율 (%)'] = np.clip(ratio, 0, 100)
+
+    expiry = df_inventory['유통기한']
+    muted = (df_inventory['알림 무시'] == "예").to_numpy()
+    active = ~muted
+    in_stock = stock > 0
+
+    # (사용 속도: 최근 4주 평균으로 소진까지 남은 일수 예측 - 사용 기록이 없으면 빈 값)
+    days_to_stockout = np.full_like(stock, np.nan)
+    if consumption is not None:
+        lot_rates, product_rates = consumption_rates(consumption, today)
+        keys = pd.MultiIndex.from_arrays([df_inventory['제품명'].astype(str), df_inventory['Lot 번호'].astype(str)])
+        lot_view = lot_rates.reindex(keys)
+        weekly_rate = lot_view[WEEKLY_RATE_COLUMN].fillna(0).to_numpy(dtype='float64')
+        df_inventory[DAILY_RATE_COLUMN] = lot_view[DAILY_RATE_COLUMN].fillna(0).to_numpy(dtype='float64')
+        df_inventory[WEEKLY_RATE_COLUMN] = weekly_rate
+        df_inventory[PRODUCT_WEEKLY_RATE_COLUMN] = (
+            df_inventory['제품명'].astype(str).map(product_rates).fillna(0).to_numpy(dtype='float64')
+        )
+        days_to_stockout = np.divide(stock * 7, weekly_rate, out=days_to_stockout, where=(weekly_rate > 0) & in_stock)
+        days_to_stockout[~in_stock] = 0
+    df_inventory[DAYS_TO_STOCKOUT_COLUMN] = days_to_stockout
+    df_inventory[DAYS_TO_EXPIRY_COLUMN] = (expiry - today).dt.days.astype('float64')
+    expiring_soon = ((expiry >= today) & (expiry <= today + pd.DateOffset(days=expiry_threshold_days))).to_numpy() & in_stock & active
+    expired = (expiry < today).to_numpy() & in_stock & active
+    low_stock = (stock <= df_inventory['알림 기준 수량'].to_numpy(dtype='float64')) & in_stock & active
+    out_of_stock = (stock <= 0) & active
+    depleting = (days_to_stockout <= DEPLETION_ALERT_DAYS) & in_stock & active
+
+    df_inventory['알림 플래그'] = (
+        expiring_soon * ALERT_EXPIRING_SOON
+        | expired * ALERT_EXPIRED
+        | low_stock * ALERT_LOW_STOCK
+        | out_of_stock * ALERT_OUT_OF_STOCK
+        | depleting * ALERT_DEPLETING
+    ).astype('uint8')
+    df_inventory['알림 상태'] = pd.Categorical(
+        np.select(
+            [muted, out_of_stock, expired, expiring_soon, low_stock, depleting],
+            [STATUS_MUTED, "재고 소진", "유통기한 만료", "유통기한 임박", "재고 부족", "소진 예상 임박"],
+            default="정상"
+        ),
+        categories=STATUS_CATEGORIES
+    )
+    df_inventory['유통기한 (YYYY-MM-DD)'] = expiry.dt.strftime('%Y-%m-%d')
+    return df_inventory
+
+
+# (2) 자동 알림: 유통기한 임박 / 만료 / 재고 부족 / 재고 소진 / 소진 예상 임박 (알림 플래그로 고르기만 함)
+def compute_alerts(df_inventory):
+    flags = df_inventory['알림 플래그'].to_numpy()
+    return {
+        "expiring_soon": df_inventory[(flags & ALERT_EXPIRING_SOON) != 0],
+        "expired": df_inventory[(flags & ALERT_EXPIRED) != 0],
+        "low_stock": df_inventory[(flags & ALERT_LOW_STOCK) != 0],
+        "out_of_stock": df_inventory[(flags & ALERT_OUT_OF_STOCK) != 0],
+        "depleting": df_inventory[(flags & ALERT_DEPLETING) != 0].sort_values(DAYS_TO_STOCKOUT_COLUMN),
+    }
+
+
+# (3) 알림 해제 선택지 ("제품명 / Lot: Lot 번호")
+def mute_options(out_of_stock):
+    return (out_of_stock['제품명'].astype(str) + " / Lot: " + out_of_stock['Lot 번호'].astype(str)).tolist()
+
+
+# (4) 서버 쪽 정렬 / 페이지 나누기 (브라우저에는 보이는 페이지만 보냄)
+PAGE_SIZE_OPTIONS = [25, 50, 100, 200, 500]
+
+
+# (정렬된 행 위치 배열 - 빈 값은 맨 뒤, 같은 값은 원래 순서 유지 / category 는 카테고리 순서로 정렬)
+def sort_order(df, column, ascending=True):
+    values = df[column].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+
+# (정렬 순서를 유지하면서 보여줄 행(행 위치 배열 또는 bool 마스크)만 남김)
+def select_rows(order, rows, size):
+    if rows.dtype == bool:
+        keep = rows
+    else:
+        keep = np.zeros(size, dtype=bool)
+        keep[rows] = True
+    return order[keep[order]]
+
+
+# (반환: (이 페이지의 행 위치, 실제 페이지 번호, 전체 페이지 수) - 페이지 번호는 범위 안으로 맞춤)
+def paginate(positions, page, page_size):
+    page_count = max(1, -(-len(positions) // page_size))
+    page = min(max(int(page), 1), page_count)
+    start = (page - 1) * page_size
+    return positions[start:start + page_size], page, page_count
+
+
+# (5) 대시보드 한 번에 계산 (데이터 버전별로 캐시해서 모든 세션이 공유)
+def build_dashboard(df_db, ledger, today, expiry_threshold_days=EXPIRY_THRESHOLD_DAYS, consumption=None):
+    return dashboard_from_inventory(build_inventory(df_db, ledger, today, expiry_threshold_days, consumption))
+
+
+# (재고 현황 표에서 알림 표 / 해제 선택지를 만듦 - 알림 작업(alert_digest) 스냅샷을 읽을 때도 사용)
+def dashboard_from_inventory(df_inventory):
+    alerts = compute_alerts(df_inventory)
+    return {
+        "inventory": df_inventory,
+        "alerts": alerts,
+        "mute_options": mute_options(alerts["out_of_stock"]),
+    }
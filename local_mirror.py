@@ -0,0 +1,209 @@
+# --- 실험실 재고 관리기: 로컬 영구 미러 (SQLite) ---
+# Reagent_DB / Usage_Log 시트의 원본 행을 로컬 SQLite 파일에 보관합니다.
+# - 읽기: 앱은 미러에서 바로 읽습니다. (콜드 스타트에도 네트워크 왕복 없음)
+# - 쓰기: 앱이 시트에 쓴 행/셀을 같은 시점에 미러에도 반영합니다. (write-through)
+# - 원격 변경: MirrorReconciler 스레드가 주기적으로 시트를 당겨와 미러를 맞춥니다.
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from inventory_data import key_value
+
+MIRROR_PATH = os.path.join(".inventory_cache", "mirror.sqlite3")
+
+REAGENT_DB_KEY = "reagent_db"
+USAGE_LOG_KEY = "usage_log"
+USAGE_SNAPSHOT_KEY = "usage_snapshot"   # (Usage_Log 압축 스냅샷 탭)
+
+
+class LocalMirror:
+    def __init__(self, path=MIRROR_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._row_index_cache = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sheet_meta (
+                dataset   TEXT PRIMARY KEY,
+                header    TEXT NOT NULL,
+                version   INTEGER NOT NULL DEFAULT 0,
+                synced_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS sheet_rows (
+                dataset TEXT NOT NULL,
+                row_no  INTEGER NOT NULL,   -- 시트 행 번호 (헤더 = 1행)
+                data    TEXT NOT NULL,      -- JSON 배열 (A열부터 원본 문자열)
+                PRIMARY KEY (dataset, row_no)
+            );
+        """)
+        self._conn.commit()
+
+    # (1) 읽기: (header, rows) / 미러에 없으면 (None, [])
+    def read(self, dataset):
+        with self._lock:
+            meta = self._conn.execute(
+                "SELECT header FROM sheet_meta WHERE dataset = ?", (dataset,)
+            ).fetchone()
+            if meta is None:
+                return None, []
+            rows = [
+                json.loads(data) for (data,) in self._conn.execute(
+                    "SELECT data FROM sheet_rows WHERE dataset = ? ORDER BY row_no", (dataset,)
+                )
+            ]
+        return json.loads(meta[0]), rows
+
+    def has(self, dataset):
+        with self._lock:
+            return self._has_meta(dataset)
+
+    def version(self, dataset):
+        with self._lock:
+            meta = self._conn.execute(
+                "SELECT version FROM sheet_meta WHERE dataset = ?", (dataset,)
+            ).fetchone()
+        return meta[0] if meta else 0
+
+    # (키 컬럼 값 -> 시트 행 번호 목록. 데이터셋 version 이 바뀔 때만 다시 만듭니다.)
+    # 예: row_index(REAGENT_DB_KEY, ["제품명", "Lot 번호"])[("DMEM", "123")] -> [5, 17]
+    def row_index(self, dataset, key_columns):
+        cache_key = (dataset, tuple(key_columns))
+        version = self.version(dataset)
+        cached = self._row_index_cache.get(cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._lock:
+            meta = self._conn.execute(
+                "SELECT header FROM sheet_meta WHERE dataset = ?", (dataset,)
+            ).fetchone()
+            if meta is None:
+                return {}
+            header = json.loads(meta[0])
+            positions = [header.index(col) for col in key_columns]
+            index = defaultdict(list)
+            for row_no, data in self._conn.execute(
+                "SELECT row_no, data FROM sheet_rows WHERE dataset = ? ORDER BY row_no", (dataset,)
+            ):
+                row = json.loads(data)
+                key = tuple(key_value(row[p]) if p < len(row) else "" for p in positions)
+                index[key].append(row_no)
+        index = dict(index)
+        self._row_index_cache[cache_key] = (version, index)
+        return index
+
+    # (2) 전체 교체 (원격 전체 재동기화 결과). 내용이 같으면 version 을 올리지 않습니다.
+    def replace(self, dataset, header, rows):
+        header = [str(h) for h in header]
+        rows = [[str(v) for v in row] for row in rows]
+        current_header, current_rows = self.read(dataset)
+        if current_header == header and current_rows == rows:
+            self._touch(dataset)
+            return False
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sheet_rows WHERE dataset = ?", (dataset,))
+            self._conn.executemany(
+                "INSERT INTO sheet_rows (dataset, row_no, data) VALUES (?, ?, ?)",
+                [(dataset, i + 2, json.dumps(row, ensure_ascii=False)) for i, row in enumerate(rows)]
+            )
+            self._bump(dataset, header)
+        return True
+
+    # (3) 행 추가 (append_row / append_rows 와 같은 시점에 호출)
+    # 아직 한 번도 전체 동기화되지 않은 데이터셋은 건너뜁니다. (다음 읽기에서 전체를 가져옴)
+    def append(self, dataset, rows):
+        if not rows:
+            return
+        with self._lock, self._conn:
+            if not self._has_meta(dataset):
+                return
+            (last_row_no,) = self._conn.execute(
+                "SELECT COALESCE(MAX(row_no), 1) FROM sheet_rows WHERE dataset = ?", (dataset,)
+            ).fetchone()
+            self._conn.executemany(
+                "INSERT INTO sheet_rows (dataset, row_no, data) VALUES (?, ?, ?)",
+                [
+                    (dataset, last_row_no + 1 + i, json.dumps([str(v) for v in row], ensure_ascii=False))
+                    for i, row in enumerate(rows)
+                ]
+            )
+            self._bump(dataset)
+
+    # (4) 셀 수정 [(row_no, col_no, value), ...] (1부터 시작, update_cell 과 같은 좌표)
+    def update_cells(self, dataset, cells):
+        if not cells:
+            return
+        with self._lock, self._conn:
+            for row_no, col_no, value in cells:
+                found = self._conn.execute(
+                    "SELECT data FROM sheet_rows WHERE dataset = ? AND row_no = ?", (dataset, row_no)
+                ).fetchone()
+                if found is None:
+                    continue
+                row = json.loads(found[0])
+                row.extend([""] * (col_no - len(row)))
+                row[col_no - 1] = str(value)
+                self._conn.execute(
+                    "UPDATE sheet_rows SET data = ? WHERE dataset = ? AND row_no = ?",
+                    (json.dumps(row, ensure_ascii=False), dataset, row_no)
+                )
+            self._bump(dataset)
+
+    def _has_meta(self, dataset):
+        return self._conn.execute(
+            "SELECT 1 FROM sheet_meta WHERE dataset = ?", (dataset,)
+        ).fetchone() is not None
+
+    def _bump(self, dataset, header=None):
+        if header is not None:
+            self._conn.execute(
+                "INSERT INTO sheet_meta (dataset, header) VALUES (?, ?) "
+                "ON CONFLICT(dataset) DO UPDATE SET header = excluded.header",
+                (dataset, json.dumps(header, ensure_ascii=False))
+            )
+        self._conn.execute(
+            "UPDATE sheet_meta SET version = version + 1, synced_at = ? WHERE dataset = ?",
+            (time.time(), dataset)
+        )
+
+    def _touch(self, dataset):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sheet_meta SET synced_at = ? WHERE dataset = ?", (time.time(), dataset)
+            )
+
+
+# (5) 백그라운드 동기화 스레드
+# tasks: 주기마다 순서대로 실행할 함수 목록 (각 함수가 원격을 읽어 미러를 갱신)
+class MirrorReconciler(threading.Thread):
+    def __init__(self, tasks, interval_seconds=30):
+        super().__init__(name="inventory-mirror-reconciler", daemon=True)
+        self.tasks = list(tasks)
+        self.interval_seconds = interval_seconds
+        self.last_error = None
+        self.last_run = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            self.run_once()
+
+    def run_once(self):
+        last_error = None
+        for task in self.tasks:
+            try:
+                task()
+            except Exception as e:
+                last_error = e
+        self.last_error = last_error
+        self.last_run = time.time()
+
+    def stop(self):
+        self._stop_event.set()
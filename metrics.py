@@ -0,0 +1,261 @@
+# --- 실험실 재고 관리기: 성능 지표 (instrumentation) ---
+# 시트 API 호출 지연 / 분당 요청 수(할당량 대비) / 캐시 적중률 / 탭별 렌더 시간을 한 곳에 모읍니다.
+# - 히스토그램: 고정 구간(버킷)별 누적 개수 + 합계 + 최근 표본(백분위 계산용, 최근 RECENT_SAMPLES 개)
+# - 분당 요청 수: 읽기 / 쓰기 / Drive(변경 확인) 별로 최근 60초 안의 호출 시각만 보관
+# - 수집기(collector): 다른 객체가 이미 세고 있는 값(캐시 적중 수 등)을 내보내기 직전에 옮겨 담는 함수
+# - 내보내기: JSON / Prometheus 텍스트 형식 (export() 는 write_text_atomic 으로 씀)
+# - InstrumentedBackend: StorageBackend 를 감싸 워크시트 호출마다 시간을 재고 요청 수를 셉니다.
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from storage_backend import StorageBackend, WorksheetHandles, SHEETS_QUOTA_PER_MINUTE, WORKSHEET_REQUEST_KINDS, write_text_atomic
+
+METRICS_DIR = os.path.join(".inventory_cache", "metrics")
+METRICS_PREFIX = "inventory_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_SAMPLES = 500
+QUOTA_WINDOW_SECONDS = 60
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 마지막 칸 = +Inf
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    # (최근 표본 기준 백분위 - q: 0~1)
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+    # (Prometheus 형식: 상한(le) 이하 누적 개수)
+    def cumulative(self):
+        running, out = 0, []
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += count
+            out.append((bound, running))
+        return out
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}                 # (이름, 라벨) -> Histogram
+        self.counters = defaultdict(float)   # (이름, 라벨) -> 값
+        self.gauges = {}                     # (이름, 라벨) -> 값
+        self.requests = defaultdict(deque)   # 요청 종류 -> 최근 호출 시각
+        self.collectors = []
+        self.started_at = time.time()
+
+    # (1) 기록
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += value
+
+    # (수집기용: 다른 곳에서 세고 있는 누적 값을 그대로 옮김)
+    def set_counter(self, name, value, **labels):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] = float(value)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = float(value)
+
+    def record_request(self, kind, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            calls = self.requests[kind]
+            calls.append(now)
+            self._expire(calls, now)
+
+    def requests_last_minute(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for calls in self.requests.values():
+                self._expire(calls, now)
+            return {kind: len(calls) for kind, calls in self.requests.items()}
+
+    # collector(metrics): set_counter / set_gauge 로 값을 채우는 함수
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    # (2) 조회 / 내보내기
+    def snapshot(self):
+        for collector in self.collectors:
+            collector(self)
+        per_minute = self.requests_last_minute()
+        for kind, limit in SHEETS_QUOTA_PER_MINUTE.items():
+            self.set_gauge("sheets_requests_last_minute", per_minute.get(kind, 0), kind=kind)
+            self.set_gauge("sheets_quota_per_minute", limit, kind=kind)
+        with self._lock:
+            histograms = [
+                {
+                    "name": name, "labels": dict(labels), "count": h.count, "sum": h.total,
+                    "p50": h.percentile(0.5), "p95": h.percentile(0.95), "max": max(h.recent, default=None),
+                    "buckets": [[_format_bound(bound), count] for bound, count in h.cumulative()],
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())]
+            gauges = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.gauges.items())]
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "uptime_seconds": time.time() - self.started_at,
+            "histograms": histograms,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def to_json(self, snapshot=None):
+        return json.dumps(snapshot or self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        lines = []
+        for kind, series in (("counter", snapshot["counters"]), ("gauge", snapshot["gauges"])):
+            for name in sorted({s["name"] for s in series}):
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} {kind}")
+                for s in series:
+                    if s["name"] == name:
+                        lines.append(f"{METRICS_PREFIX}{name}{_format_labels(s['labels'])} {s['value']:g}")
+        for name in sorted({h["name"] for h in snapshot["histograms"]}):
+            lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+            for h in snapshot["histograms"]:
+                if h["name"] != name:
+                    continue
+                for bound, count in h["buckets"]:
+                    lines.append(f"{METRICS_PREFIX}{name}_bucket{_format_labels(dict(h['labels'], le=bound))} {count}")
+                lines.append(f"{METRICS_PREFIX}{name}_sum{_format_labels(h['labels'])} {h['sum']:g}")
+                lines.append(f"{METRICS_PREFIX}{name}_count{_format_labels(h['labels'])} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    # (metrics.json / metrics.prom 를 directory 에 씀 - 반환: {형식: 경로})
+    def export(self, directory=METRICS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        snapshot = self.snapshot()
+        return {
+            "json": write_text_atomic(os.path.join(directory, "metrics.json"), self.to_json(snapshot)),
+            "prometheus": write_text_atomic(os.path.join(directory, "metrics.prom"), self.to_prometheus(snapshot)),
+        }
+
+    @staticmethod
+    def _expire(calls, now):
+        while calls and calls[0] <= now - QUOTA_WINDOW_SECONDS:
+            calls.popleft()
+
+
+# (3) 시트 호출 계측
+# - worksheet() 로 처음 여는 탭은 "open" 으로 잽니다. (gspread: 스프레드시트 검색 + 메타데이터 조회)
+# - revision() 은 Drive API 호출이라 Sheets 할당량과 따로 "drive" 로 셉니다.
+# - 그 밖의 속성(calls, set_values 등)은 감싼 백엔드의 것을 그대로 씁니다.
+class InstrumentedBackend(StorageBackend):
+    def __init__(self, backend, metrics):
+        self.backend = backend
+        self.metrics = metrics
+        self.handles = WorksheetHandles()   # (스프레드시트 이름, 탭) -> InstrumentedWorksheet
+
+    def worksheet(self, spreadsheet_name, tab):
+        return self.handles.get(spreadsheet_name, tab, lambda: InstrumentedWorksheet(
+            self.call("open", "read", spreadsheet_name, self.backend.worksheet, spreadsheet_name, tab), self, spreadsheet_name
+        ))
+
+    def create_worksheet(self, spreadsheet_name, tab, rows=1000, cols=26):
+        inner = self.call("add_worksheet", "write", spreadsheet_name,
+                          self.backend.create_worksheet, spreadsheet_name, tab, rows, cols)
+        return self.handles.put(spreadsheet_name, tab, InstrumentedWorksheet(inner, self, spreadsheet_name))
+
+    def refresh_credentials(self):
+        refreshed = self.backend.refresh_credentials()
+        if refreshed:
+            self.metrics.inc("credential_refreshes_total")
+        return refreshed
+
+    def revision(self, spreadsheet_name):
+        return self.call("revision", "drive", spreadsheet_name, self.backend.revision, spreadsheet_name)
+
+    def forget(self, spreadsheet_name, tab=None):
+        self.handles.forget(spreadsheet_name, tab)
+        if hasattr(self.backend, "forget"):
+            self.backend.forget(spreadsheet_name, tab)
+
+    def call(self, method, kind, spreadsheet_name, fn, *args, **kwargs):
+        self.metrics.record_request(kind)
+        self.metrics.inc("sheets_requests_total", method=method, kind=kind)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            # (gspread APIError 는 HTTP 상태 코드(429 = 할당량 초과 등)를 code 로 가짐)
+            self.metrics.inc("sheets_errors_total", method=method, code=str(getattr(e, "code", None) or type(e).__name__))
+            raise
+        finally:
+            self.metrics.observe("sheets_request_seconds", time.perf_counter() - start,
+                                 method=method, spreadsheet=spreadsheet_name)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+class InstrumentedWorksheet:
+    def __init__(self, worksheet, backend, spreadsheet_name):
+        self._worksheet = worksheet
+        self._backend = backend
+        self._spreadsheet_name = spreadsheet_name
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        kind = WORKSHEET_REQUEST_KINDS.get(name)
+        if kind is None or not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            return self._backend.call(name, kind, self._spreadsheet_name, attr, *args, **kwargs)
+        return call
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
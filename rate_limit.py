@@ -0,0 +1,187 @@
+# --- 실험실 재고 관리기: Sheets API 요청 속도 제한 / 재시도 / 같은 읽기 합치기 ---
+# 이 프로세스의 모든 시트 호출은 ThrottledBackend 를 거칩니다.
+# - 토큰 버킷: 요청 종류(읽기 / 쓰기)별로 분당 할당량에 맞춰 토큰이 차고, 호출마다 1개씩 씁니다.
+#   (버킷 크기 + 1분 동안 채워지는 양 = 할당량 이므로 어느 1분 구간에서도 할당량을 넘지 않음)
+# - 재시도: 429 / 5xx 는 지터를 넣은 지수 백오프로 다시 시도합니다.
+#   (append / delete 처럼 두 번 실행되면 안 되는 호출은 이 층에서 다시 시도하지 않음
+#    - 사용 기록 append 는 저장 대기열(write_queue)이 기록별 시도 횟수를 세며 다시 시도)
+# - 같은 읽기 합치기: 같은 탭의 같은 읽기가 이미 진행 중이면 새로 요청하지 않고 그 결과를 함께 받습니다.
+#   (그 스프레드시트에 쓰기가 끝난 뒤 시작한 읽기는 쓰기 전에 시작한 읽기와 합치지 않음 - 자기 쓰기는 항상 보임)
+#   합친 결과는 여러 호출자가 같은 객체를 받으므로 읽기 전용으로만 사용합니다.
+import random
+import threading
+import time
+
+from storage_backend import StorageBackend, WorksheetHandles, SHEETS_QUOTA_PER_MINUTE, WORKSHEET_REQUEST_KINDS, is_transient_error
+
+BURST_FRACTION = 0.2
+MAX_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 32.0
+NON_IDEMPOTENT_METHODS = {"append_row", "append_rows", "delete_rows", "add_worksheet"}
+COALESCED_METHODS = {"get_all_values", "get_all_records", "batch_get", "revision"}
+
+
+# (1) 토큰 버킷 (예약 방식: 토큰이 모자라면 음수로 빌려 쓰고 그만큼 기다림 - 먼저 온 호출이 먼저 나감)
+class TokenBucket:
+    def __init__(self, per_minute, burst_fraction=BURST_FRACTION):
+        self.capacity = max(1.0, per_minute * burst_fraction)
+        self.rate = max(per_minute - self.capacity, 1.0) / 60.0   # 초당 채워지는 토큰
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # (반환: 기다린 시간(초))
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1.0
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# (2) 진행 중인 같은 읽기 합치기
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InFlightReads:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}         # (스프레드시트 이름, 쓰기 세대, 읽기 키) -> _InFlightCall
+        self._generations = {}   # 스프레드시트 이름 -> 끝난 쓰기 수
+        self.coalesced = 0
+
+    def run(self, spreadsheet_name, key, fn):
+        with self._lock:
+            full_key = (spreadsheet_name, self._generations.get(spreadsheet_name, 0), key)
+            call = self._calls.get(full_key)
+            leader = call is None
+            if leader:
+                call = self._calls[full_key] = _InFlightCall()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[full_key]
+            call.done.set()
+
+    # (쓰기가 끝나면(실패 포함) 세대를 올려, 이후의 읽기가 그 전에 시작한 읽기와 합쳐지지 않도록)
+    def wrote(self, spreadsheet_name):
+        with self._lock:
+            self._generations[spreadsheet_name] = self._generations.get(spreadsheet_name, 0) + 1
+
+
+# (3) 백엔드 감싸기
+# - worksheet() 로 처음 여는 탭(gspread: 검색 + 메타데이터)은 읽기 1회로 셉니다.
+# - revision() 은 Drive API 라 Sheets 할당량 버킷은 쓰지 않고 재시도 / 합치기만 합니다.
+class ThrottledBackend(StorageBackend):
+    def __init__(self, backend, quota_per_minute=SHEETS_QUOTA_PER_MINUTE, metrics=None,
+                 max_attempts=MAX_ATTEMPTS, base_backoff=BASE_BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS):
+        self.backend = backend
+        self.buckets = {kind: TokenBucket(limit) for kind, limit in quota_per_minute.items()}
+        self.metrics = metrics
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.in_flight = InFlightReads()
+        self.handles = WorksheetHandles()   # (스프레드시트 이름, 탭) -> ThrottledWorksheet
+        if metrics is not None:
+            metrics.add_collector(lambda m: m.set_counter("coalesced_reads_total", self.in_flight.coalesced))
+
+    # (여는 호출의 토큰 대기 / 재시도는 핸들 캐시 잠금 밖에서 - 다른 탭 조회를 막지 않음)
+    def worksheet(self, spreadsheet_name, tab):
+        return self.handles.get(spreadsheet_name, tab, lambda: ThrottledWorksheet(
+            self.call("open", "read", (spreadsheet_name, tab), self.backend.worksheet, spreadsheet_name, tab),
+            self, spreadsheet_name, tab
+        ))
+
+    def create_worksheet(self, spreadsheet_name, tab, rows=1000, cols=26):
+        inner = self.call("add_worksheet", "write", (spreadsheet_name, tab),
+                          self.backend.create_worksheet, spreadsheet_name, tab, rows, cols)
+        return self.handles.put(spreadsheet_name, tab, ThrottledWorksheet(inner, self, spreadsheet_name, tab))
+
+    def refresh_credentials(self):
+        return self.backend.refresh_credentials()
+
+    def revision(self, spreadsheet_name):
+        return self.call("revision", "drive", (spreadsheet_name, None), self.backend.revision, spreadsheet_name)
+
+    def forget(self, spreadsheet_name, tab=None):
+        self.handles.forget(spreadsheet_name, tab)
+        if hasattr(self.backend, "forget"):
+            self.backend.forget(spreadsheet_name, tab)
+
+    # target: (스프레드시트 이름, 탭)
+    def call(self, method, kind, target, fn, *args, **kwargs):
+        if method in COALESCED_METHODS:
+            key = (target[1], method, repr(args), repr(sorted(kwargs.items())))
+            return self.in_flight.run(target[0], key, lambda: self._call_with_retry(method, kind, fn, args, kwargs))
+        try:
+            return self._call_with_retry(method, kind, fn, args, kwargs)
+        finally:
+            if kind == "write":
+                self.in_flight.wrote(target[0])
+
+    def _call_with_retry(self, method, kind, fn, args, kwargs):
+        attempt = 1
+        while True:
+            bucket = self.buckets.get(kind)
+            if bucket is not None:
+                waited = bucket.acquire()
+                if waited and self.metrics is not None:
+                    self.metrics.observe("rate_limit_wait_seconds", waited, kind=kind)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not self._retryable(method, e):
+                    raise
+                if self.metrics is not None:
+                    self.metrics.inc("sheets_retries_total", method=method, code=e.code)
+                # (지터: 백오프의 절반 ~ 전체 사이에서 무작위 - 동시에 실패한 호출들이 같은 순간에 다시 몰리지 않도록)
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+                time.sleep(random.uniform(backoff / 2, backoff))
+                attempt += 1
+
+    @staticmethod
+    def _retryable(method, error):
+        if not is_transient_error(error):
+            return False
+        return method not in NON_IDEMPOTENT_METHODS
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+class ThrottledWorksheet:
+    def __init__(self, worksheet, backend, spreadsheet_name, tab):
+        self._worksheet = worksheet
+        self._backend = backend
+        self._target = (spreadsheet_name, tab)
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        kind = WORKSHEET_REQUEST_KINDS.get(name)
+        if kind is None or not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            return self._backend.call(name, kind, self._target, attr, *args, **kwargs)
+        return call
@@ -0,0 +1,77 @@
+# --- 실험실 재고 관리기: 빠른 검색 색인 ---
+# 제품명 / 제조사 / Cat. No. / Lot 번호 를 정규화(소문자, 공백·하이픈 등 제거)한 뒤
+# 2-gram / 3-gram 역색인을 만들어 둡니다. (Reagent_DB 버전마다 한 번 만들고 모든 세션이 공유)
+# - 검색: 질의의 n-gram 목록을 교집합해 후보를 좁힌 뒤, 후보만 부분 문자열로 확인합니다.
+# - 오타 허용: 정확히 일치하는 행이 없으면 공유하는 3-gram 비율로 비슷한 행을 순위대로 돌려줍니다.
+# 결과는 색인을 만든 DataFrame 의 행 위치(0부터) 배열입니다.
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+SEARCH_COLUMNS = ["제품명", "제조사", "Cat. No.", "Lot 번호"]
+FUZZY_MIN_SCORE = 0.5
+FUZZY_LIMIT = 50
+
+_IGNORED = re.compile(r"[\s\-_./]+")
+
+
+def normalize(text):
+    return _IGNORED.sub("", unicodedata.normalize("NFKC", str(text)).lower())
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    def __init__(self, df, columns=SEARCH_COLUMNS):
+        # (필드 사이에 구분 문자를 넣어 필드를 넘나드는 n-gram 은 만들지 않음)
+        self.docs = [
+            "\x00".join(normalize(value) for value in values)
+            for values in zip(*(df[col].tolist() for col in columns))
+        ]
+        self.size = len(self.docs)
+        postings = defaultdict(list)
+        for row_id, doc in enumerate(self.docs):
+            for n in (2, 3):
+                for gram in _grams(doc, n):
+                    if "\x00" not in gram:
+                        postings[gram].append(row_id)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    # (반환: (행 위치 배열, 오타 허용 결과 여부))
+    def search(self, query, fuzzy=True):
+        q = normalize(query)
+        if not q:
+            return np.arange(self.size, dtype=np.int32), False
+        if len(q) == 1:
+            return np.asarray([i for i, doc in enumerate(self.docs) if q in doc], dtype=np.int32), False
+
+        n = 3 if len(q) >= 3 else 2
+        query_grams = _grams(q, n)
+        lists = [self.postings.get(gram) for gram in query_grams]
+        if all(ids is not None for ids in lists):
+            lists.sort(key=len)
+            candidates = lists[0]
+            for ids in lists[1:]:
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+                if not len(candidates):
+                    break
+            exact = np.asarray([i for i in candidates if q in self.docs[i]], dtype=np.int32)
+            if len(exact):
+                return exact, False
+
+        if not fuzzy or n < 3:
+            return np.empty(0, dtype=np.int32), False
+        return self._fuzzy(query_grams), True
+
+    def _fuzzy(self, query_grams):
+        found = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        scores = np.bincount(np.concatenate(found), minlength=self.size) / len(query_grams)
+        candidates = np.flatnonzero(scores >= FUZZY_MIN_SCORE)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return ranked[:FUZZY_LIMIT].astype(np.int32)
@@ -0,0 +1,226 @@
+# --- 실험실 재고 관리기: 스프레드시트 분할(샤드) ---
+# Reagent_DB / Usage_Log 를 여러 스프레드시트(또는 탭)로 나눠 두고 (연구실별 / 연도별 등) 하나의 재고로 합쳐 봅니다.
+# 설정: INVENTORY_SHARDS 환경 변수에 JSON 문자열 또는 JSON 파일 경로
+#   {
+#     "reagent_db": [{"name": "labA", "spreadsheet": "Reagent_DB", "tab": "Master"},
+#                    {"name": "labB", "spreadsheet": "Reagent_DB_labB", "tab": "Master"}],
+#     "usage_log":  [{"name": "2025", "spreadsheet": "Usage_Log", "tab": "Log2025", "read_only": true},
+#                    {"name": "labA", "spreadsheet": "Usage_Log", "tab": "Log"},
+#                    {"name": "labB", "spreadsheet": "Usage_Log_labB", "tab": "Log"}]
+#   }
+# - 설정이 없으면(또는 한쪽 목록이 비어 있으면) 지금처럼 Reagent_DB/Master, Usage_Log/Log 한 개씩입니다.
+# - 읽기: 모든 샤드를 스레드 풀로 동시에 읽습니다. (전체 시간 = 가장 느린 샤드 / 호출은 모두 같은 속도 제한기를 거침)
+#         Reagent_DB 와 Usage_Log 두 데이터셋도 run_concurrently 로 동시에 읽습니다.
+# - 합치기: Reagent_DB 는 원본 행을 컬럼별로 이어 붙인 뒤 한 번에 변환 (같은 (제품명, Cat. No., Lot) 은 샤드가 달라도 한 Lot)
+#           Usage_Log 는 샤드별 증분 동기화 결과를 이어 붙임
+# - 쓰기 라우팅:
+#   신규 품목   등록 폼에서 고른 Reagent_DB 샤드 (쓰기 가능한 샤드가 하나면 그 샤드)
+#   알림 해제   그 (제품명, Lot 번호) 행이 있는 Reagent_DB 샤드
+#   사용 기록   그 Lot 이 있는 Reagent_DB 샤드와 이름이 같은 Usage_Log 샤드
+#               -> 없으면 마지막 쓰기 가능 Usage_Log 샤드 (연도별로 나눴다면 올해 탭을 맨 뒤에)
+# - 로컬 미러 키: 이름이 "main" 인 샤드는 기존 키(reagent_db / usage_log) 그대로, 나머지는 "키:이름"
+# - Usage_Log 압축(usage_compaction.py)은 기본 위치(Usage_Log/Log) 샤드에만 적용됩니다. (스냅샷도 그 샤드 몫)
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from inventory_data import UsageLogSync, concat_frames, key_value, reagent_db_from_values, USAGE_LOG_EMPTY_COLUMNS
+from local_mirror import REAGENT_DB_KEY, USAGE_LOG_KEY
+from usage_compaction import USAGE_LOG_NAME, USAGE_LOG_TAB
+
+REAGENT_DB_NAME, REAGENT_DB_TAB = "Reagent_DB", "Master"
+SHARDS_ENV = "INVENTORY_SHARDS"
+DEFAULT_SHARD = "main"
+MAX_FETCH_WORKERS = 8
+
+
+class ShardConfigError(ValueError):
+    pass
+
+
+# (1) 샤드 / 설정
+class Shard:
+    def __init__(self, dataset, name, spreadsheet, tab, read_only=False):
+        self.dataset = dataset           # REAGENT_DB_KEY / USAGE_LOG_KEY
+        self.name = name
+        self.spreadsheet = spreadsheet
+        self.tab = tab
+        self.read_only = read_only
+        self.key = dataset if name == DEFAULT_SHARD else f"{dataset}:{name}"
+        # (압축 스냅샷이 적용되는 샤드)
+        self.compacted = dataset == USAGE_LOG_KEY and (spreadsheet, tab) == (USAGE_LOG_NAME, USAGE_LOG_TAB)
+
+    def __repr__(self):
+        return f"Shard({self.dataset}:{self.name} -> {self.spreadsheet}/{self.tab})"
+
+
+class ShardConfig:
+    def __init__(self, reagent_db=None, usage_log=None):
+        self.reagent_db = reagent_db or [Shard(REAGENT_DB_KEY, DEFAULT_SHARD, REAGENT_DB_NAME, REAGENT_DB_TAB)]
+        self.usage_log = usage_log or [Shard(USAGE_LOG_KEY, DEFAULT_SHARD, USAGE_LOG_NAME, USAGE_LOG_TAB)]
+        for shards in (self.reagent_db, self.usage_log):
+            names = [shard.name for shard in shards]
+            if len(set(names)) != len(names):
+                raise ShardConfigError(f"샤드 이름이 중복되었습니다: {names}")
+            if all(shard.read_only for shard in shards):
+                raise ShardConfigError(f"쓰기 가능한 샤드가 하나는 있어야 합니다: {names}")
+
+    @classmethod
+    def from_dict(cls, data):
+        def shards(dataset, entries):
+            try:
+                return [
+                    Shard(dataset, str(e["name"]), str(e["spreadsheet"]), str(e["tab"]), bool(e.get("read_only", False)))
+                    for e in entries or []
+                ]
+            except (KeyError, TypeError) as e:
+                raise ShardConfigError(f"샤드 설정에는 name / spreadsheet / tab 이 필요합니다: {e}")
+        return cls(shards(REAGENT_DB_KEY, data.get("reagent_db")), shards(USAGE_LOG_KEY, data.get("usage_log")))
+
+    # (INVENTORY_SHARDS: JSON 문자열 또는 JSON 파일 경로 / 없으면 기본 설정)
+    @classmethod
+    def load(cls, environ=os.environ):
+        value = environ.get(SHARDS_ENV, "").strip()
+        if not value:
+            return cls()
+        try:
+            if not value.startswith("{"):
+                with open(value, encoding="utf-8") as f:
+                    value = f.read()
+            data = json.loads(value)
+        except (OSError, ValueError) as e:
+            raise ShardConfigError(f"{SHARDS_ENV} 를 읽을 수 없습니다: {e}")
+        return cls.from_dict(data)
+
+    @property
+    def sharded(self):
+        return len(self.reagent_db) > 1 or len(self.usage_log) > 1
+
+    def writable(self, shards):
+        return [shard for shard in shards if not shard.read_only]
+
+    def reagent_shard(self, name):
+        return next(shard for shard in self.reagent_db if shard.name == name)
+
+    # (사용 기록을 쓸 Usage_Log 샤드 - reagent_shard_name: 그 Lot 이 있는 Reagent_DB 샤드 이름 / 모르면 None)
+    def usage_shard_for(self, reagent_shard_name):
+        writable = self.writable(self.usage_log)
+        for shard in writable:
+            if shard.name == reagent_shard_name:
+                return shard
+        return writable[-1]
+
+    # (그 (제품명, Lot 번호) 행이 있는 Reagent_DB 샤드 / 없으면 None - 미러의 행 번호 색인으로 찾음)
+    def locate(self, mirror, product, lot):
+        key = (key_value(product), key_value(lot))
+        for shard in self.reagent_db:
+            if key in mirror.row_index(shard.key, ["제품명", "Lot 번호"]):
+                return shard
+        return None
+
+    def usage_route(self, mirror, product, lot):
+        if len(self.writable(self.usage_log)) == 1:
+            return self.writable(self.usage_log)[0]
+        located = self.locate(mirror, product, lot)
+        return self.usage_shard_for(located.name if located else None)
+
+    # (Reagent_DB 샤드별 미러 버전 - 어느 한 샤드만 바뀌어도 달라짐)
+    def reagent_db_version(self, mirror):
+        return tuple(mirror.version(shard.key) for shard in self.reagent_db)
+
+
+# (2) 병렬 실행: tasks = {이름: 인자 없는 함수} 를 동시에 실행 / 반환: {이름: 결과}
+# (하나가 실패해도 나머지는 끝까지 실행하고 - 미러 반영 등은 그대로 남음 - 첫 오류를 다시 던짐)
+def run_concurrently(tasks, max_workers=MAX_FETCH_WORKERS):
+    if len(tasks) <= 1:
+        return {name: task() for name, task in tasks.items()}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)), thread_name_prefix="inventory-shard") as pool:
+        futures = [(name, pool.submit(task)) for name, task in tasks.items()]
+    results, first_error = {}, None
+    for name, future in futures:
+        error = future.exception()
+        if error is None:
+            results[name] = future.result()
+        elif first_error is None:
+            first_error = error
+    if first_error is not None:
+        raise first_error
+    return results
+
+
+# (샤드 읽기: fetch(shard) 를 샤드마다 동시에 실행 / 반환: {샤드 이름: 결과})
+def fetch_shards(shards, fetch, max_workers=MAX_FETCH_WORKERS):
+    return run_concurrently({shard.name: (lambda shard=shard: fetch(shard)) for shard in shards}, max_workers)
+
+
+# (3) Reagent_DB 합치기: parts = [(header, rows), ...] (샤드 순서 / 헤더 순서가 샤드마다 달라도 됨)
+def merge_reagent_db(parts):
+    return reagent_db_from_values(parts)
+
+
+# (4) Usage_Log 샤드별 증분 동기화
+# - 샤드마다 UsageLogSync 를 하나씩 두고 (각자의 잠금 / tail / revision), 동기화는 동시에 합니다.
+# - listener(shard, event, header, rows, frame): UsageLogSync 의 listener 에 샤드를 붙여서 호출
+class ShardedUsageLog:
+    def __init__(self, shards, full_resync_seconds=600, listener=None):
+        self.shards = list(shards)
+        self.syncs = {
+            shard.name: UsageLogSync(full_resync_seconds, listener=self._listener_for(shard, listener))
+            for shard in self.shards
+        }
+
+    @staticmethod
+    def _listener_for(shard, listener):
+        if listener is None:
+            return None
+        return lambda event, header, rows, frame: listener(shard, event, header, rows, frame)
+
+    @property
+    def loaded(self):
+        return all(sync.loaded for sync in self.syncs.values())
+
+    @property
+    def version(self):
+        return tuple(sync.version for sync in self.syncs.values())
+
+    # (샤드 이름 -> 지금 데이터가 맞는 revision)
+    @property
+    def revisions(self):
+        return {name: sync.revision for name, sync in self.syncs.items()}
+
+    @property
+    def full_reloads(self):
+        return sum(sync.full_reloads for sync in self.syncs.values())
+
+    @property
+    def tail_syncs(self):
+        return sum(sync.tail_syncs for sync in self.syncs.values())
+
+    @property
+    def skipped_syncs(self):
+        return sum(sync.skipped_syncs for sync in self.syncs.values())
+
+    # (probe: 샤드마다 스프레드시트 revision 을 먼저 확인 / missing_only: 아직 한 번도 읽지 않은 샤드만)
+    def sync(self, backend, probe=True, missing_only=False):
+        shards = [shard for shard in self.shards if not (missing_only and self.syncs[shard.name].loaded)]
+        def sync_shard(shard):
+            revision = backend.revision(shard.spreadsheet) if probe else None
+            return self.syncs[shard.name].sync(backend.worksheet(shard.spreadsheet, shard.tab), revision)
+        fetch_shards(shards, sync_shard)
+
+    def append_through(self, shard_name, write, rows):
+        self.syncs[shard_name].append_through(write, rows)
+
+    # (샤드 순서대로 이어 붙인 DataFrame - snapshot 을 주면 압축 대상 샤드는 스냅샷 이후 기록만)
+    def merged(self, snapshot=None):
+        frames = []
+        for shard in self.shards:
+            df = self.syncs[shard.name].df
+            if df is None:
+                continue
+            frames.append(snapshot.tail(df) if snapshot is not None and shard.compacted else df)
+        if not frames:
+            return pd.DataFrame(columns=USAGE_LOG_EMPTY_COLUMNS)
+        return concat_frames(frames)
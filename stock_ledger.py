@@ -0,0 +1,147 @@
+# --- 실험실 재고 관리기: Lot 별 재고 원장 (materialized ledger) ---
+# (제품명, Cat. No., Lot 번호) 별 입고량 / 총 사용량 / 현재 재고를 메모리에 유지합니다.
+# - 전체 재구성은 데이터를 처음 읽을 때(또는 시트가 통째로 바뀌었을 때) 한 번만 합니다.
+# - 사용 기록 1건 / 신규 Lot 1건이 추가되면 dict 갱신만 하므로 O(1) 입니다.
+# - Usage_Log 에는 Cat. No. 가 없으므로 사용량은 (제품명, Lot 번호) 단위로 모읍니다. (v49 merge 와 동일)
+# - pending: 저장 대기열(write_queue)에 있어 아직 시트에 쓰이지 않은 사용량 (낙관적 반영)
+#   (대기열이 시트에 쓴 행은 settle_pending 으로 대기 사용량에서 빼고 실제 사용량에 더하는 일을 한 잠금 안에서 - 두 번 세지 않음)
+# - lot_lock: 같은 Lot 의 '재고 확인 -> 사용 기록 접수' 를 한 번에 하나씩 하기 위한 Lot 별 잠금
+# - source: Usage_Log 가 여러 샤드로 나뉘어 있으면 샤드 이름 (샤드마다 따로 동기화되므로 사용량도 샤드별로 보관하고,
+#   한 샤드를 다시 만들 때는 그 샤드 몫만 교체 - 다른 샤드의 증분 반영과 섞이지 않음)
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+class StockLedger:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.received = {}   # (제품명, Cat. No., Lot 번호) -> 입고 수량 합계
+        self.usage = {}      # (제품명, Lot 번호) -> 총 사용량 (모든 source 합계)
+        self.usage_by_source = {}  # source -> {(제품명, Lot 번호): 사용량}
+        self.pending = {}    # (제품명, Lot 번호) -> 저장 대기 중인 사용량
+        self._lot_locks = {} # (제품명, Lot 번호) -> threading.Lock
+        self._local = threading.local()
+        self.version = 0     # 값이 바뀔 때마다 1씩 증가 (대시보드 캐시 키)
+
+    # (1) 전체 재구성
+    def rebuild_received(self, df_db):
+        received = {}
+        if not df_db.empty:
+            grouped = df_db.groupby(['제품명', 'Cat. No.', 'Lot 번호'], observed=True)['최초 수량'].sum()
+            received = {key: float(qty) for key, qty in grouped.items()}
+        with self._lock:
+            self.received = received
+            self.version += 1
+
+    # (base: Usage_Log 압축 스냅샷의 누적 사용량 - df_log 는 그 이후(tail) 기록만)
+    def rebuild_usage(self, df_log, base=None, source=None):
+        usage = dict(base or {})
+        if not df_log.empty:
+            grouped = df_log.groupby(['제품명', 'Lot 번호'], observed=True)['사용량'].sum()
+            for key, qty in grouped.items():
+                usage[key] = usage.get(key, 0.0) + float(qty)
+        with self._lock:
+            self.usage_by_source[source] = usage
+            if len(self.usage_by_source) == 1:
+                self.usage = dict(usage)
+            else:
+                total = {}
+                for source_usage in self.usage_by_source.values():
+                    for key, qty in source_usage.items():
+                        total[key] = total.get(key, 0.0) + qty
+                self.usage = total
+            self.version += 1
+
+    # (2) O(1) 증분 반영
+    def apply_usage(self, product, lot, qty, source=None):
+        key = (str(product), str(lot))
+        with self._lock:
+            source_usage = self.usage_by_source.setdefault(source, {})
+            source_usage[key] = source_usage.get(key, 0.0) + float(qty)
+            self.usage[key] = self.usage.get(key, 0.0) + float(qty)
+            self.version += 1
+
+    def apply_usage_frame(self, df_new, source=None):
+        for product, lot, qty in zip(df_new['제품명'], df_new['Lot 번호'], df_new['사용량']):
+            self.apply_usage(product, lot, qty, source)
+
+    def add_pending(self, product, lot, qty):
+        key = (str(product), str(lot))
+        with self._lock:
+            self.pending[key] = self.pending.get(key, 0.0) + float(qty)
+            self.version += 1
+
+    def remove_pending(self, product, lot, qty):
+        key = (str(product), str(lot))
+        with self._lock:
+            remaining = self.pending.get(key, 0.0) - float(qty)
+            if remaining > 1e-9:
+                self.pending[key] = remaining
+            else:
+                self.pending.pop(key, None)
+            self.version += 1
+
+    # (저장 대기열이 rows 를 쓰는 동안: 이 스레드에서 반영되는 사용 기록은 대기 사용량이 저장된 것)
+    # (쓰기는 성공했는데 반영되지 않았으면(동기화 전) 대기 사용량만 뺌 - 다음 동기화 때 실제 사용량으로 읽힘)
+    @contextmanager
+    def settling(self, rows):
+        self._local.settling, self._local.settled = True, False
+        try:
+            yield
+            if not self._local.settled:
+                with self._lock:
+                    for row in rows:
+                        self.remove_pending(row[1], row[2], float(row[3]))
+        finally:
+            self._local.settling = False
+
+    @property
+    def settling_here(self):
+        return getattr(self._local, "settling", False)
+
+    # (rows: 대기열이 쓴 원본 행 [Timestamp, 제품명, Lot 번호, 사용량, ...] / df_new: 재고에 반영할 파싱된 행)
+    def settle_pending(self, rows, df_new, source=None):
+        with self._lock:
+            for row in rows:
+                self.remove_pending(row[1], row[2], float(row[3]))
+            self.apply_usage_frame(df_new, source)
+        self._local.settled = True
+
+    def apply_new_lot(self, product, cat_no, lot, qty):
+        key = (str(product), str(cat_no), str(lot))
+        with self._lock:
+            self.received[key] = self.received.get(key, 0.0) + float(qty)
+            self.version += 1
+
+    def lot_lock(self, product, lot):
+        key = (str(product), str(lot))
+        with self._lock:
+            lock = self._lot_locks.get(key)
+            if lock is None:
+                lock = self._lot_locks[key] = threading.Lock()
+        return lock
+
+    # (3) 조회
+    def total_usage(self, product, lot):
+        key = (str(product), str(lot))
+        return self.usage.get(key, 0.0) + self.pending.get(key, 0.0)
+
+    def stock(self, product, cat_no, lot):
+        received = self.received.get((str(product), str(cat_no), str(lot)), 0.0)
+        return received - self.total_usage(product, lot)
+
+    # (df_db 의 각 행에 대한 총 사용량 - 로그 길이와 무관하게 Lot 수에만 비례)
+    def usage_for(self, products, lots):
+        usage, pending = self.usage, self.pending
+        return pd.Series(
+            [usage.get((p, l), 0.0) + pending.get((p, l), 0.0) for p, l in zip(products, lots)],
+            index=getattr(products, 'index', None),
+            dtype='float64'
+        )
+
+    # (입고 / 사용 / 대기 중 사용량 dict 의 복사본)
+    def snapshot(self):
+        with self._lock:
+            return dict(self.received), dict(self.usage), dict(self.pending)
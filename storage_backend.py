@@ -0,0 +1,397 @@
+# --- 실험실 재고 관리기: 저장소 백엔드 ---
+# 앱이 쓰는 시트 호출(전체 읽기 / 범위 읽기 / append / batch update / 셀 수정)만 모은 인터페이스입니다.
+# - GspreadBackend: 실제 Google Sheets (gspread)
+# - LocalBackend: 메모리(+선택적으로 CSV 파일) 기반 대역. 호출 지연 / 429·5xx 오류를 흉내 낼 수 있어
+#   인증 없이 개발/성능 측정(benchmarks/)에 사용합니다.
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+import requests
+from google.auth.transport.requests import Request as GoogleAuthRequest
+from gspread.exceptions import APIError
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from gspread.utils import a1_range_to_grid_range, numericise_all
+
+# (Sheets API 기본 할당량: 사용자(서비스 계정)당 분당 읽기 60 / 쓰기 60 요청)
+SHEETS_QUOTA_PER_MINUTE = {"read": 60, "write": 60}
+
+# (워크시트 메서드 -> 요청 종류 - 할당량 / 계측 구분)
+WORKSHEET_REQUEST_KINDS = {
+    "get_all_values": "read",
+    "get_all_records": "read",
+    "batch_get": "read",
+    "append_row": "write",
+    "append_rows": "write",
+    "update_cell": "write",
+    "batch_update": "write",
+    "delete_rows": "write",
+}
+
+
+# (잠시 후 다시 시도하면 될 오류: 429 할당량 초과 / 5xx 서버 오류)
+def is_transient_error(error):
+    code = getattr(error, "code", None)
+    return isinstance(error, APIError) and isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+
+# (텍스트 파일 쓰기: 같은 디렉터리의 임시 파일에 쓰고 교체 - 읽는 쪽은 항상 완성된 파일만 봄 / 반환: 경로)
+def write_text_atomic(path, text, encoding="utf-8"):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+# (1) 인터페이스
+# worksheet(spreadsheet_name, tab) 이 돌려주는 객체는 아래 메서드를 지원해야 합니다.
+#   get_all_values() / get_all_records() / batch_get(ranges)
+#   append_row(values) / append_rows(rows) / update_cell(row, col, value) / batch_update(data)
+#   delete_rows(start_index, end_index)
+# revision(spreadsheet_name) 은 스프레드시트 내용이 바뀔 때마다 달라지는 값입니다. (모르면 None -> 항상 다시 읽음)
+class StorageBackend(ABC):
+    @abstractmethod
+    def worksheet(self, spreadsheet_name, tab):
+        pass
+
+    # (탭이 없을 때 새로 만듦 - Usage_Log 압축의 Snapshot / Archive 탭)
+    @abstractmethod
+    def create_worksheet(self, spreadsheet_name, tab, rows=1000, cols=26):
+        pass
+
+    # (인증 토큰을 만료 전에 미리 갱신. 갱신했으면 True)
+    def refresh_credentials(self):
+        return False
+
+    # (변경 확인용 값 - 같으면 마지막으로 읽은 뒤 바뀐 것이 없음)
+    def revision(self, spreadsheet_name):
+        return None
+
+
+# (워크시트 핸들 캐시: (스프레드시트 이름, 탭) -> 핸들 - GspreadBackend / InstrumentedBackend / ThrottledBackend 가 같이 씀)
+# 여는 호출(네트워크 / 재시도 대기)은 잠금 밖에서 하고, 잠금은 결과를 넣거나 지울 때만 잡습니다.
+# (한 탭을 여는 동안 다른 탭 조회가 막히지 않음. 같은 탭을 동시에 처음 열면 먼저 넣은 핸들 하나만 씀)
+class WorksheetHandles:
+    def __init__(self):
+        self._handles = {}
+        self._lock = threading.Lock()
+
+    def get(self, spreadsheet_name, tab, open_handle):
+        handle = self._handles.get((spreadsheet_name, tab))
+        if handle is None:
+            handle = open_handle()
+            with self._lock:
+                handle = self._handles.setdefault((spreadsheet_name, tab), handle)
+        return handle
+
+    def put(self, spreadsheet_name, tab, handle):
+        with self._lock:
+            self._handles[(spreadsheet_name, tab)] = handle
+        return handle
+
+    # (탭 이름 변경/삭제 등으로 핸들이 더 이상 맞지 않을 때 다시 찾도록 - tab=None 이면 스프레드시트 전체)
+    def forget(self, spreadsheet_name, tab=None):
+        with self._lock:
+            for key in [k for k in self._handles if k[0] == spreadsheet_name and tab in (None, k[1])]:
+                del self._handles[key]
+
+
+# (2) Google Sheets
+# - 스프레드시트 이름 -> key, 탭 이름 -> Worksheet 객체를 처음 한 번만 찾고(open 은 Drive 검색 + 메타데이터
+#   조회가 필요), 이후에는 같은 Worksheet 객체를 재사용합니다. 모든 호출은 클라이언트의 같은
+#   AuthorizedSession(keep-alive) 을 쓰므로, 쓰기 1건 = API 호출 1회 입니다.
+# - 인증 토큰은 refresh_margin_seconds 안에 만료될 때 refresh_credentials() 로 미리 갱신합니다.
+#   (클라이언트를 새로 만들지 않음 - 백그라운드 동기화 스레드가 주기적으로 호출)
+# - revision(): Drive 파일 메타데이터의 version (셀 값을 읽지 않는 가벼운 호출 1회, Sheets 읽기 할당량과 별개)
+class GspreadBackend(StorageBackend):
+    def __init__(self, client, refresh_margin_seconds=300):
+        self.client = client
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.spreadsheet_keys = {}   # 스프레드시트 이름 -> key
+        self._spreadsheets = {}
+        self.handles = WorksheetHandles()
+        self._lock = threading.Lock()
+
+    def worksheet(self, spreadsheet_name, tab):
+        return self.handles.get(spreadsheet_name, tab, lambda: self._spreadsheet(spreadsheet_name).worksheet(tab))
+
+    def create_worksheet(self, spreadsheet_name, tab, rows=1000, cols=26):
+        handle = self._spreadsheet(spreadsheet_name).add_worksheet(title=tab, rows=rows, cols=cols)
+        return self.handles.put(spreadsheet_name, tab, handle)
+
+    def forget(self, spreadsheet_name, tab=None):
+        self.handles.forget(spreadsheet_name, tab)
+        if tab is None:
+            with self._lock:
+                self._spreadsheets.pop(spreadsheet_name, None)
+                self.spreadsheet_keys.pop(spreadsheet_name, None)
+
+    def refresh_credentials(self):
+        credentials = getattr(self.client.http_client, "auth", None)
+        if credentials is None:
+            return False
+        expiry = getattr(credentials, "expiry", None)
+        if credentials.token and expiry is not None:
+            remaining = (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+            if remaining > self.refresh_margin_seconds:
+                return False
+        credentials.refresh(GoogleAuthRequest())
+        return True
+
+    def revision(self, spreadsheet_name):
+        spreadsheet_id = self._spreadsheet(spreadsheet_name).id
+        try:
+            response = self.client.http_client.request(
+                "get", f"{DRIVE_FILES_API_V3_URL}/{spreadsheet_id}",
+                params={"fields": "version", "supportsAllDrives": True},
+            )
+        except APIError as e:
+            # (할당량 초과 등은 호출한 쪽이 다시 시도 / 그 밖의 오류(Drive 권한 등)는 '모름' 으로 처리)
+            if is_transient_error(e):
+                raise
+            return None
+        return response.json().get("version")
+
+    # (여는 호출은 잠금 밖에서 - 잠금은 결과를 넣을 때만)
+    def _spreadsheet(self, spreadsheet_name):
+        spreadsheet = self._spreadsheets.get(spreadsheet_name)
+        if spreadsheet is None:
+            opened = self.client.open(spreadsheet_name)
+            with self._lock:
+                spreadsheet = self._spreadsheets.setdefault(spreadsheet_name, opened)
+                self.spreadsheet_keys[spreadsheet_name] = spreadsheet.id
+        return spreadsheet
+
+
+# (3) 로컬 대역
+# base_latency: 호출 1회당 고정 지연(초) / per_row_latency: 주고받는 행 1개당 추가 지연(초)
+# error_rate: 호출이 error_codes 중 하나의 APIError 로 실패할 확률 (실패한 호출은 아무것도 바꾸지 않음 - 429 와 같이)
+# quota_per_minute: {"read": n, "write": n} 를 주면 최근 60초 요청 수가 넘을 때 429 (Sheets 할당량 흉내)
+class LocalBackend(StorageBackend):
+    def __init__(self, directory=None, base_latency=0.0, per_row_latency=0.0,
+                 error_rate=0.0, error_codes=(429,), seed=None, quota_per_minute=None):
+        self.directory = directory
+        self.base_latency = base_latency
+        self.per_row_latency = per_row_latency
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.calls = Counter()
+        self.errors = Counter()       # (메서드, 코드) -> 흉내 낸 오류 수
+        self._forced_errors = []      # fail_next() 로 예약한 오류 코드
+        self._random = random.Random(seed)
+        self.quota_per_minute = dict(quota_per_minute or {})
+        self._quota_calls = {kind: deque() for kind in self.quota_per_minute}   # 요청 종류 -> 최근 60초 호출 시각
+        self._sheets = {}
+        self._revisions = Counter()   # 스프레드시트 이름 -> 쓰기 횟수
+        self._instance = f"{os.getpid()}-{id(self):x}"   # (쓰기 횟수는 이 인스턴스 안에서만 의미가 있으므로 revision 에 붙임)
+        self._lock = threading.Lock()
+
+    def worksheet(self, spreadsheet_name, tab):
+        key = (spreadsheet_name, tab)
+        with self._lock:
+            if key not in self._sheets:
+                self._sheets[key] = LocalWorksheet(self, spreadsheet_name, tab, self._load(key))
+            return self._sheets[key]
+
+    # (로컬 대역은 처음 접근할 때 빈 탭이 만들어짐)
+    def create_worksheet(self, spreadsheet_name, tab, rows=1000, cols=26):
+        return self.worksheet(spreadsheet_name, tab)
+
+    def revision(self, spreadsheet_name):
+        self._inject_fault("revision")
+        self._simulate("revision")
+        return f"{self._instance}:{self._revisions[spreadsheet_name]}"
+
+    # (다음 count 번의 호출을 code 오류로 실패시킴 - 테스트용)
+    def fail_next(self, count=1, code=429):
+        with self._lock:
+            self._forced_errors.extend([code] * count)
+
+    # (벤치마크/테스트용: 시트 내용을 통째로 지정)
+    def set_values(self, spreadsheet_name, tab, values):
+        ws = self.worksheet(spreadsheet_name, tab)
+        with ws._lock:
+            ws._values = [[_to_cell(v) for v in row] for row in values]
+            ws._save()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key[0]}__{key[1]}.csv")
+
+    def _load(self, key):
+        if not self.directory or not os.path.exists(self._path(key)):
+            return []
+        with open(self._path(key), newline="", encoding="utf-8") as f:
+            return [row for row in csv.reader(f)]
+
+    def _save(self, key, values):
+        with self._lock:
+            self._revisions[key[0]] += 1
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(values)
+        os.replace(tmp_path, self._path(key))
+
+    # (호출 시작 시 확인 - 오류를 내면 시트는 바뀌지 않음)
+    def _inject_fault(self, method):
+        with self._lock:
+            if self._forced_errors:
+                code = self._forced_errors.pop(0)
+            elif self.error_rate and self._random.random() < self.error_rate:
+                code = self._random.choice(self.error_codes)
+            elif self._over_quota(WORKSHEET_REQUEST_KINDS.get(method)):
+                code = 429
+            else:
+                return
+            self.errors[(method, code)] += 1
+        self._simulate(method)
+        raise _api_error(code, f"local stand-in: injected {code} on {method}")
+
+    # (할당량을 넘지 않았으면 이번 호출을 세고 False / 거절된 호출은 세지 않음)
+    def _over_quota(self, kind):
+        calls = self._quota_calls.get(kind)
+        if calls is None:
+            return False
+        now = time.monotonic()
+        while calls and calls[0] <= now - 60:
+            calls.popleft()
+        if len(calls) >= self.quota_per_minute[kind]:
+            return True
+        calls.append(now)
+        return False
+
+    def _simulate(self, method, rows=0):
+        self.calls[method] += 1
+        delay = self.base_latency + self.per_row_latency * rows
+        if delay > 0:
+            time.sleep(delay)
+
+
+# (gspread 가 실제 오류 응답으로 만드는 것과 같은 APIError)
+def _api_error(code, message):
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message}}).encode("utf-8")
+    return APIError(response)
+
+
+# (Sheets 의 FORMATTED_VALUE 처럼 저장: 2.0 -> "2")
+def _to_cell(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(row):
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+
+class LocalWorksheet:
+    def __init__(self, backend, spreadsheet_name, tab, values):
+        self.backend = backend
+        self.key = (spreadsheet_name, tab)
+        self.title = tab
+        self._values = values
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        return len(self._values)
+
+    def get_all_values(self, **kwargs):
+        self.backend._inject_fault("get_all_values")
+        with self._lock:
+            width = max((len(row) for row in self._values), default=0)
+            values = [list(row) + [""] * (width - len(row)) for row in self._values]
+        self.backend._simulate("get_all_values", len(values))
+        return values
+
+    def get_all_records(self, **kwargs):
+        values = self.get_all_values()
+        if not values:
+            return []
+        header = values[0]
+        return [dict(zip(header, numericise_all(row))) for row in values[1:]]
+
+    def batch_get(self, ranges, **kwargs):
+        self.backend._inject_fault("batch_get")
+        with self._lock:
+            results = [self._get_range(a1) for a1 in ranges]
+        self.backend._simulate("batch_get", sum(len(r) for r in results))
+        return results
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, rows, **kwargs):
+        self.backend._inject_fault("append_rows")
+        with self._lock:
+            self._values.extend([[_to_cell(v) for v in row] for row in rows])
+            self._save()
+        self.backend._simulate("append_rows", len(rows))
+
+    def update_cell(self, row, col, value):
+        self.backend._inject_fault("update_cell")
+        with self._lock:
+            self._set_cell(row, col, value)
+            self._save()
+        self.backend._simulate("update_cell", 1)
+
+    # data: [{"range": "L5", "values": [["예"]]}, ...] (gspread Worksheet.batch_update 와 같은 형식)
+    def batch_update(self, data, **kwargs):
+        self.backend._inject_fault("batch_update")
+        with self._lock:
+            for item in data:
+                grid = a1_range_to_grid_range(item["range"])
+                for r, row in enumerate(item["values"]):
+                    for c, value in enumerate(row):
+                        self._set_cell(grid["startRowIndex"] + r + 1, grid["startColumnIndex"] + c + 1, value)
+            self._save()
+        self.backend._simulate("batch_update", len(data))
+
+    # (gspread 와 같이 1부터 시작, end_index 포함)
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        self.backend._inject_fault("delete_rows")
+        with self._lock:
+            del self._values[start_index - 1:end_index]
+            self._save()
+        self.backend._simulate("delete_rows", end_index - start_index + 1)
+
+    def _set_cell(self, row, col, value):
+        while len(self._values) < row:
+            self._values.append([])
+        target = self._values[row - 1]
+        target.extend([""] * (col - len(target)))
+        target[col - 1] = _to_cell(value)
+
+    def _get_range(self, a1):
+        grid = a1_range_to_grid_range(a1)
+        r0 = grid.get("startRowIndex", 0)
+        r1 = grid.get("endRowIndex", len(self._values))
+        c0 = grid.get("startColumnIndex", 0)
+        c1 = grid.get("endColumnIndex")
+        out = [_trim(list(row[c0:c1])) for row in self._values[r0:r1]]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def _save(self):
+        self.backend._save(self.key, self._values)
@@ -0,0 +1,65 @@
+# --- 실험실 재고 관리기: 요청 속도 제한 / 재시도 테스트 ---
+# 429 / 5xx 를 흉내 내는 LocalBackend(fail_next)에 ThrottledBackend 를 걸어 재시도 범위를 확인합니다.
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+from gspread.exceptions import APIError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_data import USAGE_LOG_COLUMNS, UsageLogSync
+from rate_limit import ThrottledBackend
+from storage_backend import LocalBackend
+
+USAGE_LOG_NAME, USAGE_LOG_TAB = "Usage_Log", "Log"
+ROW = ["2026-10-17 09:00:00", "DMEM", "LOT-1", "2", "kim", ""]
+
+
+@pytest.fixture
+def backends():
+    local = LocalBackend()
+    local.set_values(USAGE_LOG_NAME, USAGE_LOG_TAB, [USAGE_LOG_COLUMNS])
+    # (백오프를 짧게 - 재시도 횟수만 확인)
+    return local, ThrottledBackend(local, base_backoff=0.001, max_backoff=0.001)
+
+
+# (사용 기록 제출: 변경 확인이 429 를 두 번 받아도 다시 시도해서 통과하고, 행은 정확히 하나만 저장됨)
+def test_submit_survives_429_on_revision(backends):
+    local, backend = backends
+    sheet = backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB)
+    sync = UsageLogSync()
+    sync.sync(sheet, backend.revision(USAGE_LOG_NAME))
+
+    local.fail_next(2, 429)
+    sync.sync(sheet, backend.revision(USAGE_LOG_NAME))
+    sync.append_through(sheet.append_rows, [ROW])
+
+    assert local.errors[("revision", 429)] == 2
+    assert local.calls["append_rows"] == 1
+    assert local.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB).get_all_values() == [USAGE_LOG_COLUMNS, ROW]
+    assert len(sync.df) == 1
+
+
+# (append 는 두 번 실행되면 안 되므로 이 층에서 다시 시도하지 않음 - 오류를 그대로 호출한 쪽(저장 대기열)에 돌려줌)
+def test_append_rows_429_is_not_retried(backends):
+    local, backend = backends
+    sheet = backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB)
+
+    local.fail_next(1, 429)
+    with pytest.raises(APIError):
+        sheet.append_rows([ROW])
+
+    assert local.calls["append_rows"] == 1
+    assert local.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB).get_all_values() == [USAGE_LOG_COLUMNS]
+
+
+# (읽기는 5xx 도 다시 시도)
+def test_read_retries_5xx(backends):
+    local, backend = backends
+    sheet = backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB)
+
+    local.fail_next(2, 503)
+    assert sheet.get_all_values() == [USAGE_LOG_COLUMNS]
+    assert local.calls["get_all_values"] == 3
@@ -0,0 +1,278 @@
+# --- 실험실 재고 관리기: Usage_Log 압축 (스냅샷 + 보관) ---
+# Log 탭이 끝없이 길어지지 않도록, 워터마크(기준 시각) 이전 기록을 (제품명, Lot 번호) 별 누적 사용량
+# 스냅샷으로 접고, 원본 행은 보관소(로컬 Parquet 또는 Archive 탭)로 옮긴 뒤 Log 탭에서 지웁니다.
+# (cron 등으로 주기적으로 실행)
+#
+#   python usage_compaction.py --credentials service_account.json --retention-days 180
+#   python usage_compaction.py --backend local --archive tab
+#
+# - 스냅샷: Usage_Log 스프레드시트의 Snapshot 탭 [제품명, Lot 번호, 누적 사용량, Watermark]
+# - 로더: 재고 = 스냅샷 누적 사용량 + Log 탭에서 Timestamp 가 워터마크 이후(또는 비어 있는) 행
+#   (워터마크 이전 행이 Log 에 남아 있어도 이미 스냅샷에 들어 있으므로 로더가 건너뜀
+#    - 압축 도중 중단되어도 다시 실행하면 이어서 정리됩니다)
+# - 사용 속도(최근 4주) 계산에 필요한 기록은 지우지 않도록 보관 기간은 최소 28일입니다.
+# - 워터마크 이전 날짜로 Log 탭에 직접 입력한 기록은 다음 압축 때 스냅샷에 더해지고 보관소로 옮겨집니다.
+#   (그 전까지는 재고에 반영되지 않음 - 앱의 사용 일자 입력은 워터마크 이후 날짜만 받음)
+import argparse
+import glob
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+
+from consumption import WEEKLY_RATE_WINDOW_DAYS
+from inventory_data import USAGE_LOG_COLUMNS, column_letter, pad_row, rows_to_frame, usage_log_from_values
+
+USAGE_LOG_NAME, USAGE_LOG_TAB = "Usage_Log", "Log"
+SNAPSHOT_TAB = "Snapshot"
+ARCHIVE_TAB = "Archive"
+SNAPSHOT_COLUMNS = ["제품명", "Lot 번호", "누적 사용량", "Watermark"]
+ARCHIVE_DIR = os.path.join(".inventory_cache", "usage_archive")
+WATERMARK_COLUMN = "Watermark"
+WATERMARK_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+MIN_RETENTION_DAYS = WEEKLY_RATE_WINDOW_DAYS
+DEFAULT_RETENTION_DAYS = 180
+
+
+# (1) 스냅샷
+class UsageSnapshot:
+    def __init__(self, totals=None, watermark=None):
+        self.totals = totals or {}       # (제품명, Lot 번호) -> 워터마크 이전 누적 사용량
+        self.watermark = watermark       # pd.Timestamp / 압축한 적이 없으면 None
+
+    @classmethod
+    def from_values(cls, values):
+        if not values:
+            return cls()
+        rows = [row for row in values[1:] if any(str(v) for v in row)]
+        if not rows:
+            return cls()
+        df = rows_to_frame(values[0], rows)
+        totals = {}
+        for product, lot, qty in zip(df['제품명'].astype(str), df['Lot 번호'].astype(str),
+                                     pd.to_numeric(df['누적 사용량'], errors='coerce').fillna(0)):
+            totals[(product, lot)] = totals.get((product, lot), 0.0) + float(qty)
+        return cls(totals, pd.Timestamp(str(rows[0][SNAPSHOT_COLUMNS.index(WATERMARK_COLUMN)])))
+
+    def to_values(self):
+        watermark = self.watermark.strftime(WATERMARK_FORMAT)
+        return [SNAPSHOT_COLUMNS] + [
+            [product, lot, qty, watermark] for (product, lot), qty in sorted(self.totals.items())
+        ]
+
+    # (Log 탭 기록 중 스냅샷에 아직 들어 있지 않은 행 - 시각이 비어 있는 행은 남김)
+    def tail(self, df_log):
+        if self.watermark is None or df_log.empty:
+            return df_log
+        return df_log[~(df_log['Timestamp'] < self.watermark).to_numpy()]
+
+
+# (Snapshot 탭 원본 값 / 탭이 없으면 [])
+def read_usage_snapshot_values(backend):
+    try:
+        return backend.worksheet(USAGE_LOG_NAME, SNAPSHOT_TAB).get_all_values()
+    except WorksheetNotFound:
+        return []
+
+
+def read_usage_snapshot(backend):
+    return UsageSnapshot.from_values(read_usage_snapshot_values(backend))
+
+
+def _worksheet(backend, tab, cols):
+    try:
+        return backend.worksheet(USAGE_LOG_NAME, tab)
+    except WorksheetNotFound:
+        return backend.create_worksheet(USAGE_LOG_NAME, tab, cols=cols)
+
+
+# (2) 보관소: write(watermark, header, rows) / read() -> (header, rows)
+# 같은 워터마크로 다시 쓰면 그 워터마크에 아직 없는 행만 더함 (압축이 중간에 멈춘 뒤 재실행해도 중복 없음)
+class ParquetArchive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+
+    def _path(self, watermark):
+        return os.path.join(self.directory, f"usage_log_{watermark.strftime('%Y%m%d%H%M%S')}.parquet")
+
+    def write(self, watermark, header, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        rows = [[str(v) for v in row] for row in rows]
+        if os.path.exists(self._path(watermark)):
+            rows = _union(pd.read_parquet(self._path(watermark)).astype(str).values.tolist(), rows)
+        frame = pd.DataFrame(rows, columns=header, dtype=str)
+        tmp_path = self._path(watermark) + ".tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._path(watermark))
+
+    def read(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, "usage_log_*.parquet")))
+        if not paths:
+            return None, []
+        frame = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+        return list(frame.columns), frame.astype(str).values.tolist()
+
+
+class SheetArchive:
+    def __init__(self, backend, tab=ARCHIVE_TAB):
+        self.backend = backend
+        self.tab = tab
+
+    # (각 행 끝에 워터마크를 붙여 두고, 같은 워터마크로 이미 쓴 행은 건너뜀)
+    def write(self, watermark, header, rows):
+        stamp = watermark.strftime(WATERMARK_FORMAT)
+        width = len(header)
+        sheet = _worksheet(self.backend, self.tab, width + 1)
+        values = sheet.get_all_values()
+        existing = [pad_row(row[:-1], width) for row in values[1:] if row and row[-1] == stamp]
+        new_rows = _union(existing, [pad_row(row, width) for row in rows])[len(existing):]
+        if not new_rows:
+            return
+        out = [] if values else [list(header) + [WATERMARK_COLUMN]]
+        out += [row + [stamp] for row in new_rows]
+        sheet.append_rows(out)
+
+    def read(self):
+        try:
+            values = self.backend.worksheet(USAGE_LOG_NAME, self.tab).get_all_values()
+        except WorksheetNotFound:
+            return None, []
+        if not values:
+            return None, []
+        return values[0][:-1], [row[:-1] for row in values[1:]]
+
+
+# (보관된 기록 전체를 Usage_Log 와 같은 형식의 DataFrame 으로 - 필요할 때만 읽음)
+def read_archive(archives):
+    frames = []
+    for archive in archives:
+        header, rows = archive.read()
+        if rows:
+            frames.append(usage_log_from_values(header, rows))
+    if not frames:
+        return pd.DataFrame(columns=USAGE_LOG_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+# (3) 압축 / 반환: 결과 요약 dict
+def compact_usage_log(backend, archive, now=None, retention_days=DEFAULT_RETENTION_DAYS):
+    now = now or datetime.now()
+    watermark = pd.Timestamp(now.date()) - pd.Timedelta(days=max(retention_days, MIN_RETENTION_DAYS))
+    snapshot = read_usage_snapshot(backend)
+    # (워터마크는 뒤로 가지 않음 - 같으면 지난번에 못 지운 행만 정리)
+    if snapshot.watermark is not None and watermark <= snapshot.watermark:
+        watermark = snapshot.watermark
+
+    log = backend.worksheet(USAGE_LOG_NAME, USAGE_LOG_TAB)
+    values = log.get_all_values()
+    if len(values) < 2:
+        return {"watermark": None, "archived": 0, "deleted": 0}
+    header, rows = values[0], values[1:]
+    df = usage_log_from_values(header, rows)
+    timestamps = df['Timestamp']
+
+    # (이번에 새로 접을 행: 지난 워터마크 ~ 이번 워터마크 / 순서가 뒤섞인 행도 포함)
+    # (지난 워터마크 이전 행 중 보관소에 없는 행 = 뒤늦게 지난 날짜로 입력된 기록 -> 함께 접음
+    #  보관소에 있는 행은 지난번에 접었지만 지우지 못한 행이므로 지우기만 함)
+    older = (timestamps < watermark).to_numpy()
+    newly = older.copy()
+    if snapshot.watermark is not None:
+        late = (timestamps < snapshot.watermark).to_numpy()
+        newly &= ~late
+        newly |= _not_archived(rows, np.flatnonzero(late), archive, len(header))
+    # (Log 탭에서 지울 행: 워터마크 이전 행이 이어지는 구간들 - 시각이 비어 있거나 최근인 행은 남김)
+    following = np.append(older[1:], False)
+    preceding = np.insert(older[:-1], 0, False)
+    runs = list(zip(np.flatnonzero(older & ~preceding).tolist(), np.flatnonzero(older & ~following).tolist()))
+
+    # 1) 보관 -> 2) 스냅샷 (batch_update 1회) -> 3) 행 삭제 순서 (어느 단계에서 멈춰도 로더 결과는 같음)
+    archived_rows = [rows[i] for i in np.flatnonzero(newly)]
+    if archived_rows:
+        archive.write(watermark, header, archived_rows)
+    if archived_rows or watermark != snapshot.watermark:
+        totals = dict(snapshot.totals)
+        grouped = df[newly].groupby(['제품명', 'Lot 번호'], observed=True)['사용량'].sum()
+        for key, qty in grouped.items():
+            totals[key] = totals.get(key, 0.0) + float(qty)
+        _write_snapshot(backend, UsageSnapshot(totals, watermark))
+
+    deleted = 0
+    if runs:
+        # (읽은 뒤 다른 곳에서 행이 바뀌었으면 지우지 않음 - 다음 실행에서 다시 정리)
+        width = len(header)
+        last_col = column_letter(width)
+        found = log.batch_get([f"A{end + 2}:{last_col}{end + 2}" for _, end in runs])
+        unchanged = all(
+            pad_row(values[0] if values else [], width) == pad_row(rows[end], width)
+            for values, (_, end) in zip(found, runs)
+        )
+        if unchanged:
+            # (아래쪽 구간부터 지워야 위쪽 행 번호가 그대로 유지됨)
+            for start, end in reversed(runs):
+                log.delete_rows(start + 2, end + 2)
+                deleted += end - start + 1
+    return {"watermark": str(watermark), "archived": len(archived_rows), "deleted": deleted}
+
+
+# (existing 뒤에 new 중 existing 에 없는 행을 붙임 - 같은 내용의 행은 개수까지 비교)
+def _union(existing, new):
+    remaining = Counter(tuple(row) for row in existing)
+    merged = list(existing)
+    for row in new:
+        key = tuple(row)
+        if remaining[key] > 0:
+            remaining[key] -= 1
+        else:
+            merged.append(row)
+    return merged
+
+
+# (positions 의 행 중 보관소에 없는 행 -> 전체 행 길이의 bool 마스크 / 보관소는 그런 행이 있을 때만 읽음)
+def _not_archived(rows, positions, archive, width):
+    mask = np.zeros(len(rows), dtype=bool)
+    if len(positions) == 0:
+        return mask
+    _, archived = archive.read()
+    remaining = Counter(tuple(pad_row(row, width)) for row in archived)
+    for pos in positions:
+        key = tuple(pad_row(rows[pos], width))
+        if remaining[key] > 0:
+            remaining[key] -= 1
+        else:
+            mask[pos] = True
+    return mask
+
+
+def _write_snapshot(backend, snapshot):
+    sheet = _worksheet(backend, SNAPSHOT_TAB, len(SNAPSHOT_COLUMNS))
+    current_rows = len(sheet.get_all_values())
+    values = snapshot.to_values()
+    # (이전 스냅샷이 더 길면 남는 행은 빈 값으로 덮어씀 - 한 번의 batch_update 로 교체)
+    values += [[""] * len(SNAPSHOT_COLUMNS)] * max(current_rows - len(values), 0)
+    last_col = column_letter(len(SNAPSHOT_COLUMNS))
+    sheet.batch_update([{"range": f"A1:{last_col}{len(values)}", "values": values}])
+
+
+def main(argv=None):
+    from alert_digest import add_backend_arguments, open_backend
+    parser = argparse.ArgumentParser(description="Usage_Log 압축: 오래된 기록을 스냅샷으로 접고 보관소로 이동")
+    add_backend_arguments(parser)
+    parser.add_argument("--archive", choices=["parquet", "tab"], default="parquet")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS,
+                        help=f"Log 탭에 남길 기간 (최소 {MIN_RETENTION_DAYS}일)")
+    args = parser.parse_args(argv)
+
+    backend = open_backend(args)
+    archive = ParquetArchive(args.archive_dir) if args.archive == "parquet" else SheetArchive(backend)
+    print(compact_usage_log(backend, archive, retention_days=args.retention_days))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
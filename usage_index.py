@@ -0,0 +1,62 @@
+# --- 실험실 재고 관리기: 사용 이력 색인 ---
+# Usage_Log 를 (제품명, Lot 번호) 별로 묶고, 묶음 안은 Timestamp 순으로 정렬해 둡니다.
+# (Usage_Log 버전마다 한 번 만들고 모든 세션이 공유)
+# - 조회: 정확한 (제품명, Lot 번호) 쌍 + 기간(선택)으로 찾으므로 로그 전체가 아니라 결과 행 수에 비례합니다.
+# 결과는 색인을 만든 DataFrame(frame) 의 행 위치(0부터) 배열이며, 최신 기록이 먼저 옵니다. (시각이 없는 행은 맨 뒤)
+import numpy as np
+import pandas as pd
+
+
+class UsageHistoryIndex:
+    def __init__(self, df_log):
+        self.frame = df_log              # (행 위치가 가리키는 DataFrame - 색인과 함께 보관)
+        self.size = len(df_log)
+        self.groups = {}                 # (제품명, Lot 번호) -> (시작, 끝) : order 배열 구간
+        self.order = np.empty(0, dtype=np.int64)
+        self.sorted_timestamps = np.empty(0, dtype=np.int64)
+        # (NaT 는 int64 최솟값이라 묶음 안에서 맨 앞으로 정렬됨)
+        timestamps = df_log['Timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps, errors='coerce')
+        self.timestamps = timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+        if not self.size:
+            return
+
+        grouped = df_log.groupby(['제품명', 'Lot 번호'], observed=True, sort=False)
+        codes = grouped.ngroup().to_numpy()
+        self.order = np.lexsort((self.timestamps, codes))
+        self.sorted_timestamps = self.timestamps[self.order]
+        sorted_codes = codes[self.order]
+        group_ids = np.arange(codes.max() + 1)
+        starts = np.searchsorted(sorted_codes, group_ids, side='left')
+        ends = np.searchsorted(sorted_codes, group_ids, side='right')
+        # (묶음별 첫 행에서 키를 읽음)
+        first_rows = self.order[starts]
+        products = df_log['제품명'].iloc[first_rows].astype(str)
+        lots = df_log['Lot 번호'].iloc[first_rows].astype(str)
+        for product, lot, start, end in zip(products, lots, starts.tolist(), ends.tolist()):
+            self.groups[(product, lot)] = (start, end)
+
+    # (start: 이 시각 이후(포함) / end: 이 시각 이전(미포함) - 둘 다 없으면 시각 없는 행까지 전체)
+    def lookup(self, keys, start=None, end=None):
+        bounded = start is not None or end is not None
+        # (기간을 주면 NaT(int64 최솟값) 행은 빠지도록 하한을 최솟값 + 1 로)
+        lower = pd.Timestamp(start).value if start is not None else np.iinfo(np.int64).min + 1
+        parts = []
+        for key in keys:
+            bounds = self.groups.get((str(key[0]), str(key[1])))
+            if bounds is None:
+                continue
+            lo, hi = bounds
+            group_times = self.sorted_timestamps[lo:hi]
+            if bounded:
+                lo = bounds[0] + int(np.searchsorted(group_times, lower, side='left'))
+            if end is not None:
+                hi = bounds[0] + int(np.searchsorted(group_times, pd.Timestamp(end).value, side='left'))
+            if hi > lo:
+                parts.append(self.order[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate(parts)
+        # (결과 행만 최신순으로 다시 정렬)
+        return positions[np.argsort(self.timestamps[positions], kind='stable')[::-1]]
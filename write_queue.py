@@ -0,0 +1,136 @@
+# --- 실험실 재고 관리기: 사용 기록 저장 대기열 (write-behind) ---
+# 사용 기록 제출은 대기열에 넣고 바로 돌아옵니다. 백그라운드 스레드가 대기 중인 기록을
+# 모아서 append_rows 한 번으로 저장하고, 실패하면 간격을 늘려가며 다시 시도합니다.
+# - listener(event, record): "queued" / "written" / "failed" 시 호출 (재고 원장의 낙관적 반영용)
+# - batch_key(row): 주면 같은 키의 기록끼리만 묶어서 씀 (샤드별로 다른 시트에 쓰는 경우 - 한 묶음 = 한 번의 append)
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+QUEUED = "queued"
+WRITTEN = "written"
+FAILED = "failed"
+
+
+class UsageRecord:
+    def __init__(self, record_id, row):
+        self.id = record_id
+        self.row = row
+        self.status = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.created_at = time.time()
+        self.written_at = None
+        self.next_attempt = 0.0
+
+
+class UsageWriteQueue(threading.Thread):
+    def __init__(self, write_rows, listener=None, batch_size=100, flush_interval=0.5,
+                 max_attempts=5, backoff_seconds=1.0, keep_finished=500, batch_key=None):
+        super().__init__(name="inventory-usage-write-queue", daemon=True)
+        self.write_rows = write_rows
+        self.listener = listener
+        self.batch_key = batch_key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.keep_finished = keep_finished
+        self._records = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+    # (1) 제출: 기록 id 를 바로 돌려줍니다.
+    def submit(self, row):
+        with self._lock:
+            record = UsageRecord(next(self._ids), list(row))
+            self._records[record.id] = record
+        self._notify("queued", record)
+        self._wakeup.set()
+        return record.id
+
+    # (실패한 기록을 다시 대기열로)
+    def retry(self, record_id):
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is None or record.status != FAILED:
+                return False
+            record.status = QUEUED
+            record.attempts = 0
+            record.next_attempt = 0.0
+        self._notify("queued", record)
+        self._wakeup.set()
+        return True
+
+    def get(self, record_ids):
+        with self._lock:
+            return [self._records[i] for i in record_ids if i in self._records]
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for r in self._records.values() if r.status == QUEUED)
+
+    # (2) 백그라운드 루프
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            while self.flush():
+                pass
+
+    # 저장할 준비가 된 기록을 최대 batch_size 개까지 묶어 한 번에 씁니다. 쓴 기록이 있으면 True.
+    def flush(self):
+        now = time.time()
+        with self._lock:
+            batch = [
+                r for r in self._records.values()
+                if r.status == QUEUED and r.next_attempt <= now
+            ]
+        if self.batch_key is not None and batch:
+            key = self.batch_key(batch[0].row)
+            batch = [r for r in batch if self.batch_key(r.row) == key]
+        batch = batch[:self.batch_size]
+        if not batch:
+            return False
+        try:
+            self.write_rows([r.row for r in batch])
+        except Exception as e:
+            failed = []
+            with self._lock:
+                for r in batch:
+                    r.attempts += 1
+                    r.error = str(e)
+                    if r.attempts >= self.max_attempts:
+                        r.status = FAILED
+                        failed.append(r)
+                    else:
+                        r.next_attempt = now + self.backoff_seconds * (2 ** (r.attempts - 1))
+            for r in failed:
+                self._notify("failed", r)
+            return False
+
+        with self._lock:
+            for r in batch:
+                r.status = WRITTEN
+                r.error = None
+                r.written_at = time.time()
+            self._trim()
+        for r in batch:
+            self._notify("written", r)
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def _trim(self):
+        finished = [i for i, r in self._records.items() if r.status == WRITTEN]
+        for record_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._records[record_id]
+
+    def _notify(self, event, record):
+        if self.listener:
+            self.listener(event, record)